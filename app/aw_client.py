@@ -0,0 +1,91 @@
+# app/aw_client.py
+"""
+Async client of the REST API of an ActivityWatch server (aw-server, http://localhost:5600 by default),
+the few endpoints `utils.sync_activitywatch()` reads buckets and events from. Needs httpx (`pip install ".[sync]"`).
+
+AW answers an events request with the events overlapping the time range, newest first, at most `limit` of them.
+`get_events_between()` keeps the ones starting in the range, and splits ranges whose page came back full.
+"""
+import asyncio
+import logging
+from urllib.parse import quote
+
+import orjson
+import pandas as pd
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# httpx logs every request at the INFO level
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class ActivityWatchClient:
+    """Requests run concurrently, at most `concurrency` at a time, each asking for up to `page_size` events."""
+
+    # Ranges are not split below this, a full page of events starting within a second is kept as it is
+    MIN_RANGE = pd.Timedelta(seconds=1)
+
+    def __init__(self, url: str, concurrency: int = 8, page_size: int = 10_000, timeout: float = 60.0, transport=None):
+        if httpx is None:
+            raise ImportError("Syncing from an ActivityWatch server needs httpx, install it with `pip install \".[sync]\"`")
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.requests = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/api/0", timeout=timeout, transport=transport,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+
+    async def _get(self, path: str, params: dict = None):
+        """JSON response of a GET request. Network and HTTP errors are raised as ConnectionError."""
+        try:
+            async with self._semaphore:
+                response = await self._client.get(path, params=params)
+            self.requests += 1
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise ConnectionError(f"GET {path} failed: {e}") from e
+        return orjson.loads(response.content)
+
+    async def get_buckets(self) -> dict[str, dict]:
+        """Bucket metadata by bucket id: "hostname", "created", "type"..."""
+        return await self._get("/buckets/")
+
+    async def get_events(self, bucket_id: str, start: pd.Timestamp = None, end: pd.Timestamp = None, limit: int = None) -> list[dict]:
+        """Events of the bucket overlapping [`start`, `end`], newest first."""
+        params = {"limit": limit or self.page_size}
+        if start is not None:
+            params["start"] = start.isoformat()
+        if end is not None:
+            params["end"] = end.isoformat()
+        return await self._get(f"/buckets/{quote(bucket_id, safe='')}/events", params)
+
+    async def get_events_between(self, bucket_id: str, start: pd.Timestamp, end: pd.Timestamp) -> list[tuple[pd.Timestamp, pd.Timestamp, list[dict]]]:
+        """
+        Pages of the events starting in [`start`, `end`), as (range start, range end, events) tuples.
+        The events may also hold ones starting before the range, the caller drops them.
+        A full page may have missed events, its range is split in two halves fetched concurrently.
+        """
+        events = await self.get_events(bucket_id, start, end)
+        if len(events) < self.page_size:
+            return [(start, end, events)]
+        if end - start <= self.MIN_RANGE:
+            logging.warning(f"More than {self.page_size} events of {bucket_id} start between {start} and {end}, some may be missed")
+            return [(start, end, events)]
+
+        middle = start + (end - start) / 2
+        first, second = await asyncio.gather(
+            self.get_events_between(bucket_id, start, middle),
+            self.get_events_between(bucket_id, middle, end),
+        )
+        return first + second
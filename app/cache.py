@@ -0,0 +1,72 @@
+# app/cache.py
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from config import response_cache_max_bytes
+
+
+class ResponseCache:
+    """
+    LRU cache of encoded response bodies, bounded by their total size.
+    Keys are (endpoint, normalized params, dataset version), so a new import makes old entries unreachable,
+    they are dropped as soon as a newer version shows up.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._size = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint: str, params: dict, version: int) -> tuple:
+        return (endpoint, tuple(sorted(params.items())), version)
+
+    @staticmethod
+    def etag(key: tuple) -> str:
+        """Response body is fully defined by the key, so the key hash is a valid strong ETag."""
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        return f'"{key[-1]}-{digest}"'
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: tuple, body: bytes):
+        if len(body) > self.max_bytes:
+            logging.debug(f"Response of {len(body)} bytes for {key[0]} is too big to cache")
+            return
+
+        with self._lock:
+            version = key[-1]
+            if self._version is None or version > self._version:
+                self._clear()
+                self._version = version
+            elif version < self._version:
+                return  # computed for data that's already outdated
+
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = body
+            self._size += len(body)
+
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._size = 0
+
+
+response_cache = ResponseCache(response_cache_max_bytes)
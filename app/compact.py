@@ -0,0 +1,55 @@
+# app/compact.py
+"""
+Maintenance pass merging consecutive identical events, see `utils.compact_events()`.
+Prints the number of events and the database size before and after it.
+
+Run from the project root: python app/compact.py [--max-gap SECONDS] [--vacuum]
+"""
+import os
+import argparse
+
+from config import database_path, compaction_max_gap
+from db import read_connection, write_connection
+from utils import compact_events, update_active_time
+
+
+def _get_stats() -> tuple[int, int]:
+    """Number of events and bytes of the database in use, free pages left by deletes don't count."""
+    with read_connection() as conn:
+        events = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return events, (page_count - freelist_count) * page_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-gap", type=float, default=compaction_max_gap, help="longest gap in seconds between merged events")
+    parser.add_argument("--vacuum", action="store_true", help="give the freed space back to the file system")
+    args = parser.parse_args()
+
+    events_before, size_before = _get_stats()
+    file_size_before = os.path.getsize(database_path)
+
+    result = compact_events(max_gap=args.max_gap)
+    if result["first_merged_us"] is not None:
+        update_active_time(result["first_merged_us"])
+
+    if args.vacuum:
+        with write_connection() as conn:
+            conn.commit()
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # the vacuumed pages are in the WAL until then
+
+    events_after, size_after = _get_stats()
+    file_size_after = os.path.getsize(database_path)
+
+    print(f"{'':<16}{'before':>14}{'after':>14}")
+    print(f"{'events':<16}{events_before:>14,}{events_after:>14,}  ({1 - events_after / max(events_before, 1):.0%} fewer)")
+    print(f"{'size in use':<16}{size_before / 2**20:>11.1f} MB{size_after / 2**20:>11.1f} MB")
+    print(f"{'file size':<16}{file_size_before / 2**20:>11.1f} MB{file_size_after / 2**20:>11.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,4 +7,54 @@ flatten_apps_to_title_map = os.path.join("app", "data", "flatten_apps_to_title_m
 flatten_title_to_apps_map = os.path.join("app", "data", "flatten_title_to_apps_map.json")
 
 database_name = "data.db"
-database_path = os.path.join("app", "data", database_name)
\ No newline at end of file
+database_path = os.path.join("app", "data", database_name)
+
+# Where the analytics queries run: "sqlite", the rollup tables of the database, or "parquet", a copy of the events
+# in monthly Parquet files under `parquet_path` aggregated by DuckDB (`pip install ".[parquet]"`), see app/storage.py
+storage_backend = "sqlite"
+parquet_path = os.path.join("app", "data", "parquet")
+
+# Events per batch passed to `insert_events()` while streaming the exports
+ingest_batch_size = 50_000
+
+# ActivityWatch server synced by `utils.sync_activitywatch()` (`pip install ".[sync]"`), e.g. "http://localhost:5600",
+# at startup and every `aw_sync_interval` seconds (0: only at startup), or with `python app/sync.py`. None disables it.
+# Each bucket's new events are requested in time ranges of `aw_sync_range_hours`, up to `aw_sync_page_size` events each,
+# `aw_sync_concurrency` requests at a time.
+aw_server_url: str | None = None
+aw_sync_interval = 60
+aw_sync_range_hours = 24
+aw_sync_page_size = 10_000
+aw_sync_concurrency = 8
+
+# Processes parsing export files in parallel, each one holding a few batches at a time. 1 parses them one by one in the importing process.
+ingest_workers = min(4, os.cpu_count() or 1)
+
+# SQLite connection tuning: page cache per connection and memory-mapped I/O size
+sqlite_cache_size_kib = 64 * 1024
+sqlite_mmap_size = 256 * 1024 * 1024
+
+# Memory cap of the analytics response cache
+response_cache_max_bytes = 64 * 1024 * 1024
+
+# Consecutive events of a host with the same app and title are merged into one when the gap between them
+# is at most `compaction_max_gap` seconds, at every import if `compact_on_ingest`, or with `python app/compact.py`
+compact_on_ingest = True
+compaction_max_gap = 1.0
+
+# Usage sessions are runs of window events of an app on a host, each one starting at most `session_gap` seconds
+# after the previous ones ended. Sessions are stored, and rebuilt at startup when this changes.
+session_gap = 5 * 60.0
+
+# Timezone of the local dates and hours events are grouped by, an IANA name like "Europe/Berlin".
+# Machines in other timezones can be overridden by their hostname, e.g. {"LAPTOP-K3N1Q7": "America/New_York"},
+# or all the machines of a platform by its name, e.g. {"Linux": "Asia/Tokyo"}. Hostnames come first.
+# Stored events are recomputed at startup when these change.
+timezone = "UTC"
+host_timezones: dict[str, str] = {}
+platform_timezones: dict[str, str] = {}
+
+# Request metrics, served on /metrics. Each response carries its timings in the Server-Timing header if `server_timing`,
+# and SQL statements running longer than `slow_query_ms` are logged with their query plan.
+server_timing = True
+slow_query_ms = 250
@@ -0,0 +1,59 @@
+# app/db.py
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+from config import database_path, sqlite_cache_size_kib, sqlite_mmap_size
+from metrics import ProfiledConnection, count_vm_steps, VM_STEP_INTERVAL
+
+# Readers get one connection per thread, the writer is a single connection shared under a lock.
+# With WAL readers keep reading the last committed state while an import is writing.
+_local = threading.local()
+_writer = None
+_writer_lock = threading.RLock()
+
+
+def _connect(read_only: bool) -> sqlite3.Connection:
+    # The writer is handed between threads, always under `_writer_lock`.
+    # Readers serve the requests, their queries are profiled for /metrics.
+    factory = ProfiledConnection if read_only else sqlite3.Connection
+    conn = sqlite3.connect(database_path, timeout=30, check_same_thread=read_only, factory=factory)
+    if not read_only:
+        conn.execute("PRAGMA journal_mode = WAL")  # persistent, stored in the database file
+    conn.execute("PRAGMA synchronous = NORMAL")  # safe with WAL, only the last commits may be lost on power loss
+    conn.execute(f"PRAGMA cache_size = -{sqlite_cache_size_kib}")
+    conn.execute(f"PRAGMA mmap_size = {sqlite_mmap_size}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+        conn.set_progress_handler(count_vm_steps, VM_STEP_INTERVAL)
+    return conn
+
+
+@contextmanager
+def read_connection():
+    """Read-only connection of the current thread, opened on first use and kept for later calls."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _connect(read_only=True)
+        logging.debug(f"Opened read connection for thread {threading.current_thread().name}")
+    yield conn
+
+
+@contextmanager
+def write_connection():
+    """
+    The single write connection, one user at a time.
+    Commits when the block exits, rolls back if it raises.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _connect(read_only=False)
+        try:
+            yield _writer
+            _writer.commit()
+        except BaseException:
+            _writer.rollback()
+            raise
@@ -0,0 +1,94 @@
+# app/live.py
+"""
+Changes of the query results pushed to the clients of the /live Server-Sent Events stream.
+
+Every change of the dataset version is published once committed, from the thread that made it, with the new totals
+of the `/daily_app_usage` and `/daily_os_usage` cells it changed, so charts are patched in place. Totals are absolute,
+applying one twice or after a fresh fetch is harmless. A change without cells means anything may have changed.
+The recent messages are kept, a client reconnecting with the `Last-Event-ID` header gets the ones it missed.
+"""
+import asyncio
+import threading
+from collections import deque
+
+import orjson
+
+
+class LiveUpdates:
+    """
+    SSE messages, `id` is the dataset version after the change:
+    - "version", sent first to a new client: {"version": 12}
+    - "delta": {"version": 13, "since": null, "daily_app_usage": [{"date", "app", "duration", "active_duration"}, ...],
+      "daily_os_usage": [{"date", "platform", "duration", "active_duration"}, ...]} in hours like the endpoints.
+      If "since" is a date, the cells of the dates from then on that aren't listed are now 0.
+    - "reset": {"version": 14}, anything may have changed, fetch again
+    """
+
+    # SSE comment sent after `keepalive_seconds` without a message, keeps proxies from closing an idle stream
+    KEEPALIVE = b": keepalive\n\n"
+    keepalive_seconds = 15.0
+
+    def __init__(self, history: int = 256, queue_size: int = 64):
+        self.queue_size = queue_size
+        self._history: deque[tuple[int, bool, bytes]] = deque(maxlen=history)  # (version, is a reset, message)
+        self._subscribers: dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def has_subscribers(self) -> bool:
+        """Publishers compute the changed cells only when someone listens, a plain reset does otherwise."""
+        return bool(self._subscribers)
+
+    def publish(self, version: int, changes: dict = None, since: str = None):
+        """Sends the cells changed by the commit that made `version` to every client, or a reset if `changes` is None."""
+        if changes is None:
+            message = self._encode("reset", version, {"version": version})
+        else:
+            message = self._encode("delta", version, {"version": version, "since": since, **changes})
+        with self._lock:
+            self._history.append((version, changes is None, message))
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, version, message)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue of (version, message) the running loop gets the next messages on."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def catch_up(self, last_version: int | None, version: int) -> list[tuple[int, bytes]]:
+        """
+        First messages of a client at `version`: the version itself for a new one, the messages it missed after
+        `last_version` if they are all still kept, a reset otherwise.
+        """
+        if last_version is None:
+            return [(version, self._encode("version", version, {"version": version}))]
+        with self._lock:
+            missed = [entry for entry in self._history if entry[0] > last_version]
+        # Every version in between has to be there, a change published without a message would be missed
+        if [v for v, _, _ in missed] != list(range(last_version + 1, last_version + 1 + len(missed))) or not last_version <= version <= last_version + len(missed):
+            return [(version, self._encode("reset", version, {"version": version}))]
+        # Nothing before the last reset matters, the client fetches everything again
+        resets = [i for i, (_, is_reset, _) in enumerate(missed) if is_reset]
+        return [(v, message) for v, _, message in missed[resets[-1] if resets else 0:]]
+
+    def _deliver(self, queue: asyncio.Queue, version: int, message: bytes):
+        """Runs on the loop of the client. One that can't keep up gets a reset in place of what it didn't read."""
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            message = self._encode("reset", version, {"version": version})
+        queue.put_nowait((version, message))
+
+    @staticmethod
+    def _encode(event: str, version: int, data: dict) -> bytes:
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (version, event.encode(), orjson.dumps(data))
+
+
+live_updates = LiveUpdates()
@@ -1,66 +1,474 @@
 # app/main.py
+import asyncio
+import logging
+import importlib
+import orjson
 import uvicorn
-from fastapi import FastAPI, Query, Body
-from typing import List
+from fastapi import FastAPI, Query, Body, Header, Request, Response, HTTPException
+from typing import List, Literal
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.middleware.cors import CORSMiddleware
-from utils import (
-    get_spent_time,
-    get_daily_app_usage,
-    get_daily_os_usage,
-    get_dataset_metadata,
-    get_flatten_apps_to_title_map,
-    get_flatten_title_to_apps_map,
-    build_flatten_title_to_apps_map,
-    build_flatten_apps_to_title_map,
-    init_db,
-)
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from cache import response_cache
+from live import live_updates
+from config import aw_server_url, aw_sync_interval
+from status import ingest_status
+import metrics
+
+
+class _LazyModule:
+    """Module imported at its first attribute access. The import lock makes that safe from any thread."""
+    
+    def __init__(self, name: str):
+        self._name = name
+    
+    def __getattr__(self, attribute: str):
+        return getattr(importlib.import_module(self._name), attribute)
+
+
+# Both load pandas and numpy. They are imported by the startup task on the ingest thread,
+# so the server binds right away, and requests touch them only once the database is ready.
+utils = _LazyModule("utils")
+responses = _LazyModule("responses")
+
+# Imports run on their own thread, so a long ingest never takes threadpool slots from the readers
+ingest_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+
+def _startup():
+    """
+    Prepares the database, then imports new exports and syncs the ActivityWatch server if `aw_server_url` is set.
+    Readers are served as soon as the database is prepared.
+    """
+    try:
+        ingest_status.set_phase("loading")
+        utils.build_flatten_title_to_apps_map()
+        utils.build_flatten_apps_to_title_map()
+        responses.available_formats()
+        
+        ingest_status.set_phase("preparing database")
+        utils.prepare_db()
+        ingest_status.set_ready()
+        
+        utils.import_exports()
+        if aw_server_url:
+            _sync_activitywatch()
+        ingest_status.set_phase("idle")
+    except Exception as e:
+        logging.exception("Startup failed")
+        ingest_status.fail(str(e))
+
+
+def _sync_activitywatch():
+    """Syncs the ActivityWatch server. It may just not be running, a failed sync is logged and tried again at the next one."""
+    try:
+        utils.sync_activitywatch()
+    except ConnectionError as e:
+        logging.warning(f"Sync from {aw_server_url} failed: {e}")
+    except Exception:
+        logging.exception(f"Sync from {aw_server_url} failed")
+
+
+async def _sync_periodically():
+    while True:
+        await asyncio.sleep(aw_sync_interval)
+        if ingest_status.ready:
+            await _run_ingest(_sync_activitywatch)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asyncio.get_running_loop().run_in_executor(ingest_executor, _startup)
+    sync_task = asyncio.create_task(_sync_periodically()) if aw_server_url and aw_sync_interval else None
+    yield
+    if sync_task:
+        sync_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+frontend_origin = "http://localhost:5173"  # Replace with your frontend URL
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:5173"],  # Replace with your frontend URL
+    allow_origins=[frontend_origin],
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["ETag", "Server-Timing"],
 )
 
+# Outermost, so the measured time covers the whole request
+app.add_middleware(metrics.MetricsMiddleware, timing_allow_origin=frontend_origin)
+
+
+def _to_shape(shape: str, func, *args):
+    """Time series come as records, or as one date axis with a list per series if `shape` is "columnar"."""
+    if shape == "columnar":
+        return func(*args, columnar=True)
+    return func(*args)
+
+
+def _compute_encoded(media_type: str, func, *args) -> bytes:
+    with metrics.stage("transform"):
+        data = func(*args)
+    with metrics.stage("encode"):
+        return responses.encode(data, media_type)
+
+
+async def _cached_response(request: Request, endpoint: str, params: dict, func, *args) -> Response:
+    """
+    Serves `func(*args)` through the response cache, encoded in the format asked by the Accept header.
+    Clients sending the current ETag in If-None-Match get 304 without anything being computed.
+    """
+    media_type = responses.negotiate(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported formats: {', '.join(responses.available_formats())}")
+    
+    version = await run_in_threadpool(utils.get_dataset_version)
+    key = response_cache.make_key(endpoint, {**params, "format": media_type}, version)
+    etag = response_cache.etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    body = response_cache.get(key)
+    if body is None:
+        body = await run_in_threadpool(_compute_encoded, media_type, func, *args)
+        response_cache.put(key, body)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def _run_ingest(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(ingest_executor, func, *args)
+
+
+def _require_ready():
+    """Called before anything touches `utils`, which would import it on the event loop while startup is loading it."""
+    if not ingest_status.ready:
+        raise HTTPException(status_code=503, detail="The database is being prepared, see /health/ready", headers={"Retry-After": "5"})
+
 
 @app.get("/")
-def read_root_endpoint():
+async def read_root_endpoint():
     return {"Hello": "World"}
 
 
 @app.get("/app_list")
-def app_list_endpoint():
-    return get_flatten_title_to_apps_map()
+async def app_list_endpoint():
+    _require_ready()
+    return await run_in_threadpool(utils.get_flatten_title_to_apps_map)
 
 
 # TODO: Spent tim get's app executable, only one, windows's
 @app.get("/spent_time")
-def spent_time_endpoint():
-    return get_spent_time().to_dict(orient="records")
+async def spent_time_endpoint(request: Request, active: bool = False):
+    _require_ready()
+    return await _cached_response(request, "spent_time", {"active": active}, utils.get_spent_time, active)
 
 
 @app.post("/daily_app_usage")
-def daily_app_usage_endpoint(app_titles: list[str] = Body(..., embed=True)):
-    return get_daily_app_usage(app_titles).to_dict(orient="records")
+async def daily_app_usage_endpoint(
+    request: Request,
+    app_titles: list[str] = Body(..., embed=True),
+    active: bool = False,
+    shape: Literal["records", "columnar"] = "records",
+):
+    _require_ready()
+    params = {"app_titles": tuple(sorted(set(app_titles))), "active": active, "shape": shape}
+    return await _cached_response(request, "daily_app_usage", params, _to_shape, shape, utils.get_daily_app_usage, app_titles, active)
 
 
 @app.get("/daily_os_usage")
-def daily_os_usage_endpoint():
-    return get_daily_os_usage().to_dict(orient="records")
+async def daily_os_usage_endpoint(request: Request, active: bool = False, shape: Literal["records", "columnar"] = "records"):
+    _require_ready()
+    params = {"active": active, "shape": shape}
+    return await _cached_response(request, "daily_os_usage", params, _to_shape, shape, utils.get_daily_os_usage, active)
+
+
+@app.get("/usage")
+async def usage_endpoint(
+    request: Request,
+    grain: Literal["hourly", "daily", "weekly", "monthly"] = "daily",
+    by: Literal["app", "platform", "category"] = "app",
+    app_titles: list[str] | None = Query(None, alias="app_title"),
+    start_date: str | None = None,
+    end_date: str | None = None,
+    active: bool = False,
+    shape: Literal["records", "columnar"] = "records",
+):
+    _require_ready()
+    titles = tuple(sorted(set(app_titles))) if app_titles else None
+    params = {
+        "grain": grain, "by": by, "app_titles": titles, "start_date": start_date, "end_date": end_date,
+        "active": active, "shape": shape,
+    }
+    return await _cached_response(
+        request, "usage", params, _to_shape, shape, utils.get_usage, grain, by, titles, start_date, end_date, active,
+    )
+
+
+@app.get("/usage_heatmap")
+async def usage_heatmap_endpoint(
+    request: Request,
+    by: Literal["app", "platform", "category"] = "app",
+    app_titles: list[str] | None = Query(None, alias="app_title"),
+    start_date: str | None = None,
+    end_date: str | None = None,
+    active: bool = False,
+):
+    _require_ready()
+    titles = tuple(sorted(set(app_titles))) if app_titles else None
+    params = {"by": by, "app_titles": titles, "start_date": start_date, "end_date": end_date, "active": active}
+    return await _cached_response(
+        request, "usage_heatmap", params, utils.get_usage_heatmap, by, titles, start_date, end_date, active,
+    )
+
+
+@app.get("/dashboard")
+async def dashboard_endpoint(
+    request: Request,
+    app_titles: list[str] | None = Query(None, alias="app_title"),
+    start_date: str | None = None,
+    end_date: str | None = None,
+    active: bool = False,
+    shape: Literal["records", "columnar"] = "records",
+):
+    """`/dataset_metadata`, `/spent_time`, `/daily_os_usage` and `/daily_app_usage` for one date range, out of one rollup scan."""
+    _require_ready()
+    titles = tuple(sorted(set(app_titles))) if app_titles else ()
+    params = {"app_titles": titles, "start_date": start_date, "end_date": end_date, "active": active, "shape": shape}
+    return await _cached_response(
+        request, "dashboard", params, utils.get_dashboard, titles, start_date, end_date, active, shape == "columnar",
+    )
+
+
+@app.get("/category_usage")
+async def category_usage_endpoint(
+    request: Request,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    active: bool = False,
+    top: int = Query(5, ge=1, le=100),
+):
+    _require_ready()
+    params = {"start_date": start_date, "end_date": end_date, "active": active, "top": top}
+    return await _cached_response(request, "category_usage", params, utils.get_category_usage, start_date, end_date, active, top)
+
+
+@app.get("/daily_category_usage")
+async def daily_category_usage_endpoint(
+    request: Request,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    active: bool = False,
+    shape: Literal["records", "columnar"] = "records",
+):
+    _require_ready()
+    params = {"start_date": start_date, "end_date": end_date, "active": active, "shape": shape}
+    return await _cached_response(
+        request, "daily_category_usage", params, _to_shape, shape, utils.get_daily_category_usage, start_date, end_date, active,
+    )
+
+
+@app.get("/title_search")
+async def title_search_endpoint(
+    request: Request,
+    q: str,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    active: bool = False,
+    top: int = Query(5, ge=1, le=100),
+):
+    """Full-text search over window titles, `q` in SQLite FTS5 syntax (`proj*`, `"exact phrase"`, `a OR b`)."""
+    _require_ready()
+    params = {"q": q, "start_date": start_date, "end_date": end_date, "active": active, "top": top}
+    try:
+        return await _cached_response(request, "title_search", params, utils.get_title_search, q, start_date, end_date, active, top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/session_stats")
+async def session_stats_endpoint(
+    request: Request,
+    app_titles: list[str] | None = Query(None, alias="app_title"),
+    start_date: str | None = None,
+    end_date: str | None = None,
+):
+    """Count, total, mean, median, p95 and histogram of the usage session lengths of each application title."""
+    _require_ready()
+    titles = tuple(sorted(set(app_titles))) if app_titles else ()
+    params = {"app_titles": titles, "start_date": start_date, "end_date": end_date}
+    return await _cached_response(request, "session_stats", params, utils.get_session_stats, list(titles), start_date, end_date)
 
 
 @app.get("/dataset_metadata")
-def dataset_metadata_endpoint():
-    return get_dataset_metadata()
+async def dataset_metadata_endpoint(request: Request):
+    _require_ready()
+    return await _cached_response(request, "dataset_metadata", {}, utils.get_dataset_metadata)
 
 
-if __name__ == "__main__":
-    build_flatten_title_to_apps_map()
-    build_flatten_apps_to_title_map()
-    init_db()
+@app.get("/events")
+async def events_endpoint(
+    request: Request,
+    start: str | None = None,
+    end: str | None = None,
+    apps: list[str] | None = Query(None, alias="app"),
+    titles: list[str] | None = Query(None, alias="title"),
+    title_contains: str | None = None,
+    platforms: list[str] | None = Query(None, alias="platform"),
+    cursor: str | None = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    stream: bool = False,
+):
+    """
+    Raw events, a page at a time with `cursor`, or all of them as NDJSON with `stream=true`
+    (or `Accept: application/x-ndjson`).
+    """
+    _require_ready()
+    filters = {
+        "start": start, "end": end, "apps": apps, "titles": titles,
+        "title_contains": title_contains, "platforms": platforms,
+    }
+    stream = stream or "application/x-ndjson" in request.headers.get("accept", "")
+    
+    # First page is fetched here even when streaming, so bad filters are a 400 and not a broken stream
+    try:
+        with metrics.stage("transform"):
+            events, next_cursor = await run_in_threadpool(utils.query_events, **filters, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not stream:
+        with metrics.stage("encode"):
+            body = responses.encode({"events": events, "next_cursor": next_cursor}, responses.JSON)
+        return Response(body, media_type=responses.JSON)
+    
+    def encode_chunk(chunk: list[dict]) -> bytes:
+        with metrics.stage("encode"):
+            return b"".join(orjson.dumps(event) + b"\n" for event in chunk)
+    
+    def ndjson_chunks():
+        yield encode_chunk(events)
+        if next_cursor is not None:
+            for chunk in utils.iter_events(chunk_size=limit, cursor=next_cursor, **filters):
+                yield encode_chunk(chunk)
+    
+    return StreamingResponse(ndjson_chunks(), media_type="application/x-ndjson")
+
+
+@app.get("/sessions")
+async def sessions_endpoint(
+    start: str | None = None,
+    end: str | None = None,
+    app_titles: list[str] | None = Query(None, alias="app_title"),
+    platforms: list[str] | None = Query(None, alias="platform"),
+    min_length: float = Query(0, ge=0),
+    cursor: str | None = None,
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """Usage sessions in start order, a page at a time with `cursor`. Lengths are in minutes."""
+    _require_ready()
+    try:
+        with metrics.stage("transform"):
+            sessions, next_cursor = await run_in_threadpool(
+                utils.query_sessions, start, end, app_titles, platforms, min_length, cursor, limit,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    with metrics.stage("encode"):
+        body = responses.encode({"sessions": sessions, "next_cursor": next_cursor}, responses.JSON)
+    return Response(body, media_type=responses.JSON)
+
 
+@app.get("/live")
+async def live_endpoint(last_event_id: int | None = Header(None)):
+    """
+    Server-Sent Events stream of the dataset changes, see app/live.py: the new totals of the `/daily_app_usage` and
+    `/daily_os_usage` cells changed by each import batch, or a reset when anything may have changed.
+    Browsers reconnect with the id of the last message in `Last-Event-ID`, and get the ones they missed.
+    """
+    _require_ready()
+    
+    async def messages():
+        # Subscribed before reading the version, so no change falls in between
+        queue = live_updates.subscribe()
+        try:
+            version = await run_in_threadpool(utils.get_dataset_version)
+            for version, message in live_updates.catch_up(last_event_id, version):
+                yield message
+            while True:
+                try:
+                    message_version, message = await asyncio.wait_for(queue.get(), live_updates.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield live_updates.KEEPALIVE
+                    continue
+                if message_version > version:  # or it was already sent with the catch up
+                    version = message_version
+                    yield message
+        finally:
+            live_updates.unsubscribe(queue)
+    
+    return StreamingResponse(messages(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/health/ready")
+async def ready_endpoint():
+    """200 once the database can be queried, 503 until then, both with the startup phase and import progress."""
+    status = ingest_status.snapshot()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Request latencies per stage and SQL statistics per endpoint, in the Prometheus text format."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/metrics/slow_queries")
+async def slow_queries_endpoint():
+    return metrics.get_slow_queries()
+
+
+@app.post("/admin/reimport")
+async def reimport_endpoint():
+    _require_ready()
+    return await _run_ingest(utils.import_exports)
+
+
+@app.post("/admin/sync")
+async def sync_endpoint():
+    """Syncs the new events of the ActivityWatch server at `aw_server_url` now, without waiting for the next periodic sync."""
+    _require_ready()
+    if not aw_server_url:
+        raise HTTPException(status_code=409, detail="No ActivityWatch server to sync from, set `aw_server_url` in config.py")
+    try:
+        return await _run_ingest(utils.sync_activitywatch)
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=502, detail=f"Sync from {aw_server_url} failed: {e}")
+
+
+@app.post("/admin/rebuild_rollup")
+async def rebuild_rollup_endpoint():
+    _require_ready()
+    await _run_ingest(utils.rebuild_daily_rollup)
+    return {"status": "ok"}
+
+
+if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,369 @@
+# app/metrics.py
+"""
+Request instrumentation. Each request's time is split into stages, SQL (time spent in SQLite by the read
+connections, or in DuckDB by the Parquet storage backend), transform (Python work around the queries)
+and encode (serializing the response), along with the queries run, rows returned and SQLite VM steps.
+Measurements are exposed as Prometheus histograms by `render()` and sent back in the Server-Timing header.
+Statements running longer than `slow_query_ms` are logged with their EXPLAIN QUERY PLAN.
+"""
+import time
+import bisect
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from config import server_timing, slow_query_ms
+
+STAGES = ("sql", "transform", "encode")
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+# SQLite VM instructions between two calls of the progress handler counting them
+VM_STEP_INTERVAL = 1000
+
+# Slow statements kept for /metrics/slow_queries, each one explained again at most every PLAN_INTERVAL seconds
+SLOW_QUERIES_KEPT = 50
+PLAN_INTERVAL = 300
+
+_current: ContextVar["RequestMetrics | None"] = ContextVar("request_metrics", default=None)
+
+
+#region Prometheus metrics
+
+class Histogram:
+    """Prometheus histogram, one series per combination of label values."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # label values -> [count per bucket..., count above, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, series in items:
+            labels = _format_labels(self.label_names, label_values)
+            count = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), series):
+                count += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter, one series per combination of label values."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._series: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values: tuple, amount: float = 1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._series.items())
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{{{_format_labels(self.label_names, labels)}}} {value}" for labels, value in items]
+        return lines
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+request_seconds = Histogram(
+    "activitystat_request_duration_seconds", "Time from receiving a request to the end of its response.",
+    ("endpoint", "method", "status"), LATENCY_BUCKETS,
+)
+stage_seconds = Histogram(
+    "activitystat_stage_duration_seconds", "Time spent per request in each stage: sql, transform and encode.",
+    ("endpoint", "stage"), LATENCY_BUCKETS,
+)
+sql_queries = Histogram(
+    "activitystat_sql_queries", "SQL statements run per request.", ("endpoint",), COUNT_BUCKETS,
+)
+sql_rows_returned = Histogram(
+    "activitystat_sql_rows_returned", "Rows fetched from SQLite per request.", ("endpoint",), COUNT_BUCKETS,
+)
+sql_vm_steps = Histogram(
+    "activitystat_sql_vm_steps", "SQLite virtual machine instructions run per request, a measure of the rows scanned.",
+    ("endpoint",), COUNT_BUCKETS,
+)
+slow_queries_total = Counter(
+    "activitystat_slow_queries_total", f"SQL statements that ran for more than {slow_query_ms} ms.", ("endpoint",),
+)
+METRICS = (request_seconds, stage_seconds, sql_queries, sql_rows_returned, sql_vm_steps, slow_queries_total)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+#endregion
+
+
+#region Request measurements
+
+class RequestMetrics:
+    """Measurements of one request, filled in by the code it runs through `stage()` and the SQL cursors."""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.queries = 0
+        self.rows_returned = 0
+        self.vm_steps = 0
+
+    @property
+    def endpoint(self) -> str:
+        """Path template of the matched route, so `/events?app=x` and `/events?app=y` share their series."""
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        timings = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items() if seconds]
+        return ", ".join(timings + [f"total;dur={total * 1000:.1f}"])
+
+    def finish(self, method: str, status: int):
+        endpoint = self.endpoint
+        request_seconds.observe((endpoint, method, str(status)), time.perf_counter() - self.started)
+        for stage, seconds in self.stages.items():
+            if seconds:  # cached responses skip most stages, zeros would hide what the other requests spend
+                stage_seconds.observe((endpoint, stage), seconds)
+        if self.queries:
+            sql_queries.observe((endpoint,), self.queries)
+            sql_rows_returned.observe((endpoint,), self.rows_returned)
+            sql_vm_steps.observe((endpoint,), self.vm_steps)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Adds the time spent in the block to the `name` stage of the current request, if there is one.
+    Queries run inside the block are left out, they are counted in the "sql" stage.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    start, sql_before = time.perf_counter(), metrics.stages["sql"]
+    try:
+        yield
+    finally:
+        metrics.stages[name] += time.perf_counter() - start - (metrics.stages["sql"] - sql_before)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware measuring each HTTP request. The measurements so far are sent in the Server-Timing header,
+    readable from browser dev tools and, for `timing_allow_origin`, from the frontend's Resource Timing API.
+    """
+
+    def __init__(self, app, timing_allow_origin: str | None = None):
+        self.app = app
+        self.timing_allow_origin = timing_allow_origin
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics(scope)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if server_timing:
+                    headers = [*message.get("headers", []), (b"server-timing", metrics.server_timing().encode())]
+                    if self.timing_allow_origin:
+                        headers.append((b"timing-allow-origin", self.timing_allow_origin.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current.set(metrics)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            metrics.finish(scope["method"], status)  # after the last chunk of streamed responses
+
+#endregion
+
+
+#region SQL profiling
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    Cursor adding its time in SQLite and the rows it fetches to the current request's metrics.
+    Outside of requests (imports, startup) it works like a plain cursor.
+    """
+
+    _sql = None
+    _parameters = ()
+    _elapsed = 0.0
+    _reported_slow = False
+
+    def execute(self, sql, parameters=()):
+        metrics = _current.get()
+        if metrics is None:
+            return super().execute(sql, parameters)
+
+        self._sql, self._parameters, self._elapsed, self._reported_slow = sql, parameters, 0.0, False
+        metrics.queries += 1
+        return self._timed(metrics, super().execute, sql, parameters)
+
+    def fetchone(self):
+        metrics = _current.get()
+        if metrics is None:
+            return super().fetchone()
+
+        row = self._timed(metrics, super().fetchone)
+        metrics.rows_returned += row is not None
+        return row
+
+    def fetchmany(self, size=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().fetchmany(size or self.arraysize)
+
+        rows = self._timed(metrics, super().fetchmany, size or self.arraysize)
+        metrics.rows_returned += len(rows)
+        return rows
+
+    def fetchall(self):
+        metrics = _current.get()
+        if metrics is None:
+            return super().fetchall()
+
+        rows = self._timed(metrics, super().fetchall)
+        metrics.rows_returned += len(rows)
+        return rows
+
+    def __iter__(self):
+        if _current.get() is None:
+            return super().__iter__()
+        return self._iter_batches()
+
+    def _iter_batches(self):
+        # Timing `__next__` would cost a Python call per row, batches keep iteration close to the plain cursor
+        while rows := self.fetchmany(1000):
+            yield from rows
+
+    def _timed(self, metrics: RequestMetrics, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.stages["sql"] += elapsed
+            self._elapsed += elapsed
+            if self._elapsed * 1000 >= slow_query_ms and not self._reported_slow:
+                self._reported_slow = True
+                _record_slow_query(metrics.endpoint, self.connection, self._sql, self._parameters, self._elapsed)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors, including the ones of `execute()`, are `ProfiledCursor`s."""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+
+def record_query(seconds: float, rows: int):
+    """Adds a query that didn't go through SQLite, run by the Parquet storage backend, to the current request's metrics."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.stages["sql"] += seconds
+        metrics.queries += 1
+        metrics.rows_returned += rows
+
+
+def count_vm_steps():
+    """SQLite progress handler, called every VM_STEP_INTERVAL instructions."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.vm_steps += VM_STEP_INTERVAL
+    return 0
+
+
+_slow_queries: OrderedDict[str, dict] = OrderedDict()
+_slow_queries_lock = threading.Lock()
+
+
+def _record_slow_query(endpoint: str, conn: sqlite3.Connection, sql: str, parameters, elapsed: float):
+    slow_queries_total.inc((endpoint,))
+    key = " ".join(sql.split())
+    now = time.time()
+
+    with _slow_queries_lock:
+        entry = _slow_queries.pop(key, None) or {"sql": key, "count": 0, "max_ms": 0.0, "plan": None, "explained_at": 0.0}
+        _slow_queries[key] = entry
+        if len(_slow_queries) > SLOW_QUERIES_KEPT:
+            _slow_queries.popitem(last=False)
+        entry["count"] += 1
+        entry["endpoint"] = endpoint
+        entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+        explain = now - entry["explained_at"] >= PLAN_INTERVAL
+        if explain:
+            entry["explained_at"] = now
+
+    if explain:
+        entry["plan"] = _explain(conn, sql, parameters)
+        logging.warning(f"Slow query on {endpoint}, over {elapsed * 1000:.0f} ms: {key[:500]}\n{entry['plan']}")
+
+
+def _explain(conn: sqlite3.Connection, sql: str, parameters) -> str:
+    """EXPLAIN QUERY PLAN as an indented tree, like the sqlite3 shell prints it."""
+    try:
+        rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error as e:
+        return f"Query plan unavailable: {e}"
+
+    depths = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depths[node_id] = depths.get(parent_id, -1) + 1
+        lines.append("  " * depths[node_id] + detail)
+    return "\n".join(lines)
+
+
+def get_slow_queries() -> list[dict]:
+    """Slow statements seen recently, most recent first."""
+    with _slow_queries_lock:
+        entries = [dict(entry) for entry in reversed(_slow_queries.values())]
+    for entry in entries:
+        entry.pop("explained_at")
+    return entries
+
+#endregion
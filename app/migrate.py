@@ -0,0 +1,104 @@
+# app/migrate.py
+"""
+One-shot migration of the database to the v2 events schema.
+Prints database size and raw scan latency of the old and the new schema.
+
+Run from the project root: python app/migrate.py
+"""
+import os
+import time
+import logging
+import statistics
+
+from config import database_path
+from db import read_connection
+from utils import migrate_events_v2, drop_legacy_events, _get_table_columns
+
+# Same questions asked to both schemas, {apps} is filled with the most frequent apps
+LEGACY_QUERIES = {
+    "apps_daily": """
+        SELECT strftime('%Y-%m-%d', timestamp) AS date, app, SUM(duration)
+        FROM events_v1 WHERE app IN ({apps}) GROUP BY date, app
+    """,
+    "app_last_30_days": """
+        SELECT SUM(duration) FROM events_v1 WHERE app IN ({apps}) AND timestamp >= :start_iso
+    """,
+    "platforms_last_30_days": """
+        SELECT platform, SUM(duration) FROM events_v1 WHERE timestamp >= :start_iso GROUP BY platform
+    """,
+    "metadata": """
+        SELECT MIN(timestamp), MAX(timestamp), COUNT(*) FROM events_v1
+    """,
+}
+V2_QUERIES = {
+    "apps_daily": """
+        SELECT strftime('%Y-%m-%d', ts / 1000000, 'unixepoch') AS date, app_id, SUM(duration)
+        FROM events WHERE app_id IN (SELECT id FROM apps WHERE name IN ({apps})) GROUP BY date, app_id
+    """,
+    "app_last_30_days": """
+        SELECT SUM(duration) FROM events
+        WHERE app_id IN (SELECT id FROM apps WHERE name IN ({apps})) AND ts >= :start_us
+    """,
+    "platforms_last_30_days": """
+        SELECT platform_id, SUM(duration) FROM events WHERE ts >= :start_us GROUP BY platform_id
+    """,
+    "metadata": """
+        SELECT MIN(ts), MAX(ts), COUNT(*) FROM events
+    """,
+}
+
+
+def _time_queries(queries: dict[str, str], params: dict, repeat: int = 5) -> dict[str, float]:
+    """Median latency of each query in milliseconds."""
+    results = {}
+    with read_connection() as conn:
+        for name, query in queries.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(query.format(**params), params).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(timings)
+    return results
+
+
+def _get_benchmark_params() -> dict:
+    """Picks the two most frequent apps and a 30-day window at the end of the dataset."""
+    with read_connection() as conn:
+        apps = [row[0] for row in conn.execute("SELECT app FROM events_v1 GROUP BY app ORDER BY COUNT(*) DESC LIMIT 2")]
+        start_iso, start_us = conn.execute("""
+            SELECT strftime('%Y-%m-%dT%H:%M:%S', MAX(timestamp), '-30 days'),
+                   CAST(strftime('%s', MAX(timestamp), '-30 days') AS INTEGER) * 1000000
+            FROM events_v1
+        """).fetchone()
+    return {
+        "apps": ", ".join("'" + app.replace("'", "''") + "'" for app in apps),
+        "start_iso": start_iso,
+        "start_us": start_us,
+    }
+
+
+def main():
+    with read_connection() as conn:
+        columns = _get_table_columns(conn, "events")
+    if "timestamp" not in columns:
+        logging.info(f"{database_path} is already on the v2 schema, nothing to migrate")
+        return
+
+    size_before = os.path.getsize(database_path)
+    migrate_events_v2(drop_legacy=False)
+
+    params = _get_benchmark_params()
+    legacy_timings = _time_queries(LEGACY_QUERIES, params)
+    v2_timings = _time_queries(V2_QUERIES, params)
+
+    drop_legacy_events()
+    size_after = os.path.getsize(database_path)
+
+    print(f"{'database size':<24}{size_before / 2**20:>10.1f} MB{size_after / 2**20:>10.1f} MB")
+    for name in LEGACY_QUERIES:
+        print(f"{name:<24}{legacy_timings[name]:>10.1f} ms{v2_timings[name]:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# app/responses.py
+"""
+Response encoders negotiated through the Accept header.
+JSON (orjson) is the default, Arrow IPC and MessagePack are available when pyarrow / msgpack are installed.
+"""
+import datetime
+import logging
+
+import orjson
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+MSGPACK = "application/msgpack"
+
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+
+def available_formats() -> list[str]:
+    """Supported media types, most preferred first."""
+    formats = [JSON]
+    if pa is not None:
+        formats.append(ARROW)
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    return formats
+
+
+def negotiate(accept: str | None) -> str | None:
+    """
+    Picks the response media type for the Accept header, JSON if the client accepts anything.
+    None if none of the accepted types is available.
+    """
+    if not accept:
+        return JSON
+
+    formats = available_formats()
+    best, best_q = None, 0.0
+    for index, item in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        media_type = _ALIASES.get(media_type.lower(), media_type.lower())
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON
+        if media_type in formats and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def encode(data, media_type: str) -> bytes:
+    """Encodes a DataFrame, dict or list in the given media type."""
+    if media_type == ARROW:
+        return _encode_arrow(data)
+    if media_type == MSGPACK:
+        return msgpack.packb(_to_python(data), default=_default)
+    return orjson.dumps(_to_python(data), default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _to_python(data):
+    if isinstance(data, pd.DataFrame):
+        return _datetimes_to_iso(data).to_dict(orient="records")
+    if isinstance(data, dict):  # bundles of several results, like /dashboard
+        return {key: _to_python(value) for key, value in data.items()}
+    return data
+
+
+def _datetimes_to_iso(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Formats naive datetime columns in one vectorized call, the same way `Timestamp.isoformat()` does,
+    instead of calling the encoder's `default` for each value.
+    """
+    columns = [
+        column for column in df.columns
+        if pd.api.types.is_datetime64_dtype(df[column]) and not df[column].isna().any()  # NaT has to stay null
+    ]
+    if not columns:
+        return df
+
+    df = df.copy()
+    for column in columns:
+        values = df[column].to_numpy()
+        whole_seconds = (values.astype("datetime64[s]") == values).all()
+        df[column] = np.datetime_as_string(values, unit="s" if whole_seconds else "us")
+    return df
+
+
+def _default(value):
+    """Types orjson / msgpack don't handle on their own."""
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    raise TypeError(f"Type {type(value).__name__} is not serializable")
+
+
+def _encode_arrow(data) -> bytes:
+    table = _to_arrow_table(data)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _to_arrow_table(data) -> "pa.Table":
+    """DataFrames are converted column by column, without going through Python objects."""
+    if isinstance(data, pd.DataFrame):
+        return pa.Table.from_pandas(data, preserve_index=False)
+    if isinstance(data, dict) and data.keys() == {"dates", "series"}:
+        # Columnar time series, see `utils.to_columnar()`
+        return pa.table({"date": data["dates"], **data["series"]})
+    if isinstance(data, dict):
+        return pa.Table.from_pylist([_to_python(data)])
+    if isinstance(data, list):
+        return pa.Table.from_pylist(data)
+
+    logging.error(f"Can't encode {type(data).__name__} as Arrow")
+    raise TypeError(f"Type {type(data).__name__} can't be encoded as Arrow")
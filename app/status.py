@@ -0,0 +1,85 @@
+# app/status.py
+"""
+State of the server startup and progress of the running import.
+Kept apart from utils, so /health/ready answers while pandas is still being imported.
+"""
+import time
+import threading
+
+
+class IngestStatus:
+    """
+    Updated by the ingest thread, read by the health endpoint.
+    `ready` turns True once the database is migrated and can be queried, imports may still be running after that.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.phase = "starting"
+        self.error = None
+        self._lock = threading.Lock()
+        self._files: dict[str, list[int]] = {}  # path -> [bytes parsed, size] of the files being imported
+        self._files_done = 0
+        self._events_parsed = 0
+        self._import_started = None
+        self._import_ended = None
+
+    def set_phase(self, phase: str):
+        self.phase = phase
+
+    def set_ready(self):
+        self.ready = True
+
+    def fail(self, error: str):
+        self.phase = "failed"
+        self.error = error
+
+    def begin_import(self, file_sizes: dict[str, int]):
+        with self._lock:
+            self.phase = "importing"
+            self.error = None
+            self._files = {path: [0, size] for path, size in file_sizes.items()}
+            self._files_done = 0
+            self._events_parsed = 0
+            self._import_started = time.monotonic()
+            self._import_ended = None
+
+    def file_progress(self, path: str, bytes_parsed: int):
+        with self._lock:
+            progress = self._files.get(path)
+            if progress is not None:
+                progress[0] = min(bytes_parsed, progress[1])
+
+    def file_done(self, path: str):
+        with self._lock:
+            progress = self._files.get(path)
+            if progress is not None:
+                progress[0] = progress[1]
+                self._files_done += 1
+
+    def add_events(self, count: int):
+        with self._lock:
+            self._events_parsed += count
+
+    def end_import(self):
+        self._import_ended = time.monotonic()
+        if self.phase != "failed":
+            self.phase = "idle"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            bytes_total = sum(size for _, size in self._files.values())
+            bytes_parsed = sum(parsed for parsed, _ in self._files.values())
+            return {
+                "ready": self.ready,
+                "phase": self.phase,
+                "error": self.error,
+                "files_total": len(self._files),
+                "files_done": self._files_done,
+                "events_parsed": self._events_parsed,
+                "percent": round(100 * bytes_parsed / bytes_total, 1) if bytes_total else None,
+                "import_seconds": round((self._import_ended or time.monotonic()) - self._import_started, 1) if self._import_started else None,
+            }
+
+
+ingest_status = IngestStatus()
@@ -0,0 +1,254 @@
+# app/storage.py
+"""
+Storage backends the analytics queries of utils.py run on, picked by `storage_backend` in config.py.
+
+"sqlite" answers them from the rollup tables of the database. "parquet" keeps a copy of the events as Parquet files,
+one per local month, and aggregates them with DuckDB, a columnar engine that reads only the columns a query uses
+and skips the months outside its date filter. Both expose the same relations, `daily_rollup` and `hourly_rollup`
+(aliased `r` in the queries), `app_titles` and `app_categories`, so the queries are written once; the few
+SQL functions that differ between the two are attributes of the backends.
+
+Imports always write to SQLite, the Parquet copy is rewritten from it after each import.
+Full-text title search, sessions and the raw `/events` pages stay on SQLite, they are index lookups rather than scans.
+"""
+import os
+import json
+import shutil
+import logging
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+import metrics
+from db import read_connection
+
+
+class SQLiteBackend:
+    """Queries run on the read connection of the calling thread, rollups are tables kept up to date at ingest."""
+
+    name = "sqlite"
+
+    # Start of the period a rollup row aliased `r` falls in, per time grain of `utils.usage_wide()`
+    period_sql = {
+        "hourly": "r.date || printf(' %02d:00', r.hour)",
+        "daily": "r.date",
+        "weekly": "date(r.date, '-6 days', 'weekday 1')",  # weeks start on Monday
+        "monthly": "substr(r.date, 1, 7) || '-01'",
+    }
+    # Day of the week of `r.date`, Monday is 0. %w counts from Sunday.
+    weekday_sql = "(CAST(strftime('%w', r.date) AS INTEGER) + 6) % 7"
+    # Number of stored events
+    event_count_sql = "SELECT COALESCE(SUM(event_count), 0) FROM daily_rollup"
+    # Whether queries read a copy of the events that only `sync()` brings up to date, rather than the database itself
+    keeps_copy = False
+
+    def read_sql(self, query: str, params: list = ()) -> pd.DataFrame:
+        with read_connection() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    def date_filter(self, start_date: str = None, end_date: str = None) -> tuple[list[str], list]:
+        """WHERE clauses with their params limiting `r` to local dates between `start_date` and `end_date`."""
+        clauses, params = [], []
+        if start_date:
+            clauses.append("r.date >= ?")
+            params.append(start_date[:10])
+        if end_date:
+            clauses.append("r.date <= ?")
+            params.append(end_date[:10])
+        return clauses, params
+
+    def arg_max_sql(self, column: str, key: str) -> str:
+        """`column` of the row with the largest `key` in a group. SQLite takes bare columns from the MAX() row."""
+        return column
+
+    def prepare(self):
+        """Brings the store up to date with the database at startup."""
+
+    def sync(self, since_date: str = None):
+        """Copies the events of the local dates from `since_date` on after they changed, all of them if None."""
+
+
+class ParquetBackend(SQLiteBackend):
+    """
+    Events stored as `<path>/events/month=YYYY-MM/events.parquet`, sorted by local date and hour, queried with DuckDB.
+    The rollups are views aggregating the files, and the lookup tables are copied from SQLite when they change.
+    """
+
+    name = "parquet"
+
+    period_sql = {
+        **SQLiteBackend.period_sql,
+        "weekly": "strftime(date_trunc('week', CAST(r.date AS DATE)), '%Y-%m-%d')",  # ISO weeks start on Monday
+    }
+    weekday_sql = "isodow(CAST(r.date AS DATE)) - 1"
+    event_count_sql = "SELECT COUNT(*) FROM events"  # read from the file footers
+    keeps_copy = True
+
+    # Events with their names joined, as written to the files. `month` is the partition, it is not stored in them.
+    EXPORT_SQL = """
+        SELECT e.ts, e.duration, e.active_duration, a.name AS app, t.name AS title, p.name AS platform, e.local_date, e.local_hour
+        FROM events e
+        JOIN apps a ON a.id = e.app_id
+        JOIN titles t ON t.id = e.title_id
+        JOIN platforms p ON p.id = e.platform_id
+        WHERE e.local_date BETWEEN ? AND ?
+        ORDER BY e.local_date, e.local_hour
+    """
+    EMPTY_EVENTS_SQL = """
+        SELECT NULL::BIGINT AS ts, NULL::DOUBLE AS duration, NULL::DOUBLE AS active_duration, NULL::VARCHAR AS app,
+            NULL::VARCHAR AS title, NULL::VARCHAR AS platform, NULL::VARCHAR AS local_date, NULL::BIGINT AS local_hour,
+            NULL::VARCHAR AS month
+        WHERE false
+    """
+
+    def __init__(self, path: str):
+        if duckdb is None:
+            raise ImportError("The parquet storage backend needs duckdb, install it with `pip install \".[parquet]\"`")
+        self.path = path
+        self.events_path = os.path.join(path, "events")
+        self._state_path = os.path.join(path, "synced.json")
+        # In-memory database holding only the views over the files and the lookup tables, each thread queries it through its own cursor
+        self._db = duckdb.connect()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._lookups_version = None
+        self._create_views()
+
+    def read_sql(self, query: str, params: list = ()) -> pd.DataFrame:
+        self._refresh_lookups()
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._local.cursor = self._db.cursor()
+
+        start = time.perf_counter()
+        df = cursor.execute(query, list(params)).df()
+        metrics.record_query(time.perf_counter() - start, len(df))
+        return df
+
+    def date_filter(self, start_date: str = None, end_date: str = None) -> tuple[list[str], list]:
+        # The same limits on the month partition let DuckDB skip the files outside of them
+        clauses, params = super().date_filter(start_date, end_date)
+        if start_date:
+            clauses.append("r.month >= ?")
+            params.append(start_date[:7])
+        if end_date:
+            clauses.append("r.month <= ?")
+            params.append(end_date[:7])
+        return clauses, params
+
+    def arg_max_sql(self, column: str, key: str) -> str:
+        return f"arg_max({column}, {key})"
+
+    def prepare(self):
+        """Rewrites all the files if the events changed since the last sync, by an offline compaction or a timezone change."""
+        state = self._get_state()
+        try:
+            with open(self._state_path) as file:
+                synced_state = json.load(file)
+        except (OSError, ValueError):
+            synced_state = None
+        if synced_state != state:
+            self.sync()
+
+    def sync(self, since_date: str = None):
+        since_month = since_date[:7] if since_date else ""
+        start = time.perf_counter()
+        with read_connection() as conn:
+            months = [row[0] for row in conn.execute(
+                "SELECT DISTINCT substr(local_date, 1, 7) FROM events WHERE local_date >= ?", (since_month,),
+            )]
+
+        rows = 0
+        for month in months:
+            with read_connection() as conn:
+                df = pd.read_sql_query(self.EXPORT_SQL, conn, params=(f"{month}-01", f"{month}-31"))
+            self._write_month(month, df)
+            rows += len(df)
+
+        # Months left without events, after a timezone change for instance
+        if os.path.isdir(self.events_path):
+            for name in os.listdir(self.events_path):
+                month = name.removeprefix("month=")
+                if month >= since_month and month not in months:
+                    shutil.rmtree(os.path.join(self.events_path, name))
+
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._state_path, "w") as file:
+            json.dump(self._get_state(), file)
+        self._create_views()
+        logging.info(f"Wrote {rows} events in {len(months)} monthly Parquet files in {time.perf_counter() - start:.1f} s")
+
+    def _write_month(self, month: str, df: pd.DataFrame):
+        """Replaces the file of `month`. It's written next to it first, so queries never see it half written."""
+        directory = os.path.join(self.events_path, f"month={month}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "events.parquet")
+        with self._lock:
+            self._db.register("month_events", df)
+            try:
+                self._db.execute(f"COPY month_events TO '{path}.tmp' (FORMAT parquet, COMPRESSION zstd)")
+            finally:
+                self._db.unregister("month_events")
+        os.replace(f"{path}.tmp", path)
+
+    def _get_state(self) -> dict:
+        """What the files were written from. Imports sync them as they go, anything else changing events shows up here."""
+        with read_connection() as conn:
+            events, last_ts = conn.execute("SELECT COUNT(*), MAX(ts) FROM events").fetchone()
+            timezones = conn.execute("SELECT value FROM meta WHERE key = 'timezones'").fetchone()
+        return {"events": events, "last_ts": last_ts, "timezones": timezones[0] if timezones else None}
+
+    def _create_views(self):
+        """Views over the files. DuckDB lists them at every query, they are only created again if there were none."""
+        pattern = os.path.join(self.events_path, "*", "*.parquet")
+        has_files = os.path.isdir(self.events_path) and any(
+            name.endswith(".parquet") for _, _, names in os.walk(self.events_path) for name in names
+        )
+        events_sql = (
+            f"SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, hive_types = {{'month': VARCHAR}})"
+            if has_files else self.EMPTY_EVENTS_SQL
+        )
+        with self._lock:
+            self._db.execute(f"CREATE OR REPLACE VIEW events AS {events_sql}")
+            # `month` is implied by the date, grouping by it keeps the filters on it, and the file skipping, working through the views
+            for view, hour_sql in (("daily_rollup", ""), ("hourly_rollup", "local_hour AS hour, ")):
+                self._db.execute(f"""
+                    CREATE OR REPLACE VIEW {view} AS
+                    SELECT
+                        month, local_date AS date, {hour_sql}app, platform,
+                        SUM(duration) AS duration, COUNT(*) AS event_count, SUM(active_duration) AS active_duration
+                    FROM events
+                    GROUP BY ALL
+                """)
+
+    def _refresh_lookups(self):
+        """Copies `app_titles` and `app_categories` from SQLite when the dataset version changed, title maps bump it."""
+        with read_connection() as conn:
+            version = conn.execute("SELECT value FROM meta WHERE key = 'dataset_version'").fetchone()
+            if version == self._lookups_version:
+                return
+            app_titles = pd.read_sql_query("SELECT app, title FROM app_titles", conn)
+            app_categories = pd.read_sql_query("SELECT app, os, category, rule FROM app_categories", conn)
+
+        with self._lock:
+            for table, df in (("app_titles", app_titles), ("app_categories", app_categories)):
+                self._db.register("lookup", df)
+                try:
+                    self._db.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM lookup")
+                finally:
+                    self._db.unregister("lookup")
+            self._lookups_version = version
+
+
+def create_backend(name: str, parquet_path: str) -> SQLiteBackend:
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "parquet":
+        return ParquetBackend(parquet_path)
+    raise ValueError(f"Unknown storage backend {name!r}, expected 'sqlite' or 'parquet'")
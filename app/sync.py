@@ -0,0 +1,28 @@
+# app/sync.py
+"""
+Syncs the new window and AFK events of an ActivityWatch server, see `utils.sync_activitywatch()`.
+
+Run from the project root: python app/sync.py [--url http://localhost:5600] [--concurrency N]
+"""
+import json
+import argparse
+
+from config import aw_server_url, aw_sync_concurrency, aw_sync_page_size, aw_sync_range_hours
+from utils import prepare_db, sync_activitywatch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=aw_server_url or "http://localhost:5600", help="address of the ActivityWatch server")
+    parser.add_argument("--concurrency", type=int, default=aw_sync_concurrency, help="requests at a time")
+    parser.add_argument("--page-size", type=int, default=aw_sync_page_size, help="events asked for per request")
+    parser.add_argument("--range-hours", type=float, default=aw_sync_range_hours, help="time range of each request")
+    args = parser.parse_args()
+
+    prepare_db()
+    summary = sync_activitywatch(args.url, args.concurrency, args.page_size, args.range_hours)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,54 @@
 # app/utils.py
 import pandas as pd
+import numpy as np
 import re
 import os
 import json
+import base64
+import hashlib
+import threading
+import ijson
 import sqlite3
+import asyncio
+import multiprocessing
+from queue import Empty
+from concurrent.futures import ProcessPoolExecutor
 
 import warnings
 import logging
 import colorlog
 
-from config import (data_path, database_path, flatten_apps_to_title_map, flatten_title_to_apps_map)
+from config import (data_path, flatten_apps_to_title_map, flatten_title_to_apps_map, ingest_batch_size, ingest_workers,
+                    timezone, host_timezones, platform_timezones, compact_on_ingest, compaction_max_gap, session_gap, storage_backend, parquet_path,
+                    aw_server_url, aw_sync_concurrency, aw_sync_page_size, aw_sync_range_hours)
+from aw_client import ActivityWatchClient
+from db import read_connection, write_connection
+from live import live_updates
+from status import ingest_status
+from storage import create_backend
 
 warnings.simplefilter(action="ignore", category=FutureWarning)
 pd.options.mode.chained_assignment = None
 pd.options.display.precision = 2
 
+EVENT_COLUMNS = ["timestamp", "duration", "app", "title", "platform"]
+# Parsed batches also carry the hostname and source bucket id, and the "afk" / "not-afk" status of AFK events (None for window events)
+BATCH_COLUMNS = EVENT_COLUMNS + ["host", "bucket", "status"]
+WINDOW_BUCKET_PATTERN = re.compile(r"aw-watcher-window_[A-Za-z0-9-]+")
+AFK_BUCKET_PATTERN = re.compile(r"aw-watcher-afk_[A-Za-z0-9-]+")
+
+# Time grains of `usage_wide()`: rollup table, pandas frequency and date format. The SQL start of the period is the storage's.
+TIME_GRAINS = {
+    "hourly": ("hourly_rollup", "h", "%Y-%m-%dT%H:%M"),
+    "daily": ("daily_rollup", "D", "%Y-%m-%d"),
+    "weekly": ("daily_rollup", "W-MON", "%Y-%m-%d"),  # weeks start on Monday
+    "monthly": ("daily_rollup", "MS", "%Y-%m-%d"),
+}
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Backend the analytics queries run on, see app/storage.py
+storage = create_backend(storage_backend, parquet_path)
+
 #region Logging configuration
 
 # Define a custom logging format
@@ -224,6 +258,151 @@ def build_flatten_title_to_apps_map() -> dict:
     except IOError as e:
         logging.error(f"Failed to save Title to apps mapping to {flatten_title_to_apps_map}: {e}")
 
+class TitleMapRegistry:
+    """
+    Keeps both flatten title maps in memory and mirrors them into the `app_titles` table.
+    The JSON files are read again only when their mtime changes.
+    """
+    
+    def __init__(self, apps_to_title_path: str, title_to_apps_path: str):
+        self.apps_to_title_path = apps_to_title_path
+        self.title_to_apps_path = title_to_apps_path
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self._synced = False
+        self._apps_to_title: dict[str, str] = {}
+        self._title_to_apps: dict[str, list[str]] = {}
+    
+    def refresh(self):
+        """Reloads the maps if the files changed, and syncs `app_titles` if it's behind."""
+        mtimes = (_get_mtime(self.apps_to_title_path), _get_mtime(self.title_to_apps_path))
+        if mtimes == self._mtimes and self._synced:
+            return
+        
+        with self._lock:
+            if mtimes != self._mtimes:
+                self._apps_to_title = _load_json_map(self.apps_to_title_path, "Apps to title")
+                self._title_to_apps = _load_json_map(self.title_to_apps_path, "Title to apps")
+                self._mtimes = mtimes
+                self._synced = False
+            if not self._synced:
+                self._synced = self._sync_db()
+    
+    def apps_to_title(self) -> dict[str, str]:
+        self.refresh()
+        return self._apps_to_title
+    
+    def title_to_apps(self) -> dict[str, list[str]]:
+        self.refresh()
+        return self._title_to_apps
+    
+    def get_title(self, app: str, default: str = None) -> str:
+        return self.apps_to_title().get(app, default)
+    
+    def get_apps(self, title: str) -> list[str]:
+        return self.title_to_apps().get(title, [])
+    
+    def _sync_db(self) -> bool:
+        """Replaces the content of `app_titles`, False if the database isn't initialized yet."""
+        try:
+            with write_connection() as conn:
+                conn.execute("DELETE FROM app_titles")
+                conn.executemany("INSERT INTO app_titles (app, title) VALUES (?, ?)", self._apps_to_title.items())
+                version = _bump_dataset_version(conn)  # titles are part of the query results
+            live_updates.publish(version)
+            logging.info(f"Synced {len(self._apps_to_title)} app titles to the database")
+            return True
+        except sqlite3.OperationalError as e:
+            logging.warning(f"Failed to sync app titles to the database: {e}")
+            return False
+
+def _get_mtime(path: str) -> float | None:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+def _load_json_map(path: str, name: str) -> dict:
+    """Loads a title mapping from the JSON file."""
+    try:
+        with open(path, "r") as json_file:
+            title_map = json.load(json_file)
+        logging.info(f"Successfully loaded {name} mapping from {path}")
+        return title_map
+    except (IOError, ValueError) as e:
+        logging.error(f"Failed to load {name} mapping: {e}")
+        return {}
+
+title_maps = TitleMapRegistry(flatten_apps_to_title_map, flatten_title_to_apps_map)
+
+#endregion
+
+#region Categories
+
+UNCATEGORIZED = "Uncategorized"
+
+def _get_category_rules() -> list[tuple[str, str, str]]:
+    """
+    (OS, category, regex) for executables that can't all be listed in `_get_app_map()`.
+    Patterns have to match the whole name, the first matching rule wins.
+    """
+    return [
+        ("Linux", "Games", r"steam_app_\d+"),  # Steam games run through Proton, named after their app id
+        ("Windows", "Games", r".+-Win64-Shipping\.exe"),  # Unreal Engine games
+    ]
+
+class CategoryResolver:
+    """
+    Finds the OS and category of an app: the ones it's listed under in the app map, else the ones of the first matching rule.
+    Rules are compiled once, and the result is cached for every distinct app.
+    Results are mirrored into the `app_categories` table, which the rollup queries join.
+    """
+    
+    def __init__(self, app_map: dict, rules: list[tuple[str, str, str]]):
+        self._listed: dict[str, tuple[str, str, str | None]] = {}
+        for os_name, categories in app_map.items():
+            for category, apps in categories.items():
+                for app in apps:
+                    self._listed.setdefault(app, (os_name, category, None))
+        self._rules = [(os_name, category, pattern, re.compile(pattern)) for os_name, category, pattern in rules]
+        self._cache: dict[str, tuple[str, str, str | None] | None] = {}
+        # Stored along the synced categories, they are resynced when the map or the rules change
+        self.fingerprint = hashlib.sha1(json.dumps([app_map, rules], sort_keys=True).encode()).hexdigest()
+    
+    def resolve(self, app: str) -> tuple[str, str, str | None] | None:
+        """(OS, category, matched rule or None if listed), None if the app has no category."""
+        try:
+            return self._cache[app]
+        except KeyError:
+            pass
+        
+        found = self._listed.get(app)
+        if found is None:
+            found = next(
+                ((os_name, category, pattern) for os_name, category, pattern, regex in self._rules if regex.fullmatch(app)),
+                None,
+            )
+        self._cache[app] = found
+        return found
+    
+    def sync_db(self, conn: sqlite3.Connection, since_app_id: int = None):
+        """
+        Writes the category of the apps with an id over `since_app_id` to `app_categories`,
+        or replaces the whole table if it's None.
+        """
+        if since_app_id is None:
+            conn.execute("DELETE FROM app_categories")
+        apps = conn.execute("SELECT name FROM apps WHERE id > ?", (since_app_id or 0,)).fetchall()
+        rows = [(app, *found) for (app,) in apps if (found := self.resolve(app)) is not None]
+        conn.executemany("INSERT OR REPLACE INTO app_categories (app, os, category, rule) VALUES (?, ?, ?, ?)", rows)
+        
+        if since_app_id is None:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('categories', ?)", (self.fingerprint,))
+            _bump_dataset_version(conn)  # categories are part of the query results
+            logging.info(f"Synced categories of {len(rows)} of {len(apps)} apps to the database")
+
+app_categories = CategoryResolver(_get_app_map(), _get_category_rules())
+
 #endregion
 
 
@@ -231,197 +410,1818 @@ def _get_df(path: str = data_path) -> pd.DataFrame:
     """
     Reads all JSON files in the data_path and extracts window events.
     Files must start with "aw-buckets-export"
+    Loads everything in memory, use `_iter_event_batches()` for big exports.
     """
+    batches = [batch for _, batch in _iter_event_batches(_get_export_files(path))]
+    if not batches:
+        return pd.DataFrame(columns=BATCH_COLUMNS)
+    
+    df_result = pd.concat(batches, ignore_index=True)
+    df_result = df_result[df_result["status"].isna()].reset_index(drop=True)
+    logging.info(f"Successfully loaded {len(df_result)} events from {path}")
+    return df_result
+
+def _get_export_files(path: str = data_path) -> list[str]:
+    """Returns paths of the export files in `path`, files must start with "aw-buckets-export"."""
     try:
-        df_result = pd.DataFrame()
-        files = os.listdir(path)
-        logging.info(f"Found {len(files)} files in {path}")
-        
-        for file in files:
-            if file.startswith("aw-buckets-export"):
-                logging.info(f"Processing file: {file}")
-                file_path = os.path.join(path, file)
-                df = pd.read_json(file_path)
-                df = _extract_window_events(df)
-                df_result = pd.concat([df_result, df], ignore_index=True)
-        logging.info(f"Successfully loaded {len(df_result)} events from {path}")
-        return df_result
-    except ValueError as e:
-        logging.error(f"Invalid JSON format in files from {path}: {e}")
-        return pd.DataFrame()
-    except Exception as e:
-        logging.error(f"Unexpected error while loading data from {path}: {e}")
-        return pd.DataFrame()
+        files = sorted(os.listdir(path))
+    except OSError as e:
+        logging.error(f"Failed to list export files in {path}: {e}")
+        return []
+    
+    logging.info(f"Found {len(files)} files in {path}")
+    return [os.path.join(path, file) for file in files if file.startswith("aw-buckets-export")]
+
+def _iter_event_batches(
+    files: list[str], batch_size: int = ingest_batch_size, workers: int = ingest_workers, watermarks: dict[str, str] = None,
+    failed_files: set[str] = None,
+):
+    """
+    Streams window and AFK events from the export `files`.
+    Yields (file path, DataFrame) tuples of at most `batch_size` rows, so memory doesn't depend on the export size.
+    With `workers` > 1 files are parsed in parallel, one file per worker process.
+    Events older than their bucket's timestamp in `watermarks` are skipped, see `_iter_bucket_events()`.
+    Files that can't be read or parsed to the end are added to `failed_files`, after the batches parsed before the error.
+    """
+    failed_files = set() if failed_files is None else failed_files
+    if workers > 1 and len(files) > 1:
+        yield from _iter_parallel_batches(files, batch_size, workers, watermarks, failed_files)
+        return
+    
+    for file_path in files:
+        logging.info(f"Processing file: {os.path.basename(file_path)}")
+        try:
+            for batch in _iter_file_batches(file_path, batch_size, watermarks, ingest_status.file_progress):
+                yield file_path, batch
+        except (ijson.JSONError, OSError):
+            failed_files.add(file_path)
+        ingest_status.file_done(file_path)
+
+def _iter_parallel_batches(files: list[str], batch_size: int, workers: int, watermarks: dict[str, str], failed_files: set[str]):
+    """
+    Parses `files` in a process pool and yields their batches as the workers put them on a bounded queue,
+    so memory is bound by a few batches per worker rather than by whole files. Workers wait while the writer is busy.
+    Their byte progress comes through the same queue, `ingest_status` is only updated here, in the importing process.
+    """
+    workers = min(workers, len(files))
+    logging.info(f"Processing {len(files)} files with {workers} workers")
+    
+    # Imports run on a thread of the server, forking it could copy a lock another thread holds into the workers
+    context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+    queue = context.Queue(maxsize=2 * workers)
+    stop = context.Event()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_ingest_worker, initargs=(queue, stop)) as executor:
+        futures = [executor.submit(_parse_export_file, file_path, batch_size, watermarks) for file_path in files]
+        files_left = len(files)
+        try:
+            while files_left:
+                try:
+                    kind, file_path, value = queue.get(timeout=1.0)
+                except Empty:
+                    # A worker that failed sends nothing more, its error is on its future
+                    for future in futures:
+                        if future.done() and not future.cancelled() and future.exception() is not None:
+                            raise future.exception()
+                    continue
+                
+                if kind == "batch":
+                    yield file_path, value
+                elif kind == "progress":
+                    ingest_status.file_progress(file_path, value)
+                else:
+                    if kind == "failed":
+                        failed_files.add(file_path)
+                    ingest_status.file_done(file_path)
+                    files_left -= 1
+        finally:
+            # Stopped early by an error or by the caller: workers stop at their next batch,
+            # and the queue is emptied until they are done, so none stays blocked on it
+            stop.set()
+            for future in futures:
+                future.cancel()
+            while not all(future.done() for future in futures):
+                try:
+                    queue.get(timeout=0.1)
+                except Empty:
+                    pass
+
+# Queue to the importing process and stop flag of an ingest worker process, see `_iter_parallel_batches()`
+_worker_queue = None
+_worker_stop = None
 
-def _extract_window_events(df_og: pd.DataFrame) -> pd.DataFrame:
-    """Extracts specific fields ('timestamp', 'duration', 'app', 'title', 'platform') from event data."""
-    regex_pattern = r"aw-watcher-window_[A-Za-z0-9-]+"
-    parse_buckets_id = [ind for ind in df_og.index if re.match(regex_pattern, ind)]
+def _init_ingest_worker(queue, stop):
+    global _worker_queue, _worker_stop
+    _worker_queue, _worker_stop = queue, stop
+    # What's left unread when the import stopped early is dropped, rather than keeping the worker from exiting
+    queue.cancel_join_thread()
+
+def _parse_export_file(file_path: str, batch_size: int, watermarks: dict[str, str] = None, progress_step: int = 1 << 20):
+    """
+    Parses the window and AFK events of one export file in an ingest worker process. Puts ("batch", path, DataFrame),
+    ("progress", path, bytes parsed) every `progress_step` bytes, and ("done", path, None) on the queue,
+    or ("failed", path, None) if the file couldn't be read or parsed to the end.
+    """
+    logging.info(f"Processing file: {os.path.basename(file_path)}")
+    reported = 0
+    
+    def report_progress(path: str, bytes_parsed: int):
+        nonlocal reported
+        if bytes_parsed - reported >= progress_step:
+            _worker_queue.put(("progress", path, bytes_parsed))
+            reported = bytes_parsed
     
-    timestamp_arr, duration_arr, app_arr, title_arr, platform_arr = [], [], [], [], []
+    try:
+        for batch in _iter_file_batches(file_path, batch_size, watermarks, report_progress):
+            if _worker_stop.is_set():
+                return
+            _worker_queue.put(("batch", file_path, batch))
+    except (ijson.JSONError, OSError):
+        _worker_queue.put(("failed", file_path, None))
+        return
+    _worker_queue.put(("done", file_path, None))
 
+def _iter_file_batches(file_path: str, batch_size: int = ingest_batch_size, watermarks: dict[str, str] = None, on_progress=None):
+    """
+    Streams window and AFK events of a single export file as DataFrames of at most `batch_size` rows.
+    `on_progress(file_path, bytes_parsed)` is called at each chunk read from the file.
+    A file that can't be read or parsed to the end raises its error once logged, events after the last batch are dropped.
+    """
+    columns = {column: [] for column in BATCH_COLUMNS}
+    count = 0
+    
+    try:
+        for event in _iter_bucket_events(file_path, watermarks, on_progress):
+            for column, value in zip(BATCH_COLUMNS, event):
+                columns[column].append(value)
+            count += 1
+            
+            if len(columns["timestamp"]) >= batch_size:
+                yield pd.DataFrame(columns)
+                columns = {column: [] for column in BATCH_COLUMNS}
+    except ijson.JSONError as e:
+        logging.error(f"Invalid JSON format in {file_path}: {e}")
+        raise
+    except OSError as e:
+        logging.error(f"Failed to read {file_path}: {e}")
+        raise
+    
+    if columns["timestamp"]:
+        yield pd.DataFrame(columns)
+    logging.info(f"Loaded {count} events from {file_path}")
+
+class _ProgressReader:
+    """Reports to `on_progress(file_path, bytes_parsed)` how far the parser got into an export file, at each chunk it reads."""
+    
+    def __init__(self, file, file_path: str, on_progress):
+        self._file = file
+        self._file_path = file_path
+        self._on_progress = on_progress
+    
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        self._on_progress(self._file_path, self._file.tell())
+        return data
+
+def _iter_bucket_events(file_path: str, watermarks: dict[str, str] = None, on_progress=None):
+    """
+    Incrementally parses an export file and yields ('timestamp', 'duration', 'app', 'title', 'platform', 'host', 'bucket', 'status') tuples
+    of the "aw-watcher-window_*" and "aw-watcher-afk_*" buckets, one event at a time.
+    Window events have no status, AFK events have no app and title.
+    Events older than their bucket's entry in `watermarks` are skipped. The one at the watermark is read again,
+    AW keeps extending the newest event of a bucket, the stored one gets the longer duration.
+    `on_progress(file_path, bytes_parsed)` is called at each chunk read, if given.
+    """
     #region
-    # Example of df_bucket structure:
-    # {"aw-watcher-window_DESKTOP-9NAUUF0": {
+    # Example of bucket structure:
+    # {"buckets": {"aw-watcher-window_DESKTOP-9NAUUF0": {
     #       "id": "aw-watcher-window_DESKTOP-9NAUUF0", 
     #       "created": "2024-12-22T09:01:05.443462+00:00", 
     #       "name": null, 
     #       "type": "currentwindow", 
     #       "client": "aw-watcher-window", 
     #       "hostname": "DESKTOP-9NAUUF0", 
-    #       "data": {just empty dict for wharever reason, so we remove it},  
+    #       "data": {just empty dict for wharever reason},  
     #       "events": [ events are here, they are a list of dictionaries with 'timestamp', 'duration', 'data' keys ]
-    # }}
+    # }}}
 
     # Example of event structure:
     # "events": [   {"timestamp": "2025-01-12T14:26:07.798000+00:00", "duration": 0.0, "data": {"app": "zen.exe", "title": "Zen Browser"}}, 
     #               {"timestamp": "2025-01-12T14:26:05.760000+00:00", "duration": 1.018, "data": {"app": "explorer.exe", "title": ""}},     ]
+    # AFK buckets ("aw-watcher-afk_*") have the same structure, their events data is {"status": "afk"} or {"status": "not-afk"}
     #endregion
     
-    for bucket_id in parse_buckets_id:
-        df_data = df_og["buckets"].get(bucket_id, {})  # i think it's safer to use get() because it will return an empty dict if the key is not found
-        df_data.pop("data", None)  # remove 'data' key with empty dict (for some fucking reason it is here), so it wouldnt cause an error - "ValueError: Mixing dicts with non-Series may lead to ambiguous ordering."
-        df_bucket = pd.DataFrame(df_data)
-        
-        try:
-            hostname = df_bucket.get("hostname", [None])[0]  # Get hostname, if it exists
-            hostname = hostname.lower()
-            if hostname.startswith("desktop-") or hostname.startswith("laptop-") or hostname.startswith("wndws"):
-                platform = "Windows"
-            elif hostname in ["linux", "ubuntu", "arch", "endeavouros", "cachyos"]:
-                platform = "Linux"
-            elif hostname in ["macos", "mac", "macbook", "macbook pro", "macbook air", "osx"]:
-                platform = "macOS"
-            else:
-                logging.warning(f"Unknown OS for bucket \"{bucket_id}\", Using hostname value \"{hostname}\", as an OS name for ")
-                platform = hostname
-        except (IndexError, TypeError) as e:
-            logging.warning(f"Hostname not found or invalid in bucket {bucket_id}: {e}. Using \"Unknown\" as an OS name")
-            platform = 'Unknown'
-
-        for ind in df_bucket.index:
-            event = df_bucket["events"][ind]
+    watermarks = watermarks or {}
+    bucket_id = None
+    is_afk = False
+    watermark = None
+    hostname = None
+    host = platform = None
+    hostname_prefix = events_prefix = None
+    builder = None
+    
+    with open(file_path, "rb") as file:
+        reader = _ProgressReader(file, file_path, on_progress) if on_progress else file
+        for prefix, event, value in ijson.parse(reader, use_float=True):
+            # Building an event object, until its own closing bracket
+            if builder is not None:
+                if prefix == events_prefix and event == "end_map":
+                    try:
+                        data = builder.value
+                        if watermark is None or data["timestamp"] >= watermark:
+                            if is_afk:
+                                yield (data["timestamp"], data["duration"], None, None, platform, host, bucket_id, data["data"]["status"])
+                            else:
+                                yield (data["timestamp"], data["duration"], data["data"]["app"], data["data"]["title"], platform, host, bucket_id, None)
+                    except (KeyError, TypeError) as e:
+                        logging.warning(f"Missing key in event data: {e}")
+                    builder = None
+                else:
+                    builder.event(event, value)
+                continue
             
-            try:
-                timestamp_arr.append(event["timestamp"])
-                duration_arr.append(event["duration"])
-                app_arr.append(event["data"]["app"])
-                title_arr.append(event["data"]["title"])
-                platform_arr.append(platform)
-            except KeyError as e:
-                logging.warning(f"Missing key in event data: {e}")
-
-    return pd.DataFrame(
-        {
-            "timestamp": timestamp_arr,
-            "duration": duration_arr,
-            "app": app_arr,
-            "title": title_arr,
-            "platform": platform_arr,
-        }
-    )
+            # New bucket starts, keys of the "buckets" object are bucket ids
+            if prefix == "buckets" and event == "map_key":
+                is_afk = bool(AFK_BUCKET_PATTERN.match(value))
+                bucket_id = value if is_afk or WINDOW_BUCKET_PATTERN.match(value) else None
+                watermark = watermarks.get(value)
+                hostname = host = platform = None
+                hostname_prefix = f"buckets.{value}.hostname"
+                events_prefix = f"buckets.{value}.events.item"
+                continue
+            
+            if bucket_id is None:
+                continue
+            
+            if prefix == hostname_prefix and event == "string":
+                hostname = value
+            elif prefix == events_prefix and event == "start_map":
+                if platform is None:
+                    # Hostname goes before events in AW exports, bucket id ends with it anyway
+                    host = hostname or bucket_id.split("_", 1)[1]
+                    platform = _get_platform(host, bucket_id)
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+
+def _get_platform(hostname: str, bucket_id: str) -> str:
+    """Guesses the OS name from the bucket hostname."""
+    try:
+        hostname = hostname.lower()
+        if hostname.startswith("desktop-") or hostname.startswith("laptop-") or hostname.startswith("wndws"):
+            platform = "Windows"
+        elif hostname in ["linux", "ubuntu", "arch", "endeavouros", "cachyos"]:
+            platform = "Linux"
+        elif hostname in ["macos", "mac", "macbook", "macbook pro", "macbook air", "osx"]:
+            platform = "macOS"
+        else:
+            logging.warning(f"Unknown OS for bucket \"{bucket_id}\", Using hostname value \"{hostname}\", as an OS name for ")
+            platform = hostname
+    except (AttributeError, TypeError) as e:
+        logging.warning(f"Hostname not found or invalid in bucket {bucket_id}: {e}. Using \"Unknown\" as an OS name")
+        platform = 'Unknown'
+    
+    return platform
 
 
 #region Database functions
 
+_import_lock = threading.Lock()  # one import or sync at a time, from startup or the admin endpoints
+
 def init_db():
-    with sqlite3.connect(database_path) as conn:
+    prepare_db()
+    import_exports(data_path)
+
+def prepare_db():
+    """Creates the schema, or brings an existing database up to date with it, so that it can be queried."""
+    with read_connection() as conn:
+        events_columns = _get_table_columns(conn, "events")
+        rollup_columns = {table: _get_table_columns(conn, table) for table in ("daily_rollup", "hourly_rollup")}
+    
+    # Databases created before the v2 events schema
+    if "timestamp" in events_columns:
+        migrate_events_v2()
+    
+    with write_connection() as conn:
+        # v2 databases created before local dates, filled in by `recompute_local_time()` below
+        if "ts" in events_columns and "local_date" not in events_columns:
+            conn.execute("ALTER TABLE events ADD COLUMN local_date TEXT")
+            conn.execute("ALTER TABLE events ADD COLUMN local_hour INTEGER")
+        
+        # Databases created before hosts, filled in by `_migrate_hosts()` below
+        hosts_missing = "ts" in events_columns and "host_id" not in events_columns
+        if hosts_missing:
+            conn.execute("ALTER TABLE events ADD COLUMN host_id INTEGER REFERENCES hosts (id)")
+        
+        # Databases created before active time, filled in by `update_active_time()` below
+        active_time_missing = "ts" in events_columns and "active_duration" not in events_columns
+        if active_time_missing:
+            conn.execute("ALTER TABLE events ADD COLUMN active_duration REAL")
+            # AFK buckets were skipped by older versions, read the exports again for them,
+            # their window events are skipped by the bucket watermarks
+            conn.execute("DELETE FROM ingest_files")
+        for table, columns in rollup_columns.items():
+            if columns and "active_duration" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN active_duration REAL")
+        
+        # Databases created before title search get their titles indexed
+        title_index_missing = not _get_table_columns(conn, "titles_fts")
+        # v2 databases created before microsecond timestamps stored milliseconds
+        in_milliseconds = "ts" in events_columns and not (
+            _get_table_columns(conn, "meta") and conn.execute("SELECT 1 FROM meta WHERE key = 'ts_unit'").fetchone()
+        )
+        if in_milliseconds or hosts_missing:
+            conn.execute("DROP VIEW IF EXISTS events_view")  # created again by `_create_schema()`
+        # Sessions were clustered per platform before hosts, created again by `_create_schema()` and rebuilt below
+        sessions_columns = _get_table_columns(conn, "sessions")
+        sessions_per_platform = bool(sessions_columns) and "host_id" not in sessions_columns
+        if sessions_per_platform:
+            conn.execute("DROP TABLE sessions")
+        _create_schema(conn)
+        if title_index_missing:
+            conn.execute("INSERT INTO titles_fts (titles_fts) VALUES ('rebuild')")
+        if in_milliseconds:
+            _migrate_epoch_us(conn)
+        if hosts_missing:
+            _migrate_hosts(conn)
+        if sessions_per_platform:
+            conn.execute("DELETE FROM meta WHERE key = 'session_gap'")
+        # Databases created before categories, or synced with another app map or other rules
+        synced_categories = conn.execute("SELECT value FROM meta WHERE key = 'categories'").fetchone()
+        if synced_categories is None or synced_categories[0] != app_categories.fingerprint:
+            app_categories.sync_db(conn)
+        applied_timezones = conn.execute("SELECT value FROM meta WHERE key = 'timezones'").fetchone()
+    
+    if applied_timezones is None or applied_timezones[0] != _get_timezones_config():
+        recompute_local_time()
+    
+    with write_connection() as conn:
+        # Databases created before the rollup existed
+        rollup_missing = conn.execute("""
+            SELECT EXISTS(SELECT 1 FROM events)
+                AND NOT (EXISTS(SELECT 1 FROM daily_rollup) AND EXISTS(SELECT 1 FROM hourly_rollup))
+        """).fetchone()[0]
+        # Databases created before sessions, or built with another gap
+        sessions_gap = conn.execute("SELECT value FROM meta WHERE key = 'session_gap'").fetchone()
+    
+    if rollup_missing:
+        rebuild_daily_rollup()
+    if sessions_gap is None or sessions_gap[0] != session_gap:
+        rebuild_sessions()
+    if active_time_missing:
+        update_active_time()
+    storage.prepare()
+
+def _create_schema(conn: sqlite3.Connection):
+    """
+    Creates the tables if they don't exist.
+    Events are stored compactly: epoch microseconds and ids into the apps, titles, platforms and hosts lookup tables.
+    Local date and hour are computed at ingest, see `_to_local_time()`.
+    `events_view` joins the names back for ad-hoc queries.
+    """
+    events_created = not _get_table_columns(conn, "events")
+    for lookup_table in ("apps", "titles", "platforms", "hosts"):
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {lookup_table} (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+        """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS events (
+        ts INTEGER NOT NULL,
+        duration REAL,
+        app_id INTEGER NOT NULL REFERENCES apps (id),
+        title_id INTEGER NOT NULL REFERENCES titles (id),
+        platform_id INTEGER NOT NULL REFERENCES platforms (id),
+        local_date TEXT,
+        local_hour INTEGER,
+        active_duration REAL,
+        host_id INTEGER NOT NULL REFERENCES hosts (id),
+        PRIMARY KEY (ts, app_id, title_id)
+    ) WITHOUT ROWID
+    """)
+    # Covering indexes for per-app and per-platform scans over a time range
+    conn.execute("CREATE INDEX IF NOT EXISTS events_app_ts ON events (app_id, ts, duration)")
+    conn.execute("CREATE INDEX IF NOT EXISTS events_platform_ts ON events (platform_id, ts, duration)")
+    # Covering index for the runs of events of a host `compact_events()` reads in order
+    conn.execute("CREATE INDEX IF NOT EXISTS events_host_ts ON events (host_id, ts, app_id, title_id, duration)")
+    # Covering index for grouping by local day and hour, the rollups are rebuilt from it
+    conn.execute("DROP INDEX IF EXISTS events_local_date")  # same without active time
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS events_local_time
+        ON events (local_date, local_hour, app_id, platform_id, duration, active_duration)
+    """)
+    # Covering index for the totals of the titles found by `title_search()`
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS events_title
+        ON events (title_id, local_date, app_id, duration, active_duration)
+    """)
+    # Full-text index of the titles, the text itself is only stored in `titles`.
+    # Filled by `insert_events()`, prefix indexes make short prefix queries fast.
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS titles_fts USING fts5 (
+        name,
+        content = 'titles',
+        content_rowid = 'id',
+        prefix = '2 3'
+    )
+    """)
+    conn.execute(f"""
+    CREATE VIEW IF NOT EXISTS events_view AS
+    SELECT
+        {_iso_sql('e.ts')} AS timestamp,
+        e.ts,
+        e.duration,
+        a.name AS app,
+        t.name AS title,
+        p.name AS platform,
+        h.name AS host
+    FROM events e
+    JOIN apps a ON a.id = e.app_id
+    JOIN titles t ON t.id = e.title_id
+    JOIN platforms p ON p.id = e.platform_id
+    JOIN hosts h ON h.id = e.host_id
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS daily_rollup (
+        date TEXT,
+        app TEXT,
+        platform TEXT,
+        duration REAL,
+        event_count INTEGER,
+        active_duration REAL,
+        PRIMARY KEY (date, app, platform)
+    ) WITHOUT ROWID
+    """)
+    # Same totals by hour of the day, for hourly series and the weekday x hour heatmap
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS hourly_rollup (
+        date TEXT,
+        hour INTEGER,
+        app TEXT,
+        platform TEXT,
+        duration REAL,
+        event_count INTEGER,
+        active_duration REAL,
+        PRIMARY KEY (date, hour, app, platform)
+    ) WITHOUT ROWID
+    """)
+    # Intervals of the AFK watcher, window time of the same host is intersected with the "not-afk" ones, see `update_active_time()`
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS afk_events (
+        host_id INTEGER NOT NULL REFERENCES hosts (id),
+        ts INTEGER NOT NULL,
+        duration REAL,
+        afk INTEGER NOT NULL,
+        PRIMARY KEY (host_id, ts, afk)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ingest_files (
+        path TEXT PRIMARY KEY,
+        size INTEGER,
+        mtime REAL,
+        hash TEXT,
+        ingested_at TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS bucket_watermarks (
+        bucket_id TEXT PRIMARY KEY,
+        timestamp TEXT
+    )
+    """)
+    # Mirror of the apps to title map, see `TitleMapRegistry`
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS app_titles (
+        app TEXT PRIMARY KEY,
+        title TEXT NOT NULL
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS app_titles_title ON app_titles (title)")
+    # OS and category of every known app, see `CategoryResolver`. `rule` is the regex it matched, NULL if listed by name.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS app_categories (
+        app TEXT PRIMARY KEY,
+        os TEXT NOT NULL,
+        category TEXT NOT NULL,
+        rule TEXT
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS app_categories_category ON app_categories (category, app)")
+    # Usage sessions, see `extend_sessions()`. `local_date` is the one of their first event.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sessions (
+        host_id INTEGER NOT NULL REFERENCES hosts (id),
+        app_id INTEGER NOT NULL REFERENCES apps (id),
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL,
+        local_date TEXT,
+        platform_id INTEGER NOT NULL REFERENCES platforms (id),
+        PRIMARY KEY (host_id, app_id, start_ts)
+    ) WITHOUT ROWID
+    """)
+    # Sessions of an app new events can extend, sessions in start order for `/sessions`, and a covering one for the stats of a date range
+    conn.execute("CREATE INDEX IF NOT EXISTS sessions_end ON sessions (host_id, app_id, end_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS sessions_start ON sessions (start_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS sessions_local_date ON sessions (local_date, app_id, start_ts, end_ts)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value
+    ) WITHOUT ROWID
+    """)
+    # Marks the events table as holding microseconds, in the transaction creating it, see `_migrate_epoch_us()`
+    if events_created:
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('ts_unit', 'us')")
+
+def _get_table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    """Column names of `table`, empty if it doesn't exist."""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def migrate_events_v2(drop_legacy: bool = True):
+    """
+    One-shot migration of the old TEXT `events` table to the v2 schema.
+    The old table is renamed to `events_v1` and copied in batches through `insert_events()`,
+    which also recomputes the rollups.
+    """
+    logging.info("Migrating events table to the v2 schema...")
+    with write_connection() as conn:
+        conn.execute("ALTER TABLE events RENAME TO events_v1")
+        _create_schema(conn)
+        conn.execute("DELETE FROM daily_rollup")
+        conn.execute("DELETE FROM hourly_rollup")
+        _set_applied_timezones(conn)  # local dates are computed by `insert_events()` with the current settings
+    
+    last_rowid, total = 0, 0
+    while True:
+        with read_connection() as conn:
+            rows = conn.execute("""
+                SELECT rowid, timestamp, duration, app, title, platform FROM events_v1
+                WHERE rowid > ? ORDER BY rowid LIMIT ?
+            """, (last_rowid, ingest_batch_size)).fetchall()
+        if not rows:
+            break
+        
+        last_rowid = rows[-1][0]
+        total += insert_events(pd.DataFrame([row[1:] for row in rows], columns=EVENT_COLUMNS))
+    
+    # Old databases have no AFK data, so all window time counts as active
+    update_active_time()
+    
+    # Planner statistics, so range filters can skip-scan the covering indexes
+    with write_connection() as conn:
+        conn.execute("ANALYZE")
+    
+    if drop_legacy:
+        drop_legacy_events()
+    logging.info(f"Migrated {total} events to the v2 schema")
+
+def _migrate_epoch_us(conn: sqlite3.Connection):
+    """
+    Scales the millisecond timestamps of older databases to microseconds, in place.
+    Events that differed only by their microseconds were already merged by the key, a new import brings them back.
+    Sessions are rebuilt at the end of `prepare_db()`, their ends were rounded to milliseconds.
+    """
+    logging.info("Migrating timestamps to microseconds...")
+    conn.execute("UPDATE events SET ts = ts * 1000")
+    conn.execute("UPDATE afk_events SET ts = ts * 1000")
+    conn.execute("DELETE FROM sessions")
+    conn.execute("DELETE FROM meta WHERE key = 'session_gap'")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('ts_unit', 'us')")
+
+def _migrate_hosts(conn: sqlite3.Connection):
+    """
+    Fills in the host of the events of databases created before hosts, and keys their AFK events by host.
+    The hostnames weren't stored, so each platform stands in as a host of the same name, which keeps active time
+    as it was computed. Importing the exports into a new database tells the hosts of a platform apart.
+    """
+    logging.info("Adding hosts to the stored events...")
+    conn.execute("INSERT OR IGNORE INTO hosts (name) SELECT name FROM platforms")
+    conn.execute("""
+        UPDATE events SET host_id = h.id
+        FROM platforms p JOIN hosts h ON h.name = p.name
+        WHERE p.id = events.platform_id
+    """)
+    if "platform_id" in _get_table_columns(conn, "afk_events"):
+        conn.execute("ALTER TABLE afk_events RENAME TO afk_events_v1")
+        _create_schema(conn)
+        conn.execute("""
+            INSERT INTO afk_events (host_id, ts, duration, afk)
+            SELECT h.id, a.ts, a.duration, a.afk
+            FROM afk_events_v1 a
+            JOIN platforms p ON p.id = a.platform_id
+            JOIN hosts h ON h.name = p.name
+        """)
+        conn.execute("DROP TABLE afk_events_v1")
+
+def drop_legacy_events():
+    """Drops `events_v1` left by the migration and gives the space back."""
+    with write_connection() as conn:
+        conn.execute("DROP TABLE IF EXISTS events_v1")
+        conn.commit()
+        conn.execute("VACUUM")
+
+def _to_epoch_us(timestamps: pd.Series) -> pd.Series:
+    """ISO 8601 timestamps (any UTC offset) to integer microseconds since epoch, the precision of the AW exports."""
+    timestamps = pd.to_datetime(timestamps, utc=True, format="ISO8601")
+    return (timestamps - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(microseconds=1)
+
+def _from_epoch_us(us: int) -> str:
+    """Microseconds since epoch to an ISO 8601 UTC timestamp, like in the AW exports."""
+    return pd.Timestamp(us, unit="us", tz="UTC").isoformat(timespec="microseconds")
+
+def _iso_sql(column: str) -> str:
+    """SQL of `_from_epoch_us()` for a column of epoch microseconds, strftime() alone stops at milliseconds."""
+    return f"strftime('%Y-%m-%dT%H:%M:%S', {column} / 1000000, 'unixepoch') || printf('.%06d+00:00', {column} % 1000000)"
+
+def _to_local_time(ts: pd.Series, hosts: pd.Series, platforms: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Local date ("YYYY-MM-DD") and hour of epoch microseconds `ts`, in the timezone of each event's host,
+    else of its platform. Converted once per timezone, so DST changes fall on the right hour.
+    """
+    utc = pd.to_datetime(ts.to_numpy(), unit="us", utc=True)
+    timezones = hosts.map(host_timezones).fillna(platforms.map(platform_timezones)).fillna(timezone).to_numpy()
+    
+    local = np.empty(len(ts), dtype="datetime64[ns]")
+    for tz in pd.unique(timezones):
+        mask = timezones == tz
+        local[mask] = utc[mask].tz_convert(tz).tz_localize(None).to_numpy()
+    
+    local_date = np.datetime_as_string(local.astype("datetime64[D]"), unit="D")
+    local_hour = (local.astype("datetime64[h]") - local.astype("datetime64[D]")).astype(int)
+    return local_date, local_hour
+
+def _get_timezones_config() -> str:
+    """Timezone settings the local dates were computed with, stored in `meta` to detect changes."""
+    settings = {"timezone": timezone, "platform_timezones": platform_timezones}
+    # Left out when unused, databases of versions without hostname overrides aren't recomputed
+    if host_timezones:
+        settings["host_timezones"] = host_timezones
+    return json.dumps(settings, sort_keys=True)
+
+def _set_applied_timezones(conn: sqlite3.Connection):
+    conn.execute("""
+        INSERT INTO meta (key, value) VALUES ('timezones', ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+    """, (_get_timezones_config(),))
+
+def recompute_local_time(batch_size: int = ingest_batch_size):
+    """
+    Recomputes local date and hour of all stored events with the current timezone settings,
+    then rebuilds the rollups from them.
+    """
+    logging.info(f"Computing local dates of stored events ({timezone}, overrides: {host_timezones} {platform_timezones})...")
+    last_key, total = (-1, -1, -1), 0
+    while True:
+        with read_connection() as conn:
+            rows = conn.execute("""
+                SELECT e.ts, e.app_id, e.title_id, h.name, p.name FROM events e
+                JOIN hosts h ON h.id = e.host_id
+                JOIN platforms p ON p.id = e.platform_id
+                WHERE (e.ts, e.app_id, e.title_id) > (?, ?, ?)
+                ORDER BY e.ts, e.app_id, e.title_id
+                LIMIT ?
+            """, (*last_key, batch_size)).fetchall()
+        if not rows:
+            break
+        
+        chunk = pd.DataFrame(rows, columns=["ts", "app_id", "title_id", "host", "platform"])
+        local_date, local_hour = _to_local_time(chunk["ts"], chunk["host"], chunk["platform"])
+        with write_connection() as conn:
+            conn.executemany("""
+                UPDATE events SET local_date = ?, local_hour = ?
+                WHERE ts = ? AND app_id = ? AND title_id = ?
+            """, zip(local_date, local_hour.tolist(), chunk["ts"].tolist(), chunk["app_id"].tolist(), chunk["title_id"].tolist()))
+        last_key = rows[-1][:3]
+        total += len(rows)
+    
+    with write_connection() as conn:
+        _set_applied_timezones(conn)
+        # Sessions are dated by their first event
+        conn.execute("""
+            UPDATE sessions SET local_date = (
+                SELECT e.local_date FROM events e
+                WHERE e.ts = sessions.start_ts AND e.app_id = sessions.app_id AND e.host_id = sessions.host_id
+                LIMIT 1
+            )
+        """)
+    if total:
+        rebuild_daily_rollup()
+    logging.info(f"Local dates computed for {total} events")
+
+def import_exports(path: str = data_path, workers: int = ingest_workers) -> dict[str, int]:
+    """
+    Imports export files from `path` that are not in the `ingest_files` manifest yet.
+    Only events from their bucket's watermark on are inserted or extended, and compacted if `compact_on_ingest`,
+    then active time is recomputed from the earliest new window or AFK event on.
+    Manifest and watermarks are updated only after everything is inserted,
+    so an interrupted import is simply redone next time. So is a file that couldn't be read or parsed to the end:
+    it stays out of the manifest, and its events don't move the watermarks.
+    """
+    with _import_lock:
+        with read_connection() as conn:
+            manifest = {row[0]: row[1:] for row in conn.execute("SELECT path, size, mtime, hash FROM ingest_files")}
+            watermarks = dict(conn.execute("SELECT bucket_id, timestamp FROM bucket_watermarks"))
+        known_hashes = {row[2] for row in manifest.values()}
+        
+        files = _get_export_files(path)
+        new_files, manifest_rows = [], []
+        for file_path in files:
+            stat = os.stat(file_path)
+            if manifest.get(file_path, (None, None))[:2] == (stat.st_size, stat.st_mtime):
+                continue
+            
+            file_hash = _hash_file(file_path)
+            manifest_rows.append((file_path, stat.st_size, stat.st_mtime, file_hash))
+            if file_hash in known_hashes:
+                logging.info(f"File {file_path} was already imported under another name or mtime, skipping")
+                continue
+            known_hashes.add(file_hash)
+            new_files.append(file_path)
+        
+        summary = {
+            "files_found": len(files), "files_imported": len(new_files), "files_failed": 0,
+            "events_parsed": 0, "events_inserted": 0, "afk_events_inserted": 0, "events_compacted": 0,
+        }
+        if not manifest_rows:
+            logging.info(f"No new export files in {path}")
+            return summary
+        
+        ingest_status.begin_import({file_path: os.path.getsize(file_path) for file_path in new_files})
+        try:
+            file_watermarks, failed_files = {}, set()
+            since_us = None  # earliest new event, active time changes only from there on
+            for file_path, batch in _iter_event_batches(new_files, workers=workers, watermarks=watermarks, failed_files=failed_files):
+                since_us = ingest_batch(batch, summary, file_watermarks.setdefault(file_path, {}), since_us)
+            
+            # Exports list events newest first, a failed file's watermarks would skip the ones it didn't get to
+            new_watermarks = {}
+            for file_path, bucket_watermarks in file_watermarks.items():
+                if file_path not in failed_files:
+                    for bucket_id, timestamp in bucket_watermarks.items():
+                        new_watermarks[bucket_id] = max(timestamp, new_watermarks.get(bucket_id, timestamp))
+            manifest_rows = [row for row in manifest_rows if row[0] not in failed_files]
+            summary["files_imported"] -= len(failed_files)
+            summary["files_failed"] = len(failed_files)
+            
+            with write_connection() as conn:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO ingest_files (path, size, mtime, hash, ingested_at)
+                    VALUES (?, ?, ?, ?, datetime('now'))
+                """, manifest_rows)
+                save_watermarks(conn, new_watermarks)
+            
+            finish_ingest(summary, since_us)
+        except Exception as e:
+            ingest_status.fail(f"Import failed: {e}")
+            raise
+        finally:
+            ingest_status.end_import()
+        
+        logging.info(f"Imported {summary['files_imported']} files from {path}: {summary['events_inserted']} new events out of {summary['events_parsed']} parsed")
+        return summary
+
+def ingest_batch(batch: pd.DataFrame, summary: dict[str, int], new_watermarks: dict[str, str], since_us: int | None) -> int | None:
+    """
+    Inserts a batch of parsed window and AFK events (`BATCH_COLUMNS`), counting them in `summary`
+    and the latest timestamp of each bucket in `new_watermarks`.
+    Returns the earliest event timestamp seen so far, given the one before the batch in `since_us`.
+    """
+    is_afk = batch["status"].notna()
+    if (~is_afk).any():
+        summary["events_inserted"] += insert_events(batch[~is_afk])
+    if is_afk.any():
+        summary["afk_events_inserted"] += insert_afk_events(batch[is_afk])
+    summary["events_parsed"] += len(batch)
+    ingest_status.add_events(len(batch))
+    if len(batch):
+        batch_min_us = _to_epoch_us(batch["timestamp"]).min()
+        since_us = batch_min_us if since_us is None else min(since_us, batch_min_us)
+    for bucket_id, timestamp in batch.groupby("bucket")["timestamp"].max().items():
+        new_watermarks[bucket_id] = max(timestamp, new_watermarks.get(bucket_id, timestamp))
+    return since_us
+
+def save_watermarks(conn: sqlite3.Connection, new_watermarks: dict[str, str]):
+    conn.executemany("""
+        INSERT INTO bucket_watermarks (bucket_id, timestamp) VALUES (?, ?)
+        ON CONFLICT (bucket_id) DO UPDATE SET timestamp = MAX(timestamp, excluded.timestamp)
+    """, new_watermarks.items())
+
+def finish_ingest(summary: dict[str, int], since_us: int | None):
+    """
+    Compacts the inserted events if `compact_on_ingest`, then recomputes active time and syncs the storage
+    from the earliest new event `since_us` on.
+    """
+    if summary["events_inserted"] and compact_on_ingest:
+        ingest_status.set_phase("compacting")
+        compaction = compact_events(int(since_us))
+        summary["events_compacted"] = compaction["events_removed"]
+        since_us = min(since_us, compaction["first_merged_us"] or since_us)
+    if summary["events_inserted"] or summary["afk_events_inserted"]:
+        ingest_status.set_phase("computing active time")
+        update_active_time(int(since_us))
+        # A day earlier covers the local dates of all timezones
+        ingest_status.set_phase("syncing storage")
+        _sync_storage(since_date=_from_epoch_us(int(since_us) - 86_400_000_000)[:10])
+
+def _sync_storage(since_date: str):
+    """
+    Brings the storage backend up to date with the events of the local dates from `since_date` on.
+    A backend keeping a copy answered from the old one until now, under the dataset version the import already bumped,
+    so the version is bumped again once the copy is written: responses cached in between are dropped with the old key,
+    and live clients get the cells again.
+    """
+    storage.sync(since_date=since_date)
+    if not storage.keeps_copy:
+        return
+    with write_connection() as conn:
+        version = _bump_dataset_version(conn)
+        changes = _get_changed_cells(conn, SINCE_DATE_CELLS_SQL, (since_date,)) if live_updates.has_subscribers else None
+    live_updates.publish(version, changes, since=since_date)
+
+def _hash_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of the file content, read in chunks."""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def insert_events(df) -> int:
+    """
+    Inserts events from `df`, and extends stored ones `df` has a longer duration of, like the newest event of a bucket
+    AW kept extending after an export. Adds the new and extended time to the daily and hourly rollups and to the sessions,
+    then publishes the changed cells to the live clients. Returns the number of inserted or extended rows.
+    """
+    platforms = df["platform"].fillna("Unknown")
+    rows = pd.DataFrame({
+        "ts": _to_epoch_us(df["timestamp"]),
+        "duration": df["duration"],
+        "app": df["app"].fillna(""),
+        "title": df["title"].fillna(""),
+        "platform": platforms,
+        # Events of the v1 schema have no host, their platform stands in for it like in `_migrate_hosts()`
+        "host": df["host"].fillna(platforms) if "host" in df else platforms,
+    })
+    rows["local_date"], rows["local_hour"] = _to_local_time(rows["ts"], rows["host"], rows["platform"])
+    
+    with write_connection() as conn:
+        # Stage the batch first, so the rollup gets only the time that is really new
         conn.execute("""
-        CREATE TABLE IF NOT EXISTS events (
-            timestamp TEXT,
+        CREATE TEMP TABLE IF NOT EXISTS staged_rows (
+            ts INTEGER,
             duration REAL,
             app TEXT,
             title TEXT,
             platform TEXT,
-            PRIMARY KEY (timestamp, app, title)
+            host TEXT,
+            local_date TEXT,
+            local_hour INTEGER
         )
         """)
+        conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS staged_events (
+            ts INTEGER,
+            duration REAL,
+            app_id INTEGER,
+            title_id INTEGER,
+            platform_id INTEGER,
+            host_id INTEGER,
+            local_date TEXT,
+            local_hour INTEGER,
+            added REAL,
+            is_new INTEGER,
+            PRIMARY KEY (ts, app_id, title_id)
+        ) WITHOUT ROWID
+        """)
+        conn.executemany("""
+            INSERT INTO staged_rows (ts, duration, app, title, platform, host, local_date, local_hour)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows.itertuples(index=False, name=None))
+        
+        last_app_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM apps").fetchone()[0]
+        conn.execute("INSERT OR IGNORE INTO apps (name) SELECT DISTINCT app FROM staged_rows")
+        app_categories.sync_db(conn, since_app_id=last_app_id)
+        last_title_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM titles").fetchone()[0]
+        conn.execute("INSERT OR IGNORE INTO titles (name) SELECT DISTINCT title FROM staged_rows")
+        conn.execute("INSERT INTO titles_fts (rowid, name) SELECT id, name FROM titles WHERE id > ?", (last_title_id,))
+        conn.execute("INSERT OR IGNORE INTO platforms (name) SELECT DISTINCT platform FROM staged_rows")
+        conn.execute("INSERT OR IGNORE INTO hosts (name) SELECT DISTINCT host FROM staged_rows")
+        # New events, and stored ones getting longer with the time they gain in `added`. The longest of a key wins.
+        conn.execute("""
+            INSERT INTO staged_events (ts, duration, app_id, title_id, platform_id, host_id, local_date, local_hour, added, is_new)
+            SELECT s.ts, s.duration, a.id, t.id, p.id, h.id, s.local_date, s.local_hour, s.duration - COALESCE(e.duration, 0), e.ts IS NULL
+            FROM staged_rows s
+            JOIN apps a ON a.name = s.app
+            JOIN titles t ON t.name = s.title
+            JOIN platforms p ON p.name = s.platform
+            JOIN hosts h ON h.name = s.host
+            LEFT JOIN events e ON e.ts = s.ts AND e.app_id = a.id AND e.title_id = t.id
+            WHERE e.ts IS NULL OR s.duration > e.duration
+            ON CONFLICT (ts, app_id, title_id) DO UPDATE SET duration = excluded.duration, added = excluded.added
+            WHERE excluded.duration > staged_events.duration
+        """)
+        
+        inserted = conn.execute("""
+            INSERT INTO events (ts, duration, app_id, title_id, platform_id, host_id, local_date, local_hour)
+            SELECT ts, duration, app_id, title_id, platform_id, host_id, local_date, local_hour FROM staged_events
+            WHERE is_new
+        """).rowcount
+        # Active time of extended events is stale, NULL marks it for `update_active_time()`
+        inserted += conn.execute("""
+            UPDATE events SET duration = s.duration, active_duration = NULL
+            FROM staged_events s
+            WHERE NOT s.is_new AND events.ts = s.ts AND events.app_id = s.app_id AND events.title_id = s.title_id
+        """).rowcount
+        conn.execute("""
+            INSERT INTO daily_rollup (date, app, platform, duration, event_count)
+            SELECT s.local_date, a.name, p.name, SUM(s.added), SUM(s.is_new)
+            FROM staged_events s
+            JOIN apps a ON a.id = s.app_id
+            JOIN platforms p ON p.id = s.platform_id
+            WHERE true
+            GROUP BY 1, 2, 3
+            ON CONFLICT (date, app, platform) DO UPDATE SET
+                duration = duration + excluded.duration,
+                event_count = event_count + excluded.event_count
+        """)
+        conn.execute("""
+            INSERT INTO hourly_rollup (date, hour, app, platform, duration, event_count)
+            SELECT s.local_date, s.local_hour, a.name, p.name, SUM(s.added), SUM(s.is_new)
+            FROM staged_events s
+            JOIN apps a ON a.id = s.app_id
+            JOIN platforms p ON p.id = s.platform_id
+            WHERE true
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT (date, hour, app, platform) DO UPDATE SET
+                duration = duration + excluded.duration,
+                event_count = event_count + excluded.event_count
+        """)
+        if inserted:
+            extend_sessions(conn, pd.read_sql_query(f"SELECT {SESSION_EVENT_COLUMNS} FROM staged_events", conn))
+            version = _bump_dataset_version(conn)
+            changes = _get_changed_cells(conn, INSERTED_CELLS_SQL) if live_updates.has_subscribers else None
+        conn.execute("DELETE FROM staged_rows")
+        conn.execute("DELETE FROM staged_events")
     
-    # Check if the database is empty then it was just created, so insert data
-    with sqlite3.connect(database_path) as conn:
-        curr = conn.cursor()
-        curr.execute("SELECT EXISTS(SELECT 1 FROM events)")
-        if curr.fetchone()[0] == 0:
-            logging.info("New database created, inserting exported data...")
-            insert_events(_get_df(data_path))
+    if inserted:
+        live_updates.publish(version, changes)
+    return inserted
 
-def insert_events(df): 
-    with sqlite3.connect(database_path) as conn:
-        conn.executemany("""
-            INSERT OR IGNORE INTO events (timestamp, duration, app, title, platform)
-            VALUES (?, ?, ?, ?, ?)
-        """, df[["timestamp", "duration", "app", "title", "platform"]].to_records(index=False))
-        conn.commit()
+def insert_afk_events(df) -> int:
+    """
+    Inserts AFK watcher events from `df` into `afk_events`, keyed by their host.
+    AW keeps extending the last event of a bucket, so a stored event only gets its duration updated.
+    Returns the number of inserted or extended rows.
+    """
+    rows = pd.DataFrame({
+        "ts": _to_epoch_us(df["timestamp"]),
+        "duration": df["duration"],
+        "afk": (df["status"] == "afk").astype(int),
+        "host": df["host"].fillna(df["platform"].fillna("Unknown")),
+    })
+    
+    with write_connection() as conn:
+        conn.executemany("INSERT OR IGNORE INTO hosts (name) VALUES (?)", ((name,) for name in rows["host"].unique()))
+        return conn.executemany("""
+            INSERT INTO afk_events (host_id, ts, duration, afk)
+            SELECT id, ?, ?, ? FROM hosts WHERE name = ?
+            ON CONFLICT (host_id, ts, afk) DO UPDATE SET duration = excluded.duration
+            WHERE excluded.duration > afk_events.duration
+        """, rows.itertuples(index=False, name=None)).rowcount
+
+def rebuild_daily_rollup(since_date: str = None):
+    """
+    Recomputes `daily_rollup` and `hourly_rollup` out of the `events` table,
+    from scratch or only the local dates from `since_date` on.
+    """
+    logging.info(f"Rebuilding daily rollup{f' from {since_date}' if since_date else ''}...")
+    since_date = since_date or ""  # all dates sort after it
+    with write_connection() as conn:
+        conn.execute("DELETE FROM daily_rollup WHERE date >= ?", (since_date,))
+        conn.execute("DELETE FROM hourly_rollup WHERE date >= ?", (since_date,))
+        conn.execute("""
+            INSERT INTO daily_rollup (date, app, platform, duration, event_count, active_duration)
+            SELECT e.local_date, a.name, p.name, SUM(e.duration), COUNT(*), SUM(e.active_duration)
+            FROM events e
+            JOIN apps a ON a.id = e.app_id
+            JOIN platforms p ON p.id = e.platform_id
+            WHERE e.local_date >= ?
+            GROUP BY 1, 2, 3
+        """, (since_date,))
+        conn.execute("""
+            INSERT INTO hourly_rollup (date, hour, app, platform, duration, event_count, active_duration)
+            SELECT e.local_date, e.local_hour, a.name, p.name, SUM(e.duration), COUNT(*), SUM(e.active_duration)
+            FROM events e
+            JOIN apps a ON a.id = e.app_id
+            JOIN platforms p ON p.id = e.platform_id
+            WHERE e.local_date >= ?
+            GROUP BY 1, 2, 3, 4
+        """, (since_date,))
+        version = _bump_dataset_version(conn)
+        rows = conn.execute("SELECT COUNT(*) FROM daily_rollup").fetchone()[0]
+        # A full rebuild changes everything, clients fetch again
+        changes = _get_changed_cells(conn, SINCE_DATE_CELLS_SQL, (since_date,)) if since_date and live_updates.has_subscribers else None
+    
+    live_updates.publish(version, changes, since=since_date or None)
+    logging.info(f"Daily rollup rebuilt, {rows} rows")
+
+def get_dataset_version() -> int:
+    """
+    Number bumped by every change of the query results: inserted events, rollup rebuilds and title map reloads.
+    Used to key the response cache.
+    """
+    title_maps.refresh()  # reloading the title maps bumps the version, do it before reading
+    with read_connection() as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'dataset_version'").fetchone()
+    return row[0] if row else 0
+
+def _bump_dataset_version(conn: sqlite3.Connection) -> int:
+    """Increments the dataset version, returns the new one."""
+    return conn.execute("""
+        INSERT INTO meta (key, value) VALUES ('dataset_version', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1
+        RETURNING value
+    """).fetchone()[0]
 
 def get_events():
-    with sqlite3.connect(database_path) as conn:
-        return pd.read_sql("SELECT * FROM events", conn)
+    with read_connection() as conn:
+        return pd.read_sql("SELECT timestamp, duration, app, title, platform FROM events_view", conn)
 
 #endregion
 
-#region Get functions
+#region ActivityWatch sync
+
+def sync_activitywatch(
+    url: str = aw_server_url, concurrency: int = aw_sync_concurrency, page_size: int = aw_sync_page_size,
+    range_hours: float = aw_sync_range_hours, transport=None,
+) -> dict[str, int]:
+    """
+    Inserts the window and AFK events of an ActivityWatch server that are newer than their bucket's watermark,
+    the same watermarks file imports use, then compacts them and recomputes active time like an import.
+    The newest event of each bucket is left for the next sync, AW keeps extending it while the window stays the same.
+    Watermarks are updated only after everything is inserted, so an interrupted sync is simply redone next time.
+    `transport` is passed to httpx, to sync from an app in the same process for instance.
+    """
+    if not url:
+        raise ValueError("No ActivityWatch server to sync from, set `aw_server_url` in config.py")
+    
+    with _import_lock:
+        with read_connection() as conn:
+            watermarks = dict(conn.execute("SELECT bucket_id, timestamp FROM bucket_watermarks"))
+        
+        summary = {
+            "buckets_synced": 0, "requests": 0,
+            "events_parsed": 0, "events_inserted": 0, "afk_events_inserted": 0, "events_compacted": 0,
+        }
+        ingest_status.begin_import({})
+        ingest_status.set_phase("syncing")
+        try:
+            client = ActivityWatchClient(url, concurrency, page_size, transport=transport)
+            new_watermarks = {}
+            since_us = asyncio.run(_sync_buckets(client, watermarks, pd.Timedelta(hours=range_hours), summary, new_watermarks))
+            
+            with write_connection() as conn:
+                save_watermarks(conn, new_watermarks)
+            
+            finish_ingest(summary, since_us)
+        except Exception as e:
+            ingest_status.fail(f"Sync failed: {e}")
+            raise
+        finally:
+            ingest_status.end_import()
+        
+        logging.info(
+            f"Synced {summary['buckets_synced']} buckets from {url} in {summary['requests']} requests: "
+            f"{summary['events_inserted']} new events, {summary['afk_events_inserted']} new AFK events"
+        )
+        return summary
+
+async def _sync_buckets(
+    client: ActivityWatchClient, watermarks: dict[str, str], range_length: pd.Timedelta,
+    summary: dict[str, int], new_watermarks: dict[str, str],
+) -> int | None:
+    """
+    Fetches the new events of the window and AFK buckets, range by range, and inserts them in batches of
+    `ingest_batch_size` on another thread while the next ranges are fetched. Returns the earliest inserted timestamp.
+    """
+    async with client:
+        buckets = await client.get_buckets()
+        bucket_ids = sorted(bucket_id for bucket_id in buckets if WINDOW_BUCKET_PATTERN.match(bucket_id) or AFK_BUCKET_PATTERN.match(bucket_id))
+        # The newest event of a bucket is where its sync stops, AW returns events newest first
+        latest = await asyncio.gather(*(client.get_events(bucket_id, limit=1) for bucket_id in bucket_ids))
+        
+        ranges = []
+        for bucket_id, events in zip(bucket_ids, latest):
+            start = pd.to_datetime(watermarks.get(bucket_id) or buckets[bucket_id]["created"], utc=True)
+            end = pd.to_datetime(events[0]["timestamp"], utc=True) if events else start
+            if end <= start:
+                continue
+            host = buckets[bucket_id].get("hostname") or bucket_id.split("_", 1)[1]
+            platform = _get_platform(host, bucket_id)
+            edges = [*pd.date_range(start, end, freq=range_length, inclusive="left"), end]
+            if bucket_id not in watermarks:
+                # Events imported into AW can be older than the bucket, a range is split only if it has many of them
+                edges.insert(0, pd.Timestamp(0, tz="UTC"))
+            ranges += [(bucket_id, host, platform, range_start, range_end) for range_start, range_end in zip(edges, edges[1:])]
+            summary["buckets_synced"] += 1
+        
+        async def fetch(bucket_id: str, host: str, platform: str, range_start: pd.Timestamp, range_end: pd.Timestamp) -> pd.DataFrame:
+            pages = await client.get_events_between(bucket_id, range_start, range_end)
+            return _pages_to_batch(bucket_id, host, platform, pages, watermarks.get(bucket_id))
+        
+        # At most twice as many ranges as concurrent requests are fetched ahead of the inserts
+        pending, frames, buffered, since_us = set(), [], 0, None
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < 2 * client.concurrency:
+                pending.add(asyncio.ensure_future(fetch(*ranges[next_range])))
+                next_range += 1
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                frames.append(task.result())
+                buffered += len(frames[-1])
+            
+            if buffered and (buffered >= ingest_batch_size or not (pending or next_range < len(ranges))):
+                batch = pd.concat(frames, ignore_index=True)
+                since_us = await asyncio.to_thread(ingest_batch, batch, summary, new_watermarks, since_us)
+                frames, buffered = [], 0
+        
+        summary["requests"] = client.requests
+        return since_us
+
+def _pages_to_batch(bucket_id: str, host: str, platform: str, pages: list[tuple[pd.Timestamp, pd.Timestamp, list[dict]]], watermark: str = None) -> pd.DataFrame:
+    """
+    Events of AW API pages, from `ActivityWatchClient.get_events_between()`, as a batch of `BATCH_COLUMNS`.
+    Only those starting in the range of their page and after `watermark` are kept, with their timestamps
+    written like in the exports so they compare as strings with the watermarks.
+    """
+    events = [event for _, _, page in pages for event in page]
+    if not events:
+        return pd.DataFrame(columns=BATCH_COLUMNS)
+    
+    timestamps = pd.to_datetime([event["timestamp"] for event in events], utc=True, format="ISO8601").as_unit("ns")
+    lengths = [len(page) for _, _, page in pages]
+    keep = (
+        (timestamps.asi8 >= np.repeat([range_start.value for range_start, _, _ in pages], lengths))
+        & (timestamps.asi8 < np.repeat([range_end.value for _, range_end, _ in pages], lengths))
+    )
+    if watermark:
+        keep &= timestamps.asi8 > pd.Timestamp(watermark).value
+    events = [event for event, kept in zip(events, keep) if kept]
+    utc = timestamps[keep].tz_localize(None).to_numpy().astype("datetime64[us]")
+    
+    is_afk = bool(AFK_BUCKET_PATTERN.match(bucket_id))
+    data = [event.get("data") or {} for event in events]
+    batch = pd.DataFrame({
+        "timestamp": np.char.add(np.datetime_as_string(utc, unit="us"), "+00:00"),
+        "duration": [event.get("duration") for event in events],
+        "app": None if is_afk else [values.get("app") for values in data],
+        "title": None if is_afk else [values.get("title") for values in data],
+        "platform": platform,
+        "host": host,
+        "bucket": bucket_id,
+        "status": [values.get("status") for values in data] if is_afk else None,
+    }, columns=BATCH_COLUMNS)
+    
+    required = ["timestamp", "duration", "status"] if is_afk else ["timestamp", "duration", "app", "title"]
+    complete = batch[required].notna().all(axis=1)
+    if not complete.all():
+        logging.warning(f"Skipped {(~complete).sum()} events of {bucket_id} with missing data")
+    return batch[complete]
+
+#endregion
 
-def get_flatten_apps_to_title_map() -> list[dict[str, str]]:
-    """Loads the app title mapping from the JSON file."""    
+#region Live updates
+
+# (date, app, platform) rollup cells changed by `insert_events()`, and by a rebuild from a date on
+INSERTED_CELLS_SQL = """
+    SELECT DISTINCT s.local_date AS date, a.name AS app, p.name AS platform
+    FROM staged_events s
+    JOIN apps a ON a.id = s.app_id
+    JOIN platforms p ON p.id = s.platform_id
+"""
+SINCE_DATE_CELLS_SQL = "SELECT date, app, platform FROM daily_rollup WHERE date >= ?"
+
+def _get_changed_cells(conn: sqlite3.Connection, changed_sql: str, params: tuple = ()) -> dict[str, list[dict]]:
+    """
+    New totals of the `/daily_app_usage` and `/daily_os_usage` cells covering the daily rollup rows of `changed_sql`,
+    in hours rounded like the endpoints. Read in the transaction that changed them, published once it's committed.
+    """
+    app_rows = conn.execute(f"""
+        WITH changed AS ({changed_sql}),
+        cells AS (SELECT DISTINCT c.date, t.title FROM changed c JOIN app_titles t ON t.app = c.app)
+        SELECT k.date, k.title, SUM(r.duration), SUM(r.active_duration)
+        FROM cells k
+        JOIN app_titles t ON t.title = k.title
+        JOIN daily_rollup r ON r.date = k.date AND r.app = t.app
+        GROUP BY 1, 2
+    """, params).fetchall()
+    platform_rows = conn.execute(f"""
+        WITH changed AS ({changed_sql}),
+        cells AS (SELECT DISTINCT date, platform FROM changed)
+        SELECT k.date, k.platform, SUM(r.duration), SUM(r.active_duration)
+        FROM cells k
+        JOIN daily_rollup r ON r.date = k.date AND r.platform = k.platform
+        GROUP BY 1, 2
+    """, params).fetchall()
+    
+    def to_cells(rows: list[tuple], series_column: str) -> list[dict]:
+        return [
+            {"date": date, series_column: series, "duration": round(duration / 3600.0, 2), "active_duration": round((active_duration or 0) / 3600.0, 2)}
+            for date, series, duration, active_duration in rows
+        ]
+    return {"daily_app_usage": to_cells(app_rows, "app"), "daily_os_usage": to_cells(platform_rows, "platform")}
+
+#endregion
+
+#region Active time
+
+def update_active_time(since_us: int = None, chunk_size: int = 1_000_000):
+    """
+    Recomputes `events.active_duration`, the part of each window event that overlaps a "not-afk" interval
+    of the same host, for events that can overlap anything from `since_us` on (all if None),
+    then the rollups of the affected dates.
+    Hosts without any AFK data count their whole window time as active.
+    """
+    with read_connection() as conn:
+        # Window events starting before `since_us` can still reach into it
+        max_duration = conn.execute("SELECT COALESCE(MAX(duration), 0) FROM events").fetchone()[0]
+        since_us = -2**62 if since_us is None else since_us - int(max_duration * 1_000_000) - 1
+        
+        afk = pd.read_sql_query("""
+            SELECT host_id, afk, ts, ts + duration * 1000000 AS end_ts FROM afk_events
+            WHERE ts + duration * 1000000 >= ?
+        """, conn, params=(since_us,))
+        hosts_with_afk = {row[0] for row in conn.execute("SELECT DISTINCT host_id FROM afk_events")}
+        since_date = conn.execute("SELECT MIN(local_date) FROM events WHERE ts >= ?", (since_us,)).fetchone()[0]
+    
+    active_intervals = {
+        host_id: _merge_intervals(group["ts"].to_numpy(float), group["end_ts"].to_numpy(float))
+        for host_id, group in afk[afk["afk"] == 0].groupby("host_id")
+    }
+    
+    last_key, total, changed = (since_us, -1, -1), 0, 0
+    while True:
+        with read_connection() as conn:
+            chunk = pd.read_sql_query("""
+                SELECT ts, app_id, title_id, host_id, duration, active_duration AS stored_active_duration FROM events
+                WHERE (ts, app_id, title_id) > (?, ?, ?)
+                ORDER BY ts, app_id, title_id
+                LIMIT ?
+            """, conn, params=(*last_key, chunk_size))
+        if chunk.empty:
+            break
+        
+        chunk["active_duration"] = chunk["duration"]
+        for host_id, index in chunk.groupby("host_id").indices.items():
+            if host_id in hosts_with_afk:
+                starts = chunk["ts"].to_numpy(float)[index]
+                ends = starts + chunk["duration"].to_numpy()[index] * 1_000_000
+                covered = intersect_durations(starts, ends, *active_intervals.get(host_id, (np.empty(0), np.empty(0))))
+                chunk.iloc[index, chunk.columns.get_loc("active_duration")] = covered / 1_000_000
+        
+        # Only rows that changed are written, most of them when the new data only extends the dataset
+        updates = chunk[chunk["active_duration"].ne(chunk["stored_active_duration"])]
+        last_key = tuple(chunk[["ts", "app_id", "title_id"]].iloc[-1].tolist())
+        total += len(chunk)
+        if updates.empty:
+            continue
+        
+        with write_connection() as conn:
+            conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS staged_active (
+                ts INTEGER,
+                app_id INTEGER,
+                title_id INTEGER,
+                active_duration REAL,
+                PRIMARY KEY (ts, app_id, title_id)
+            ) WITHOUT ROWID
+            """)
+            conn.executemany(
+                "INSERT INTO staged_active (ts, app_id, title_id, active_duration) VALUES (?, ?, ?, ?)",
+                updates[["ts", "app_id", "title_id", "active_duration"]].itertuples(index=False, name=None),
+            )
+            conn.execute("""
+                UPDATE events SET active_duration = s.active_duration
+                FROM staged_active s
+                WHERE events.ts = s.ts AND events.app_id = s.app_id AND events.title_id = s.title_id
+            """)
+            conn.execute("DELETE FROM staged_active")
+        changed += len(updates)
+    
+    if changed:
+        rebuild_daily_rollup(since_date)
+    logging.info(f"Active time computed for {total} events, {changed} changed")
+
+def intersect_durations(starts: np.ndarray, ends: np.ndarray, cover_starts: np.ndarray, cover_ends: np.ndarray) -> np.ndarray:
+    """
+    Length of the part of each [start, end) interval covered by the sorted, disjoint `cover` intervals.
+    Covered length up to any point is the prefix sum of whole cover intervals before it plus the part of
+    the one it falls into, so each interval is two binary searches instead of a scan over the cover.
+    """
+    if len(cover_starts) == 0:
+        return np.zeros(len(starts))
+    
+    lengths = cover_ends - cover_starts
+    covered_before = np.concatenate(([0.0], np.cumsum(lengths)))
+    
+    def covered_until(points: np.ndarray) -> np.ndarray:
+        count = np.searchsorted(cover_starts, points, side="right")  # cover intervals starting at or before the point
+        last = np.maximum(count - 1, 0)
+        partial = np.clip(points - cover_starts[last], 0, lengths[last])
+        return np.where(count > 0, covered_before[last] + partial, 0.0)
+    
+    return np.maximum(covered_until(ends) - covered_until(starts), 0.0)
+
+def _merge_intervals(starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Union of [start, end) intervals as sorted, disjoint intervals."""
+    if len(starts) == 0:
+        return starts, ends
+    
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], np.maximum.accumulate(ends[order])
+    # A new interval starts wherever the previous ones all ended before it
+    is_first = np.concatenate(([True], starts[1:] > ends[:-1]))
+    first = np.flatnonzero(is_first)
+    last = np.concatenate((first[1:] - 1, [len(starts) - 1]))
+    return starts[first], ends[last]
+
+#endregion
+
+#region Compaction
+
+def compact_events(since_us: int = None, max_gap: float = compaction_max_gap, chunk_size: int = 1_000_000) -> dict[str, int | None]:
+    """
+    Merges runs of consecutive events of a host with the same app and title, where each event starts
+    at most `max_gap` seconds after the previous one ended, into their first event.
+    The merged event lasts from the first start to the last end, like AW merges its own heartbeats.
+    Only events that can merge with anything from `since_us` on are looked at (all if None).
+    Active time and rollups of the merged events have to be recomputed with `update_active_time()`
+    from the returned `first_merged_us` on.
+    """
+    max_gap_us = max_gap * 1_000_000
+    with read_connection() as conn:
+        host_ids = [row[0] for row in conn.execute("SELECT id FROM hosts")]
+        # The event before `since_us` ends at most `max_gap` before it
+        max_duration = conn.execute("SELECT COALESCE(MAX(duration), 0) FROM events").fetchone()[0]
+        since_us = -2**62 if since_us is None else since_us - int((max_duration + max_gap) * 1_000_000) - 1
+    
+    scanned, removed, first_merged_us = 0, 0, None
+    for host_id in host_ids:
+        start_us = since_us
+        while True:
+            with read_connection() as conn:
+                chunk = pd.read_sql_query("""
+                    SELECT ts, app_id, title_id, duration FROM events
+                    WHERE host_id = ? AND ts >= ?
+                    ORDER BY ts, app_id, title_id
+                    LIMIT ?
+                """, conn, params=(host_id, start_us, chunk_size))
+            if chunk.empty:
+                break
+            
+            ts = chunk["ts"].to_numpy()
+            ends = ts + chunk["duration"].fillna(0).to_numpy() * 1_000_000
+            app_ids, title_ids = chunk["app_id"].to_numpy(), chunk["title_id"].to_numpy()
+            continues = np.zeros(len(chunk), dtype=bool)
+            continues[1:] = (app_ids[1:] == app_ids[:-1]) & (title_ids[1:] == title_ids[:-1]) & (ts[1:] - ends[:-1] <= max_gap_us)
+            run_starts = np.flatnonzero(~continues)
+            
+            # The last run may go on in the next chunk, it's read again there unless it fills the whole chunk
+            if len(chunk) == chunk_size and run_starts[-1] > 0:
+                cut = run_starts[-1]
+                next_start_us = int(ts[cut])
+                chunk, ts, ends, continues, run_starts = chunk.iloc[:cut], ts[:cut], ends[:cut], continues[:cut], run_starts[:-1]
+            else:
+                next_start_us = int(ts[-1]) + 1
+            scanned += len(chunk)
+            
+            run_ends = np.maximum.reduceat(ends, run_starts)
+            is_merged = np.diff(np.append(run_starts, len(chunk))) > 1
+            if is_merged.any():
+                first_rows = run_starts[is_merged]
+                merged = chunk.iloc[first_rows][["ts", "app_id", "title_id"]]
+                merged["duration"] = (run_ends[is_merged] - ts[first_rows]) / 1_000_000
+                _write_compacted(merged, chunk.loc[continues, ["ts", "app_id", "title_id"]])
+                removed += int(continues.sum())
+                if first_merged_us is None:
+                    first_merged_us = int(ts[first_rows[0]])
+            start_us = next_start_us
+    
+    if removed:
+        logging.info(f"Compacted {scanned} events, {removed} merged into the previous one")
+    return {"events_scanned": scanned, "events_removed": removed, "first_merged_us": first_merged_us}
+
+def _write_compacted(merged: pd.DataFrame, removed: pd.DataFrame):
+    """Stores the new durations of merged events and deletes the events merged into them."""
+    with write_connection() as conn:
+        conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS staged_merged (
+            ts INTEGER,
+            app_id INTEGER,
+            title_id INTEGER,
+            duration REAL,
+            PRIMARY KEY (ts, app_id, title_id)
+        ) WITHOUT ROWID
+        """)
+        conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS staged_removed (
+            ts INTEGER,
+            app_id INTEGER,
+            title_id INTEGER,
+            PRIMARY KEY (ts, app_id, title_id)
+        ) WITHOUT ROWID
+        """)
+        conn.executemany(
+            "INSERT INTO staged_merged (ts, app_id, title_id, duration) VALUES (?, ?, ?, ?)",
+            merged.itertuples(index=False, name=None),
+        )
+        conn.executemany(
+            "INSERT INTO staged_removed (ts, app_id, title_id) VALUES (?, ?, ?)",
+            removed.itertuples(index=False, name=None),
+        )
+        # Active time of merged events is stale, NULL marks it for `update_active_time()`
+        conn.execute("""
+            UPDATE events SET duration = s.duration, active_duration = NULL
+            FROM staged_merged s
+            WHERE events.ts = s.ts AND events.app_id = s.app_id AND events.title_id = s.title_id
+        """)
+        conn.execute("DELETE FROM events WHERE (ts, app_id, title_id) IN (SELECT ts, app_id, title_id FROM staged_removed)")
+        conn.execute("DELETE FROM staged_merged")
+        conn.execute("DELETE FROM staged_removed")
+
+#endregion
+
+#region Sessions
+
+# Columns of events `extend_sessions()` takes, out of `events` or `staged_events`
+SESSION_EVENT_COLUMNS = "ts, ts + CAST(ROUND(COALESCE(duration, 0) * 1000000) AS INTEGER) AS end_ts, app_id, platform_id, host_id"
+# Lower edges of the session length histograms of `session_stats()`, in minutes. The last bin has no upper edge.
+SESSION_LENGTH_BINS = [0, 1, 5, 15, 30, 60, 120, 240]
+
+def extend_sessions(conn: sqlite3.Connection, events: pd.DataFrame) -> int:
+    """
+    Adds `events` (`SESSION_EVENT_COLUMNS`) to the `sessions` of their app on their host.
+    A session is a run of events where each one starts at most `session_gap` seconds after the previous ones ended.
+    Stored sessions the events can touch are read back and clustered with them as if they were single events,
+    which gives the same sessions as clustering all their events again, in whatever order events come in.
+    Returns the number of sessions written.
+    """
+    if events.empty:
+        return 0
+    gap_us = session_gap * 1_000_000
+    
+    # Stored sessions ending at most `gap` before the first new event of their app, and starting at most `gap` after its last end
+    conn.execute("""
+    CREATE TEMP TABLE IF NOT EXISTS staged_session_bounds (
+        host_id INTEGER,
+        app_id INTEGER,
+        first_ts INTEGER,
+        last_end_ts INTEGER,
+        PRIMARY KEY (host_id, app_id)
+    ) WITHOUT ROWID
+    """)
+    bounds = events.groupby(["host_id", "app_id"], as_index=False).agg(first_ts=("ts", "min"), last_end_ts=("end_ts", "max"))
+    conn.executemany(
+        "INSERT INTO staged_session_bounds (host_id, app_id, first_ts, last_end_ts) VALUES (?, ?, ?, ?)",
+        bounds.itertuples(index=False, name=None),
+    )
+    stored = pd.read_sql_query("""
+        SELECT s.start_ts AS ts, s.end_ts, s.app_id, s.platform_id, s.host_id
+        FROM staged_session_bounds b
+        JOIN sessions s ON s.host_id = b.host_id AND s.app_id = b.app_id AND s.end_ts >= b.first_ts - ?
+        WHERE s.start_ts <= b.last_end_ts + ?
+    """, conn, params=(gap_us, gap_us))
+    conn.execute("DELETE FROM staged_session_bounds")
+    
+    rows = pd.concat([stored, events[stored.columns]], ignore_index=True) if len(stored) else events[stored.columns]
+    rows = rows.sort_values(["host_id", "app_id", "ts"], kind="stable", ignore_index=True)
+    ts, app_ids, host_ids = rows["ts"].to_numpy(), rows["app_id"].to_numpy(), rows["host_id"].to_numpy()
+    # Latest end so far in the group, a session starts where it's more than `gap` before the next start
+    ended = rows.groupby(["host_id", "app_id"], sort=False)["end_ts"].cummax().to_numpy()
+    is_start = np.ones(len(rows), dtype=bool)
+    is_start[1:] = (host_ids[1:] != host_ids[:-1]) | (app_ids[1:] != app_ids[:-1]) | (ts[1:] - ended[:-1] > gap_us)
+    starts = np.flatnonzero(is_start)
+    
+    conn.executemany(
+        "DELETE FROM sessions WHERE host_id = ? AND app_id = ? AND start_ts = ?",
+        stored[["host_id", "app_id", "ts"]].itertuples(index=False, name=None),
+    )
+    # A host runs one platform, the one of the first event is the session's
+    platform_ids = rows["platform_id"].to_numpy()
+    end_ts = np.maximum.reduceat(rows["end_ts"].to_numpy(), starts)
+    # Local date of the first event, computed the same way as the one stored with it
+    hosts = pd.Series(host_ids[starts]).map(dict(conn.execute("SELECT id, name FROM hosts")))
+    platforms = pd.Series(platform_ids[starts]).map(dict(conn.execute("SELECT id, name FROM platforms")))
+    local_date, _ = _to_local_time(pd.Series(ts[starts]), hosts, platforms)
+    conn.executemany(
+        "INSERT INTO sessions (host_id, app_id, start_ts, end_ts, local_date, platform_id) VALUES (?, ?, ?, ?, ?, ?)",
+        zip(host_ids[starts].tolist(), app_ids[starts].tolist(), ts[starts].tolist(), end_ts.tolist(), local_date.tolist(), platform_ids[starts].tolist()),
+    )
+    return len(starts)
+
+def rebuild_sessions(chunk_size: int = 1_000_000):
+    """Recomputes `sessions` out of all stored events with the current `session_gap`, a chunk of events at a time."""
+    logging.info(f"Building sessions with a {session_gap:g} s gap...")
+    total = 0
+    with write_connection() as conn:
+        conn.execute("DELETE FROM sessions")
+        last_key = (-2**62, -1, -1)
+        while True:
+            # All integers, read as one array rather than converted column by column
+            rows = conn.execute(f"""
+                SELECT {SESSION_EVENT_COLUMNS}, title_id FROM events
+                WHERE (ts, app_id, title_id) > (?, ?, ?)
+                ORDER BY ts, app_id, title_id
+                LIMIT ?
+            """, (*last_key, chunk_size)).fetchall()
+            if not rows:
+                break
+            chunk = pd.DataFrame(np.array(rows, dtype=np.int64), columns=["ts", "end_ts", "app_id", "platform_id", "host_id", "title_id"])
+            extend_sessions(conn, chunk)
+            last_key = rows[-1][0], rows[-1][2], rows[-1][5]
+            total += len(rows)
+        
+        conn.execute("""
+            INSERT INTO meta (key, value) VALUES ('session_gap', ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        """, (session_gap,))
+        _bump_dataset_version(conn)
+        sessions = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    logging.info(f"Sessions built out of {total} events, {sessions} sessions")
+
+def query_sessions(
+    start: str = None,
+    end: str = None,
+    app_titles: list[str] = None,
+    platforms: list[str] = None,
+    min_length: float = 0,
+    cursor: str = None,
+    limit: int = 1000,
+) -> tuple[list[dict], str | None]:
+    """
+    One page of sessions in start order, filtered by start time (start inclusive, end exclusive),
+    application titles (or executables missing from the title map), platforms and shortest length in minutes.
+    Pages work like in `query_events()`.
+    """
+    where_clauses, params = [], []
+    if start:
+        where_clauses.append("s.start_ts >= ?")
+        params.append(_parse_time_us(start))
+    if end:
+        where_clauses.append("s.start_ts < ?")
+        params.append(_parse_time_us(end))
+    if app_titles:
+        title_maps.refresh()  # `app_titles` has to be up to date for the filter
+        where_clauses.append(f"""
+            s.app_id IN (SELECT a.id FROM apps a LEFT JOIN app_titles t ON t.app = a.name WHERE COALESCE(t.title, a.name) IN ({','.join(['?'] * len(app_titles))}))
+        """)
+        params += app_titles
+    if platforms:
+        where_clauses.append(f"s.platform_id IN (SELECT id FROM platforms WHERE name IN ({','.join(['?'] * len(platforms))}))")
+        params += platforms
+    if min_length:
+        where_clauses.append("s.end_ts - s.start_ts >= ?")
+        params.append(min_length * 60_000_000)
+    if cursor:
+        where_clauses.append("(s.start_ts, s.host_id, s.app_id) > (?, ?, ?)")
+        params += _decode_cursor(cursor)
+    where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+    
+    query = f"""
+        SELECT
+            {_iso_sql('s.start_ts')} AS start,
+            {_iso_sql('s.end_ts')} AS end,
+            ROUND((s.end_ts - s.start_ts) / 60000000.0, 2) AS length,
+            a.name AS app,
+            COALESCE(t.title, a.name) AS title,
+            p.name AS platform,
+            h.name AS host,
+            s.start_ts, s.host_id, s.app_id
+        FROM sessions s
+        JOIN apps a ON a.id = s.app_id
+        JOIN platforms p ON p.id = s.platform_id
+        JOIN hosts h ON h.id = s.host_id
+        LEFT JOIN app_titles t ON t.app = a.name
+        {where_sql}
+        ORDER BY s.start_ts, s.host_id, s.app_id
+        LIMIT ?
+    """
+    params.append(limit + 1)  # the extra row tells whether there is a next page
+    
+    with read_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+    rows, more = rows[:limit], len(rows) > limit
+    
+    sessions = [dict(zip(("start", "end", "length", "app", "title", "platform", "host"), row[:7])) for row in rows]
+    next_cursor = _encode_cursor(rows[-1][7:]) if more else None
+    return sessions, next_cursor
+
+#endregion
+
+#region Raw events
+
+def query_events(
+    start: str = None,
+    end: str = None,
+    apps: list[str] = None,
+    titles: list[str] = None,
+    title_contains: str = None,
+    platforms: list[str] = None,
+    cursor: str = None,
+    limit: int = 1000,
+) -> tuple[list[dict], str | None]:
+    """
+    One page of raw events in (timestamp, app, title) order, filtered by time range (start inclusive, end exclusive),
+    executables, exact titles, title substring and platforms.
+    Pages are keyset based: pass the returned cursor to get the next page, None means there is nothing left.
+    """
+    where_clauses, params = _get_events_filter(start, end, apps, titles, title_contains, platforms)
+    if cursor:
+        where_clauses.append("(e.ts, e.app_id, e.title_id) > (?, ?, ?)")
+        params += _decode_cursor(cursor)
+    where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+    
+    query = f"""
+        SELECT
+            {_iso_sql('e.ts')} AS timestamp,
+            e.duration,
+            a.name AS app,
+            t.name AS title,
+            p.name AS platform,
+            e.ts, e.app_id, e.title_id
+        FROM events e
+        JOIN apps a ON a.id = e.app_id
+        JOIN titles t ON t.id = e.title_id
+        JOIN platforms p ON p.id = e.platform_id
+        {where_sql}
+        ORDER BY e.ts, e.app_id, e.title_id
+        LIMIT ?
+    """
+    params.append(limit + 1)  # the extra row tells whether there is a next page
+    
+    with read_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+    rows, more = rows[:limit], len(rows) > limit
+    
+    events = [dict(zip(EVENT_COLUMNS, row[:5])) for row in rows]
+    next_cursor = _encode_cursor(rows[-1][5:]) if more else None
+    return events, next_cursor
+
+def iter_events(chunk_size: int = 5000, cursor: str = None, **filters):
+    """
+    Yields all events matching `query_events()` filters in chunks of `chunk_size`, starting after `cursor`.
+    Each chunk is its own keyset query, so no read transaction stays open between chunks.
+    """
+    while True:
+        events, cursor = query_events(**filters, cursor=cursor, limit=chunk_size)
+        if events:
+            yield events
+        if cursor is None:
+            return
+
+def _get_events_filter(start, end, apps, titles, title_contains, platforms) -> tuple[list[str], list]:
+    where_clauses, params = [], []
+    if start:
+        where_clauses.append("e.ts >= ?")
+        params.append(_parse_time_us(start))
+    if end:
+        where_clauses.append("e.ts < ?")
+        params.append(_parse_time_us(end))
+    if apps:
+        where_clauses.append(f"e.app_id IN (SELECT id FROM apps WHERE name IN ({','.join(['?'] * len(apps))}))")
+        params += apps
+    if titles:
+        where_clauses.append(f"e.title_id IN (SELECT id FROM titles WHERE name IN ({','.join(['?'] * len(titles))}))")
+        params += titles
+    if title_contains:
+        escaped = title_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where_clauses.append("e.title_id IN (SELECT id FROM titles WHERE name LIKE ? ESCAPE '\\')")
+        params.append(f"%{escaped}%")
+    if platforms:
+        where_clauses.append(f"e.platform_id IN (SELECT id FROM platforms WHERE name IN ({','.join(['?'] * len(platforms))}))")
+        params += platforms
+    return where_clauses, params
+
+def _parse_time_us(value: str) -> int:
+    """ISO date or timestamp to epoch microseconds, naive values are taken as UTC."""
     try:
-        with open(flatten_apps_to_title_map, "r") as json_file:
-            app_title_map = json.load(json_file)
-        logging.info(f"Successfully loaded Apps to title mapping from {flatten_apps_to_title_map}")
-        return app_title_map
-    except IOError as e:
-        logging.error(f"Failed to load Apps to title mapping: {e}")
-        return []
+        timestamp = pd.Timestamp(value)
+    except ValueError as e:
+        raise ValueError(f"Invalid timestamp \"{value}\": {e}")
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return timestamp.value // 1000
 
-def get_flatten_title_to_apps_map() -> list[dict[str, str]]:
-    """Loads the app title mapping from the JSON file."""    
+def _encode_cursor(key: tuple[int, int, int]) -> str:
+    return base64.urlsafe_b64encode(":".join(map(str, key)).encode()).decode()
+
+def _decode_cursor(cursor: str) -> list[int]:
     try:
-        with open(flatten_title_to_apps_map, "r") as json_file:
-            app_title_map_flatten = json.load(json_file)
-        logging.info(f"Successfully loaded Title to apps mapping from {flatten_title_to_apps_map}")
-        return app_title_map_flatten
-    except IOError as e:
-        logging.error(f"Failed to load Title to apps mapping: {e}")
-        return []
+        key = [int(part) for part in base64.urlsafe_b64decode(cursor.encode()).decode().split(":")]
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if len(key) != 3:
+        raise ValueError("Invalid cursor")
+    return key
+
+#endregion
+
+#region Get functions
 
-def get_spent_time() -> pd.DataFrame:
-    """Queries the database for total time spent on each application."""
+def get_flatten_apps_to_title_map() -> dict[str, str]:
+    """Returns the app -> title mapping, loaded once by the registry."""    
+    return title_maps.apps_to_title()
+
+def get_flatten_title_to_apps_map() -> dict[str, list[str]]:
+    """Returns the title -> app list mapping, loaded once by the registry."""    
+    return title_maps.title_to_apps()
+
+def get_spent_time(active: bool = False) -> pd.DataFrame:
+    """Queries the database for total time spent on each application, only while not AFK if `active`."""
     logging.info("Calculating total time spent.")
-    result = spent_time()
+    result = spent_time(active=active)
     return result
 
-def get_daily_app_usage(app_titles: list[str] = ["Zen Browser", "Google Chrome"]) -> pd.DataFrame:
+def get_daily_app_usage(app_titles: list[str] = ["Zen Browser", "Google Chrome"], active: bool = False, columnar: bool = False) -> pd.DataFrame | dict:
     """Calculates the time spent on each application each day"""
     logging.info(f"Calculating daily app usage for {app_titles}.")
-    result = daily_app_usage(app_titles)
+    if columnar:
+        return to_columnar(daily_app_usage_wide(app_titles, active=active))
+    result = daily_app_usage(app_titles, active=active)
     return result
 
-def get_daily_os_usage() -> pd.DataFrame:
+def get_daily_os_usage(active: bool = False, columnar: bool = False) -> pd.DataFrame | dict:
     """Calculates the time spent on each OS each day"""
     logging.info("Calculating daily OS usage.")
-    result = daily_os_usage()
+    if columnar:
+        return to_columnar(daily_os_usage_wide(active=active))
+    result = daily_os_usage(active=active)
     return result
 
+def get_usage(
+    grain: str = "daily", by: str = "app", app_titles: list[str] = None,
+    start_date: str = None, end_date: str = None, active: bool = False, columnar: bool = False,
+) -> pd.DataFrame | dict:
+    """Calculates the time spent on each application title or each OS per hour, day, week or month"""
+    logging.info(f"Calculating {grain} usage by {by}.")
+    wide = usage_wide(grain, by, app_titles, start_date, end_date, active)
+    if columnar:
+        return to_columnar(wide, TIME_GRAINS[grain][2])
+    return _wide_to_long(wide, by)
+
+def get_usage_heatmap(by: str = "app", app_titles: list[str] = None, start_date: str = None, end_date: str = None, active: bool = False) -> dict:
+    """Calculates the time spent on each application title or each OS by weekday and hour of the day"""
+    logging.info(f"Calculating usage heatmap by {by}.")
+    return usage_heatmap(by, app_titles, start_date, end_date, active)
+
+def get_category_usage(start_date: str = None, end_date: str = None, active: bool = False, top: int = 5) -> list[dict]:
+    """Calculates the time spent in each app category"""
+    logging.info("Calculating category usage.")
+    return category_usage(start_date, end_date, active, top)
+
+def get_daily_category_usage(start_date: str = None, end_date: str = None, active: bool = False, columnar: bool = False) -> pd.DataFrame | dict:
+    """Calculates the time spent in each app category each day"""
+    logging.info("Calculating daily category usage.")
+    wide = usage_wide("daily", "category", None, start_date, end_date, active)
+    if columnar:
+        return to_columnar(wide)
+    return _wide_to_long(wide, "category")
+
+def get_title_search(query: str, start_date: str = None, end_date: str = None, active: bool = False, top: int = 5) -> dict:
+    """Time spent on windows whose title matches the full-text `query`"""
+    logging.info(f"Searching titles for {query!r}.")
+    return title_search(query, start_date, end_date, active, top)
+
+def get_dashboard(
+    app_titles: list[str], start_date: str = None, end_date: str = None, active: bool = False, columnar: bool = False,
+) -> dict:
+    """Calculates everything the dashboard page shows, in one response"""
+    logging.info("Calculating dashboard.")
+    return {"dataset_metadata": get_dataset_metadata(), **dashboard(app_titles, start_date, end_date, active, columnar)}
+
+def get_session_stats(app_titles: list[str] = None, start_date: str = None, end_date: str = None) -> dict:
+    logging.info("Calculating session stats.")
+    return session_stats(app_titles, start_date, end_date)
+
 def get_dataset_metadata() -> dict[str, str | int]:
     """Fetch metadata about the dataset, such as the date range."""
     logging.info("Fetching dataset metadata")
     
-    query = """
+    query = f"""
     SELECT 
-        MIN(timestamp) AS start_date, 
-        MAX(timestamp) AS end_date, 
-        COUNT(timestamp) AS total_records 
-    FROM events
+        (SELECT MIN(ts) FROM events) AS start_date, 
+        (SELECT MAX(ts) FROM events) AS end_date, 
+        ({storage.event_count_sql}) AS total_records 
     """
-    with sqlite3.connect(database_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute(query)
-        row = cursor.fetchone()
+    row = storage.read_sql(query).iloc[0]
     
-    if row:
+    if pd.notna(row['start_date']):
         metadata = {
-            "start_date": row[0],
-            "end_date": row[1],
-            "total_records": row[2]  # SQLite returns count as int
+            "start_date": _from_epoch_us(int(row['start_date'])),
+            "end_date": _from_epoch_us(int(row['end_date'])),
+            "total_records": int(row['total_records'])
         }
     else:
         metadata = {
@@ -439,161 +2239,465 @@ def get_dataset_metadata() -> dict[str, str | int]:
 #TODO: I thinking about the need in this functions
 # Why not merge them with `get_spent_time()` and `get_daily_app_usage()`?
 
-def daily_app_usage(app_titles: str = ['Zen Browser', 'Google Chrome'], start_date: str = None, end_date: str = None) -> pd.DataFrame:
+def daily_app_usage(app_titles: str = ['Zen Browser', 'Google Chrome'], start_date: str = None, end_date: str = None, active: bool = False) -> pd.DataFrame:
     """
     Calculates the daily time spent on a specified application.
     """
-    title_map = get_flatten_title_to_apps_map()
-    apps_map = get_flatten_apps_to_title_map()
-    
-    all_execs = []
-    for app_title in app_titles:
-        all_execs += title_map.get(app_title, [app_title])
+    return _wide_to_long(daily_app_usage_wide(app_titles, start_date, end_date, active), 'app')
+
+def daily_app_usage_wide(app_titles: list[str] = ['Zen Browser', 'Google Chrome'], start_date: str = None, end_date: str = None, active: bool = False) -> pd.DataFrame:
+    """
+    Daily hours per application title, one column per title and one row per day, missing days filled with 0.
+    Only time while not AFK if `active`.
+    """
+    title_maps.refresh()  # `app_titles` has to be up to date for the join
     
-    placeholders = ','.join(['?'] * len(all_execs)) # question marks for query string 
-    params = all_execs
+    placeholders = ','.join(['?'] * len(app_titles)) # question marks for query string 
+    params = list(app_titles)
     
-    where_clauses = [f"app IN ({placeholders})"]
-    if start_date:
-        where_clauses.append("timestamp >= ?")
-        params.append(start_date)
-    if end_date:
-        where_clauses.append("timestamp <= ?")
-        params.append(end_date)
+    where_clauses = [f"t.title IN ({placeholders})"]
+    date_clauses, date_params = storage.date_filter(start_date, end_date)
+    where_clauses.extend(date_clauses)
+    params.extend(date_params)
     where_sql = f"WHERE {' AND '.join(where_clauses)}"
 
+    # Executables are mapped to titles and summed up by the join
     query = f"""
         SELECT
-            strftime('%Y-%m-%d', timestamp) AS date,
-            app,
-            SUM(duration) AS duration
-        FROM events
+            r.date,
+            t.title AS app,
+            SUM(r.{_duration_column(active)}) AS duration
+        FROM daily_rollup r
+        JOIN app_titles t ON t.app = r.app
         {where_sql}
-        GROUP BY date, app
-        ORDER BY date ASC
+        GROUP BY r.date, t.title
+        ORDER BY r.date ASC, t.title ASC
     """
 
-    with sqlite3.connect(database_path) as conn:
-        df = pd.read_sql_query(query, conn, params=params)
+    df = storage.read_sql(query, params)
 
-    if df.empty:
-        return df
+    return _to_period_wide(df, 'app')
+
+def daily_os_usage(start_date: str = None, end_date: str = None, active: bool = False) -> pd.DataFrame:
+    """
+    Calculates the daily time spent on different OS.
+    """
+    return _wide_to_long(daily_os_usage_wide(start_date, end_date, active), 'platform')
+
+def daily_os_usage_wide(start_date: str = None, end_date: str = None, active: bool = False) -> pd.DataFrame:
+    """
+    Daily hours per OS, one column per OS and one row per day, missing days filled with 0.
+    Only time while not AFK if `active`.
+    """
+    where_clauses, params = storage.date_filter(start_date, end_date)
+    where_sql = f"WHERE {' AND '.join(where_clauses)}"
+
+    query = f"""
+        SELECT
+            r.date,
+            r.platform,
+            SUM(r.{_duration_column(active)}) AS duration
+        FROM daily_rollup r
+        { where_sql if where_clauses  else '' }
+        GROUP BY r.date, r.platform
+        ORDER BY r.date ASC
+    """
+
+    df = storage.read_sql(query, params)
+
+    return _to_period_wide(df, 'platform')
+
+def usage_wide(
+    grain: str = "daily", by: str = "app", app_titles: list[str] = None,
+    start_date: str = None, end_date: str = None, active: bool = False,
+) -> pd.DataFrame:
+    """
+    Hours per application title (or per OS if `by` is "platform", per app category if "category") and period of `grain`,
+    one row per period start, missing periods filled with 0. Titles are limited to `app_titles` if given,
+    time to the one while not AFK if `active`.
+    """
+    table, freq, _ = TIME_GRAINS[grain]
+    series_sql, join_sql, where_sql, params = _get_rollup_filter(by, app_titles, start_date, end_date)
     
-    # Map executables back to titles
-    df['app'] = df['app'].map(apps_map)
+    query = f"""
+        SELECT
+            {storage.period_sql[grain]} AS date,
+            {series_sql} AS {by},
+            SUM(r.{_duration_column(active)}) AS duration
+        FROM {table} r
+        {join_sql}
+        {where_sql}
+        GROUP BY 1, 2
+    """
+    df = storage.read_sql(query, params)
     
-    # Aggregate by title+date (sum diff executables)
-    df = df.groupby(['date', 'app'], as_index=False)['duration'].sum()
+    return _to_period_wide(df, by, freq)
 
-    # Convert duration to hours + round
-    df['duration'] = (df['duration'] / 3600.0).round(2)
-    df['date'] = pd.to_datetime(df['date'])
+def usage_heatmap(by: str = "app", app_titles: list[str] = None, start_date: str = None, end_date: str = None, active: bool = False) -> dict:
+    """
+    Hours per weekday (Monday first) and hour of the day, a 7 x 24 matrix for each application title
+    (or each OS if `by` is "platform", each app category if "category"). Titles are limited to `app_titles` if given,
+    time to the one while not AFK if `active`.
+    """
+    series_sql, join_sql, where_sql, params = _get_rollup_filter(by, app_titles, start_date, end_date)
     
-    # Fill in missing dates using Pandas
-    min_date = df['date'].min()
-    max_date = df['date'].max()
-    full_range = pd.date_range(start=min_date, end=max_date, freq='D')
+    query = f"""
+        SELECT
+            {series_sql} AS series,
+            {storage.weekday_sql} AS weekday,
+            r.hour,
+            SUM(r.{_duration_column(active)}) AS duration
+        FROM hourly_rollup r
+        {join_sql}
+        {where_sql}
+        GROUP BY 1, 2, 3
+    """
+    df = storage.read_sql(query, params)
     
-    # Reindex separately per app, then concat back
-    df_filled = []
-    for app, group in df.groupby('app'):
-        g = group.set_index('date').reindex(full_range).fillna(0).reset_index()
-        g['app'] = app
-        g = g.rename(columns={'index': 'date'})
-        df_filled.append(g)
-
-    df_result = pd.concat(df_filled, ignore_index=True)
-    return df_result
+    # Every (series, weekday, hour) is one row, so the matrices are filled with a single scatter
+    codes, names = pd.factorize(df['series'], sort=True)
+    matrices = np.zeros((len(names), len(WEEKDAYS), 24))
+    weekdays, hours = df['weekday'].to_numpy(dtype=np.int64), df['hour'].to_numpy(dtype=np.int64)  # object dtype if empty
+    matrices[codes, weekdays, hours] = df['duration'].to_numpy(dtype=float) / 3600.0
+    matrices = matrices.round(2)
+    
+    return {
+        "weekdays": WEEKDAYS,
+        "hours": list(range(24)),
+        "series": {str(name): matrices[i].tolist() for i, name in enumerate(names)},
+    }
 
-def daily_os_usage(start_date: str = None, end_date: str = None) -> pd.DataFrame:
+def category_usage(start_date: str = None, end_date: str = None, active: bool = False, top: int = 5) -> list[dict]:
     """
-    Calculates the daily time spent on different OS.
+    Hours and events per category, biggest first, with the `top` application titles of each.
+    Apps without a category are counted as "Uncategorized". Only time while not AFK if `active`.
     """
-    params = []
-    where_clauses = []
-    if start_date:
-        where_clauses.append("timestamp >= ?")
-        params.append(start_date)
-    if end_date:
-        where_clauses.append("timestamp <= ?")
-        params.append(end_date)
-    where_sql = f"WHERE {' AND '.join(where_clauses)}"
-
+    _, join_sql, where_sql, params = _get_rollup_filter("category", None, start_date, end_date)
+    
+    # One pass over the rollup, per (category, title). Apps missing from the title map keep their executable name.
+    title_maps.refresh()  # `app_titles` has to be up to date for the join
     query = f"""
         SELECT
-            strftime('%Y-%m-%d', timestamp) AS date,
-            platform,
-            SUM(duration) AS duration
-        FROM events
-        { where_sql if where_clauses  else '' }
-        GROUP BY date, platform
-        ORDER BY date ASC
+            COALESCE(c.category, '{UNCATEGORIZED}') AS category,
+            COALESCE(t.title, r.app) AS app,
+            SUM(r.{_duration_column(active)}) AS duration,
+            SUM(r.event_count) AS event_count
+        FROM daily_rollup r
+        {join_sql}
+        LEFT JOIN app_titles t ON t.app = r.app
+        {where_sql}
+        GROUP BY 1, 2
     """
+    df = storage.read_sql(query, params)
+    
+    df['duration'] = df['duration'].astype(float).fillna(0.0)
+    df = df.sort_values('duration', ascending=False)
+    totals = df.groupby('category', sort=False).agg(duration=('duration', 'sum'), event_count=('event_count', 'sum'))
+    totals = totals.sort_values('duration', ascending=False)
+    apps_by_category = dict(list(df.groupby('category', sort=False)))
+    
+    return [
+        {
+            "category": category,
+            "duration": round(duration / 3600.0, 2),
+            "event_count": int(event_count),
+            "top_apps": [
+                {"app": app, "duration": round(app_duration / 3600.0, 2)}
+                for app, app_duration in zip(apps_by_category[category]['app'][:top], apps_by_category[category]['duration'][:top])
+            ],
+        }
+        for category, duration, event_count in zip(totals.index, totals['duration'], totals['event_count'])
+    ]
 
-    with sqlite3.connect(database_path) as conn:
-        df = pd.read_sql_query(query, conn, params=params)
+def _duration_column(active: bool) -> str:
+    """Rollup column to sum up: all window time, or only the part of it while not AFK."""
+    return "active_duration" if active else "duration"
+
+def _get_rollup_filter(by: str, app_titles: list[str] = None, start_date: str = None, end_date: str = None) -> tuple[str, str, str, list]:
+    """Series expression, join and WHERE clause with its params for a rollup table aliased `r`."""
+    where_clauses = []
+    params = []
+    
+    if by == "app":
+        title_maps.refresh()  # `app_titles` has to be up to date for the join
+        series_sql, join_sql = "t.title", "JOIN app_titles t ON t.app = r.app"
+        if app_titles:
+            where_clauses.append(f"t.title IN ({','.join(['?'] * len(app_titles))})")
+            params.extend(app_titles)
+    elif by == "platform":
+        series_sql, join_sql = "r.platform", ""
+    elif by == "category":
+        series_sql, join_sql = f"COALESCE(c.category, '{UNCATEGORIZED}')", "LEFT JOIN app_categories c ON c.app = r.app"
+        if app_titles:
+            title_maps.refresh()
+            join_sql += " JOIN app_titles t ON t.app = r.app"
+            where_clauses.append(f"t.title IN ({','.join(['?'] * len(app_titles))})")
+            params.extend(app_titles)
+    else:
+        raise ValueError(f"Unknown series {by!r}, expected 'app', 'platform' or 'category'")
+    
+    date_clauses, date_params = storage.date_filter(start_date, end_date)
+    where_clauses.extend(date_clauses)
+    params.extend(date_params)
+    
+    where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+    return series_sql, join_sql, where_sql, params
 
+def _to_period_wide(df: pd.DataFrame, series_column: str, freq: str = 'D') -> pd.DataFrame:
+    """
+    Turns (date, series, duration in seconds) rows into a period x series frame of hours.
+    Missing periods of all series are filled in one reindex.
+    """
     if df.empty:
-        return df
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='date'), dtype=float)
     
     # Convert duration to hours + round
     df['duration'] = (df['duration'] / 3600.0).round(2)
     df['date'] = pd.to_datetime(df['date'])
     
-    # Fill in missing dates using Pandas
-    min_date = df['date'].min()
-    max_date = df['date'].max()
-    full_range = pd.date_range(start=min_date, end=max_date, freq='D')
-    
-    df_filled = []
-    for app, group in df.groupby('platform'):
-        g = group.set_index('date').reindex(full_range).fillna(0).reset_index()
-        g['platform'] = app
-        g = g.rename(columns={'index': 'date'})
-        df_filled.append(g)
+    wide = df.pivot(index='date', columns=series_column, values='duration')
+    full_range = pd.date_range(start=wide.index.min(), end=wide.index.max(), freq=freq, name='date')
+    return wide.reindex(full_range).fillna(0.0)
 
-    df_result = pd.concat(df_filled, ignore_index=True)
-    return df_result
+def _wide_to_long(wide: pd.DataFrame, series_column: str) -> pd.DataFrame:
+    """Back to (date, series, duration) rows, grouped by series like the original per-series concat."""
+    if wide.empty:
+        return pd.DataFrame(columns=['date', series_column, 'duration'])
+    
+    n_dates, n_series = wide.shape
+    return pd.DataFrame({
+        'date': np.tile(wide.index.to_numpy(), n_series),
+        series_column: np.repeat(wide.columns.to_numpy(), n_dates),
+        'duration': wide.to_numpy().T.ravel(),
+    })
 
-def spent_time(start_date: str = None, end_date: str = None, min_duration: float = 10.0) -> pd.DataFrame:
-    """Calculates the total time spent on each application"""
-    where_clauses = []
-    params = []
+def to_columnar(wide: pd.DataFrame, date_format: str = '%Y-%m-%d') -> dict:
+    """Compact shape of a date x series frame: one shared date axis and a list of values per series."""
+    return {
+        "dates": wide.index.strftime(date_format).tolist(),
+        "series": {str(name): wide[name].tolist() for name in wide.columns},
+    }
 
+def title_search(query: str, start_date: str = None, end_date: str = None, active: bool = False, top: int = 5) -> dict:
+    """
+    Totals of the events whose title matches `query`, in FTS5 syntax: words match anywhere in the title,
+    `proj*` is a prefix, `"main.py - proj"` a phrase, and AND / OR / NOT combine them.
+    Returns the matched hours and events, the `top` titles of each application title, and hours per day.
+    Raises ValueError if the query is empty or invalid.
+    """
+    if not query or not query.strip():
+        raise ValueError("Empty search query")
+    
+    where_clauses = ["e.title_id IN (SELECT rowid FROM titles_fts WHERE titles_fts MATCH ?)"]
+    params = [query]
     if start_date:
-        where_clauses.append("timestamp >= ?")
-        params.append(start_date)
+        where_clauses.append("e.local_date >= ?")
+        params.append(start_date[:10])
     if end_date:
-        where_clauses.append("timestamp <= ?")
-        params.append(end_date)
+        where_clauses.append("e.local_date <= ?")
+        params.append(end_date[:10])
+    
+    # Aggregated on the title index, names are only looked up for the titles in the response
+    sql = f"""
+        SELECT e.title_id, e.local_date AS date, e.app_id, SUM(e.{_duration_column(active)}) AS duration, COUNT(*) AS event_count
+        FROM events e
+        WHERE {' AND '.join(where_clauses)}
+        GROUP BY e.title_id, e.local_date, e.app_id
+    """
+    title_maps.refresh()  # `app_titles` has to be up to date for the join
+    with read_connection() as conn:
+        try:
+            df = pd.read_sql_query(sql, conn, params=params)
+        except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+            # pandas wraps the SQLite error with the whole statement, only SQLite's message is for the client
+            raise ValueError(f"Invalid search query {query!r}: {e.__cause__ or e}") from e
+        app_names = dict(conn.execute("""
+            SELECT a.id, COALESCE(t.title, a.name) FROM apps a
+            LEFT JOIN app_titles t ON t.app = a.name
+        """))
+    
+    df['duration'] = df['duration'].fillna(0.0)
+    df['app'] = df['app_id'].map(app_names)
+    
+    by_title = df.groupby(['app', 'title_id'], as_index=False)['duration'].sum()
+    by_title = by_title.sort_values('duration', ascending=False)
+    top_titles = by_title.groupby('app', sort=False).head(top)
+    with read_connection() as conn:
+        ids = top_titles['title_id'].tolist()
+        title_names = dict(conn.execute(f"SELECT id, name FROM titles WHERE id IN ({','.join(['?'] * len(ids))})", ids))
+    
+    app_totals = by_title.groupby('app')['duration'].sum().sort_values(ascending=False)
+    titles_by_app = dict(list(top_titles.groupby('app')))
+    apps = []
+    for app, duration in app_totals.items():
+        titles = titles_by_app[app]
+        apps.append({
+            "app": app,
+            "duration": round(duration / 3600.0, 2),
+            "top_titles": [
+                {"title": title_names[title_id], "duration": round(title_duration / 3600.0, 2)}
+                for title_id, title_duration in zip(titles['title_id'], titles['duration'])
+            ],
+        })
+    
+    daily = _to_period_wide(df.groupby('date', as_index=False)['duration'].sum().assign(series='matched'), 'series')
+    
+    return {
+        "query": query,
+        "titles_matched": int(df['title_id'].nunique()),
+        "duration": round(df['duration'].sum() / 3600.0, 2),
+        "event_count": int(df['event_count'].sum()),
+        "apps": apps,
+        "daily": [
+            {"date": date, "duration": duration}
+            for date, duration in zip(daily.index.strftime('%Y-%m-%d'), daily.get('matched', []))
+        ],
+    }
 
+def spent_time(start_date: str = None, end_date: str = None, min_duration: float = 10.0, active: bool = False) -> pd.DataFrame:
+    """Calculates the total time spent on each application, only while not AFK if `active`"""
+    where_clauses, params = storage.date_filter(start_date, end_date)
     where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
 
+    # Apps under `min_duration` are dropped before grouping them by title,
+    # `app` is the biggest executable of the title
     query = f"""
-        SELECT app, SUM(duration) AS duration
-        FROM events
-        {where_sql}
-        GROUP BY app
-        HAVING SUM(duration) >= ?
+        WITH app_totals AS (
+            SELECT r.app, SUM(r.{_duration_column(active)}) AS duration
+            FROM daily_rollup r
+            {where_sql}
+            GROUP BY r.app
+            HAVING SUM(r.{_duration_column(active)}) >= ?
+        )
+        SELECT
+            COALESCE(t.title, 'Unknown') AS title,
+            SUM(a.duration) AS duration,
+            {storage.arg_max_sql('a.app', 'a.duration')} AS app,
+            MAX(a.duration) AS top_app_duration
+        FROM app_totals a
+        LEFT JOIN app_titles t ON t.app = a.app
+        GROUP BY 1
         ORDER BY duration DESC
     """
     params.append(min_duration * 3600)
 
-    with sqlite3.connect(database_path) as conn:
-        df_events = pd.read_sql_query(query, conn, params=params)
+    title_maps.refresh()  # `app_titles` has to be up to date for the join
+    df_events = storage.read_sql(query, params)
 
+    df_events = df_events.drop(columns='top_app_duration')
+    
+    df_events['duration'] = (df_events['duration'].astype(float) / 3600.0).round(2) # seconds to hours, round to 2 decimal places
 
-    app_title_map = get_flatten_apps_to_title_map()
+    return df_events
 
-    df_events['title'] = df_events['app'].map(app_title_map).fillna("Unknown")
+def session_stats(app_titles: list[str] = None, start_date: str = None, end_date: str = None) -> dict:
+    """
+    Number of sessions, total hours, and mean, median, 95th percentile and longest session length in minutes
+    per application title, most used first, with the number of sessions in each bin of `SESSION_LENGTH_BINS`.
+    Sessions are dated by their local start date. Apps missing from the title map keep their executable name.
+    """
+    where_clauses, params = [], []
+    if start_date:
+        where_clauses.append("s.local_date >= ?")
+        params.append(start_date[:10])
+    if end_date:
+        where_clauses.append("s.local_date <= ?")
+        params.append(end_date[:10])
+    if app_titles:
+        where_clauses.append(f"""
+            s.app_id IN (SELECT a.id FROM apps a LEFT JOIN app_titles t ON t.app = a.name WHERE COALESCE(t.title, a.name) IN ({','.join(['?'] * len(app_titles))}))
+        """)
+        params += app_titles
+    where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+    
+    # The lengths of each app on each host, in milliseconds, come as one comma-separated string parsed by numpy, rather than as a row
+    # per session. Grouped in the order of the `sessions_end` index, so SQLite doesn't sort either.
+    title_maps.refresh()  # `app_titles` has to be up to date for the join
+    with read_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT s.app_id, group_concat((s.end_ts - s.start_ts) / 1000) FROM sessions s
+            {where_sql}
+            GROUP BY s.host_id, s.app_id
+        """, params).fetchall()
+        titles = dict(conn.execute("SELECT a.id, COALESCE(t.title, a.name) FROM apps a LEFT JOIN app_titles t ON t.app = a.name"))
+    if not rows:
+        return {"bins": SESSION_LENGTH_BINS, "apps": []}
+    parts = [np.fromstring(values, dtype=np.int64, sep=",") for _, values in rows]
+    title_codes, apps = pd.factorize(pd.Series([titles[app_id] for app_id, _ in rows]))
     
-    # group by title and sum durations
-    df_events = df_events.groupby('title', as_index=False).agg({'duration': 'sum', 'app': 'first'})
-    df_events = df_events.sort_values(by='duration', ascending=False).reset_index(drop=True)
+    # Lengths sorted within each app, so every statistic is a lookup at an offset of the app's first row.
+    # Sorted as one key, app in the high bits and length in milliseconds in the low 40 (35 years).
+    keys = np.sort((np.repeat(title_codes.astype(np.int64), [len(part) for part in parts]) << 40) | np.concatenate(parts))
+    app_codes, lengths = keys >> 40, (keys & (2**40 - 1)) / 60000.0
+    counts = np.bincount(app_codes, minlength=len(apps))
+    firsts = np.cumsum(counts) - counts
+    totals = np.bincount(app_codes, weights=lengths, minlength=len(apps))
     
-    df_events['duration'] = (df_events['duration'] / 3600.0).round(2) # seconds to hours, round to 2 decimal places
+    def quantile(q: float) -> np.ndarray:
+        """Linear interpolation between the closest ranks, like `np.quantile()`."""
+        position = firsts + q * (counts - 1)
+        lower = np.floor(position).astype(int)
+        upper = np.minimum(lower + 1, firsts + counts - 1)
+        return lengths[lower] + (lengths[upper] - lengths[lower]) * (position - lower)
+    
+    bins = np.searchsorted(SESSION_LENGTH_BINS, lengths, side="right") - 1
+    histograms = np.bincount(app_codes * len(SESSION_LENGTH_BINS) + bins, minlength=len(apps) * len(SESSION_LENGTH_BINS))
+    histograms = histograms.reshape(len(apps), len(SESSION_LENGTH_BINS))
+    
+    stats = pd.DataFrame({
+        "app": apps,
+        "sessions": counts,
+        "hours": (totals / 60.0).round(2),
+        "mean": (totals / counts).round(2),
+        "median": quantile(0.5).round(2),
+        "p95": quantile(0.95).round(2),
+        "max": lengths[firsts + counts - 1].round(2),
+    })
+    stats["histogram"] = histograms.tolist()
+    stats = stats.sort_values("hours", ascending=False, kind="stable")
+    return {"bins": SESSION_LENGTH_BINS, "apps": stats.to_dict("records")}
 
-    return df_events
+def dashboard(
+    app_titles: list[str], start_date: str = None, end_date: str = None, active: bool = False, columnar: bool = False,
+    min_duration: float = 10.0,
+) -> dict:
+    """
+    The results of `spent_time()`, `daily_os_usage()` and `daily_app_usage()` for the same dates,
+    split out of a single grouped read of the daily rollup instead of a query each.
+    """
+    where_clauses, params = storage.date_filter(start_date, end_date)
+    where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+    
+    # One row per (date, app, platform) of the dates, with the app's title.
+    # The totals per app, per (date, OS) and per (date, selected title) are summed from it in pandas.
+    query = f"""
+        SELECT r.date, r.app, r.platform, t.title, SUM(r.{_duration_column(active)}) AS duration
+        FROM daily_rollup r
+        LEFT JOIN app_titles t ON t.app = r.app
+        {where_sql}
+        GROUP BY 1, 2, 3, 4
+    """
+    title_maps.refresh()  # `app_titles` has to be up to date for the join
+    df = storage.read_sql(query, params)
+    
+    # Same as `spent_time()`: apps under `min_duration` dropped, then grouped by title, `app` is the biggest executable
+    by_app = df.groupby('app', as_index=False, sort=False).agg({'duration': 'sum', 'title': 'first'})
+    by_app['title'] = by_app['title'].fillna('Unknown')
+    by_app = by_app[by_app['duration'] >= min_duration * 3600].sort_values('duration', ascending=False)
+    spent = by_app.groupby('title', as_index=False, sort=False).agg({'duration': 'sum', 'app': 'first'})
+    spent = spent.sort_values('duration', ascending=False, ignore_index=True)
+    spent['duration'] = (spent['duration'].astype(float) / 3600.0).round(2)
+    
+    by_platform = df.groupby(['date', 'platform'], as_index=False)['duration'].sum()
+    by_title = df[df['title'].isin(app_titles or [])].groupby(['date', 'title'], as_index=False)['duration'].sum()
+    os_wide = _to_period_wide(by_platform, 'platform')
+    apps_wide = _to_period_wide(by_title.rename(columns={'title': 'app'}), 'app')
+    
+    return {
+        "spent_time": spent,
+        "daily_os_usage": to_columnar(os_wide) if columnar else _wide_to_long(os_wide, 'platform'),
+        "daily_app_usage": to_columnar(apps_wide) if columnar else _wide_to_long(apps_wide, 'app'),
+    }
 
 #endregion
 
@@ -0,0 +1,103 @@
+# benchmarks/aw_server.py
+"""
+Stand-in for an ActivityWatch server, serving the buckets of export files (see generate.py) on the REST endpoints
+`utils.sync_activitywatch()` reads: GET /api/0/buckets/ and GET /api/0/buckets/<id>/events?start=&end=&limit=.
+Events overlapping the range are returned newest first, at most `limit` of them, like aw-server does.
+
+`latency` delays every response, standing in for the network and the query time of a real server, and `until`
+hides the events starting after it, to serve the state of the buckets at an earlier time.
+
+Run from the project root:
+    python benchmarks/aw_server.py --exports app/data/export --port 5600 --latency 0.02
+or build it in-process with `create_app()` and sync from it through `httpx.ASGITransport(app)`.
+"""
+import os
+import asyncio
+import argparse
+
+import numpy as np
+import orjson
+import pandas as pd
+import uvicorn
+from fastapi import FastAPI, HTTPException, Response
+
+
+class _Bucket:
+    """Events of a bucket sorted by timestamp, each one already encoded as JSON."""
+
+    def __init__(self, metadata: dict, events: list[dict]):
+        self.metadata = metadata
+        events = sorted(events, key=lambda event: event["timestamp"])
+        self.ts = pd.to_datetime([event["timestamp"] for event in events], utc=True, format="ISO8601").as_unit("ns").asi8
+        self.end = self.ts + (np.array([event["duration"] for event in events], dtype=float) * 1e9).astype(np.int64)
+        self.longest = int((self.end - self.ts).max()) if len(events) else 0
+        self.encoded = [orjson.dumps(event) for event in events]
+
+    def query(self, start: int | None, end: int | None, limit: int, until: int | None) -> bytes:
+        """Events overlapping [`start`, `end`], newest first, as a JSON array."""
+        hi = len(self.ts) if end is None else int(np.searchsorted(self.ts, end, side="right"))
+        if until is not None:
+            hi = min(hi, int(np.searchsorted(self.ts, until, side="right")))
+        lo = 0 if start is None else int(np.searchsorted(self.ts, start - self.longest, side="left"))
+        indexes = np.arange(lo, hi)
+        if start is not None:
+            indexes = indexes[self.end[lo:hi] >= start]
+        if limit >= 0:
+            indexes = indexes[len(indexes) - limit:] if limit < len(indexes) else indexes
+        return b"[" + b",".join(self.encoded[i] for i in indexes[::-1].tolist()) + b"]"
+
+
+def _parse_time(value: str | None) -> int | None:
+    """ISO 8601 time to nanoseconds since epoch, naive times are UTC."""
+    return None if value is None else pd.to_datetime(value, utc=True).value
+
+
+def create_app(export_files: list[str], latency: float = 0.0, until: str = None) -> FastAPI:
+    """App serving the buckets of `export_files`, `app.state.until` and `app.state.latency` can be changed later."""
+    buckets = {}
+    for path in export_files:
+        with open(path, "rb") as file:
+            for bucket_id, bucket in orjson.loads(file.read())["buckets"].items():
+                events = bucket.pop("events", [])
+                buckets[bucket_id] = _Bucket(bucket, events)
+
+    app = FastAPI()
+    app.state.latency = latency
+    app.state.until = until
+    app.state.requests = 0
+    app.state.buckets = buckets
+
+    async def _respond(body: bytes) -> Response:
+        app.state.requests += 1
+        if app.state.latency:
+            await asyncio.sleep(app.state.latency)
+        return Response(body, media_type="application/json")
+
+    @app.get("/api/0/buckets/")
+    async def buckets_endpoint():
+        return await _respond(orjson.dumps({bucket_id: bucket.metadata for bucket_id, bucket in buckets.items()}))
+
+    @app.get("/api/0/buckets/{bucket_id}/events")
+    async def events_endpoint(bucket_id: str, start: str = None, end: str = None, limit: int = -1):
+        if bucket_id not in buckets:
+            raise HTTPException(status_code=404, detail=f"There's no bucket named {bucket_id}")
+        body = buckets[bucket_id].query(_parse_time(start), _parse_time(end), limit, _parse_time(app.state.until))
+        return await _respond(body)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exports", default=os.path.join("app", "data", "export"), help="directory of the export files to serve")
+    parser.add_argument("--port", type=int, default=5600)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every response is delayed by")
+    parser.add_argument("--until", help="serve only the events starting until this ISO 8601 time")
+    args = parser.parse_args()
+
+    files = sorted(os.path.join(args.exports, name) for name in os.listdir(args.exports) if name.endswith(".json"))
+    uvicorn.run(create_app(files, args.latency, args.until), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/formats.py
+"""
+Serialization time and size of the biggest analytics responses in each response format.
+
+Run from the project root:
+    python benchmarks/formats.py                         # responses built from the current database
+    python benchmarks/formats.py --series 300 --days 1460  # synthetic daily usage of that size
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import responses  # noqa: E402
+import utils  # noqa: E402
+
+
+def _synthetic_wide(n_series: int, n_days: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2021-01-01", periods=n_days, freq="D", name="date")
+    values = np.round(rng.random((n_days, n_series)) * 5, 2)
+    return pd.DataFrame(values, index=dates, columns=[f"App {i}" for i in range(n_series)])
+
+
+def _get_payloads(args) -> dict:
+    """Name -> data exactly as the endpoints hand it to the encoder."""
+    if args.series:
+        wide = _synthetic_wide(args.series, args.days)
+        return {
+            "daily_usage (records)": utils._wide_to_long(wide, "app"),
+            "daily_usage (columnar)": utils.to_columnar(wide),
+        }
+
+    titles = list(utils.get_flatten_title_to_apps_map())
+    return {
+        "daily_app_usage (records)": utils.get_daily_app_usage(titles),
+        "daily_app_usage (columnar)": utils.get_daily_app_usage(titles, columnar=True),
+        "daily_os_usage (records)": utils.get_daily_os_usage(),
+        "spent_time": utils.get_spent_time(),
+    }
+
+
+def _encode_fastapi_default(data) -> bytes:
+    """What the endpoints did before: records, jsonable_encoder and the stdlib json module."""
+    if isinstance(data, pd.DataFrame):
+        data = data.to_dict(orient="records")
+    return JSONResponse(jsonable_encoder(data)).body
+
+
+def _measure(encode, data, repeat: int) -> tuple[float, int]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, help="number of synthetic series, uses the database if omitted")
+    parser.add_argument("--days", type=int, default=1460, help="number of days of the synthetic series")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encoders = {"fastapi json (old)": _encode_fastapi_default}
+    for media_type in responses.available_formats():
+        encoders[media_type] = lambda data, media_type=media_type: responses.encode(data, media_type)
+
+    print(f"{'response':<28}{'format':<40}{'time':>12}{'size':>12}")
+    for name, data in _get_payloads(args).items():
+        for format_name, encode in encoders.items():
+            elapsed, size = _measure(encode, data, args.repeat)
+            print(f"{name:<28}{format_name:<40}{elapsed:>9.1f} ms{size / 1024:>9.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
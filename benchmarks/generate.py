@@ -0,0 +1,228 @@
+# benchmarks/generate.py
+"""
+Writes synthetic ActivityWatch exports, one "aw-buckets-export-<host>.json" per host,
+with a window and an AFK bucket each. Same seed, same files.
+
+Events come in runs of heartbeats of the same window, during the day of the host's timezone,
+with heavy-tailed durations, some zero-duration events, and AFK breaks.
+
+Run from the project root:
+    python benchmarks/generate.py --events 1M --output benchmarks/.data/1M
+"""
+import os
+import argparse
+import datetime
+
+import numpy as np
+import orjson
+
+# (hostname, platform, UTC offset of the working day)
+HOSTS = [
+    ("DESKTOP-9NAUUF0", "Windows", 2),
+    ("arch", "Linux", 2),
+    ("LAPTOP-K3N1Q7", "Windows", -5),
+    ("ubuntu", "Linux", 9),
+]
+
+# Executables with their relative share of runs and a title template, per platform
+APPS = {
+    "Windows": [
+        ("chrome.exe", 30, "{page} - Google Chrome"),
+        ("Code.exe", 20, "{file} - {project} - Visual Studio Code"),
+        ("Discord.exe", 10, "#{channel} | {project} - Discord"),
+        ("explorer.exe", 8, "{project}"),
+        ("zen.exe", 8, "{page} — Zen Browser"),
+        ("Spotify.exe", 5, "{song}"),
+        ("Telegram.exe", 5, "Telegram ({count})"),
+        ("StarRail.exe", 4, "Honkai: Star Rail"),
+        ("Obsidian.exe", 4, "{file} - {project} - Obsidian"),
+        ("Taskmgr.exe", 2, "Task Manager"),
+        ("vlc.exe", 2, "{song} - VLC media player"),
+        ("", 2, ""),
+    ],
+    "Linux": [
+        ("firefox", 30, "{page} — Mozilla Firefox"),
+        ("code", 25, "{file} - {project} - Visual Studio Code"),
+        ("Alacritty", 15, "{user}@{host}: ~/{project}"),
+        ("discord", 8, "#{channel} | {project} - Discord"),
+        ("org.telegram.desktop", 5, "Telegram ({count})"),
+        ("obsidian", 5, "{file} - {project} - Obsidian"),
+        ("steam_app_3557620", 4, "Blue Archive"),
+        ("org.gnome.Nautilus", 4, "{project}"),
+        ("factorio", 2, "Factorio"),
+        ("steam", 2, "Steam"),
+    ],
+}
+
+WORDS = (
+    "python pandas sqlite numpy fastapi async release notes issue pull request review benchmark docs "
+    "weather recipe news video music stream live chat tutorial guide api reference dashboard report "
+    "invoice budget travel flight hotel map calendar mail inbox draft meeting notes lecture homework "
+    "game patch update wiki forum thread question answer error fix bug deploy build test"
+).split()
+PROJECTS = ["activitystat-backend", "activitystat-frontend", "dotfiles", "thesis", "aw-client", "homelab", "notes"]
+EXTENSIONS = [".py", ".ts", ".md", ".json", ".toml", ".sql", ".svelte"]
+
+SIZE_SUFFIXES = {"k": 1_000, "M": 1_000_000}
+
+
+def parse_size(value: str) -> int:
+    """'100k', '1M', '10M' or a plain number of events."""
+    if value[-1] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def _make_titles(rng: np.random.Generator, template: str, count: int) -> list[str]:
+    """`count` distinct-ish titles filled in from `template`."""
+    titles = []
+    for _ in range(count):
+        words = rng.choice(WORDS, 3)
+        titles.append(template.format(
+            page=" ".join(words).capitalize(),
+            file=f"{words[0]}_{words[1]}{rng.choice(EXTENSIONS)}",
+            project=rng.choice(PROJECTS),
+            channel=words[0],
+            song=f"{words[0].capitalize()} {words[1]} - {words[2].capitalize()}",
+            count=int(rng.integers(0, 50)),
+            user="dev",
+            host="arch",
+        ))
+    return titles
+
+
+def _generate_host(rng: np.random.Generator, n_events: int, platform: str, utc_offset: int):
+    """
+    Window events (start seconds, durations, apps, titles) in chronological order,
+    and (start seconds, duration, status) AFK events, in seconds after the first event's day.
+    """
+    apps = APPS[platform]
+    weights = np.array([weight for _, weight, _ in apps], dtype=float)
+    title_pools = [_make_titles(rng, template, 200 if "{page}" in template else 40) for _, _, template in apps]
+
+    # Runs of heartbeats of the same window, mean run of 8 events
+    run_lengths = rng.geometric(1 / 8, size=n_events // 4 + 1)
+    run_lengths = run_lengths[:np.searchsorted(np.cumsum(run_lengths), n_events) + 1]
+    run_lengths[-1] -= run_lengths.sum() - n_events
+    run_apps = rng.choice(len(apps), size=len(run_lengths), p=weights / weights.sum())
+    run_titles = np.array([rng.integers(len(title_pools[app])) for app in run_apps])
+
+    app_index = np.repeat(run_apps, run_lengths)
+    title_index = np.repeat(run_titles, run_lengths)
+    durations = np.round(rng.lognormal(2.0, 1.3, n_events), 3)
+    durations[rng.random(n_events) < 0.08] = 0.0
+    gaps = rng.uniform(0, 0.8, n_events)
+    gaps[np.cumsum(run_lengths)[:-1]] += rng.exponential(30, len(run_lengths) - 1)  # switching windows
+
+    # Activity fills 14 hours a day from 8:00 local time, the night is skipped
+    active_seconds = np.concatenate(([0.0], np.cumsum(durations + gaps)[:-1]))
+    day_length = 14 * 3600
+    days, in_day = np.divmod(active_seconds, day_length)
+    offsets = days * 86400 + (8 - utc_offset) * 3600 + in_day
+
+    # AFK watcher: not-afk stretches with short breaks over each day, afk over the night
+    n_days = int(days[-1]) + 1 if n_events else 0
+    afk_starts, afk_durations, afk_status = [], [], []
+    for day in range(n_days):
+        t = day * 86400 + (8 - utc_offset) * 3600
+        day_end = t + day_length
+        while t < day_end:
+            for status, mean in (("not-afk", 2400), ("afk", 480)):
+                duration = min(rng.exponential(mean) + 60, day_end - t)
+                afk_starts.append(t)
+                afk_durations.append(round(duration, 3))
+                afk_status.append(status)
+                t += duration
+                if t >= day_end:
+                    break
+        afk_starts.append(day_end)
+        afk_durations.append(86400.0 - day_length)
+        afk_status.append("afk")
+
+    app_names = [name for name, _, _ in apps]
+    return offsets, durations, app_index, title_index, app_names, title_pools, (afk_starts, afk_durations, afk_status)
+
+
+def _iso(start: datetime.datetime, offsets: np.ndarray) -> np.ndarray:
+    """Seconds after `start` as AW-style timestamps, "2025-01-12T14:26:07.798000+00:00"."""
+    base = np.datetime64(start.replace(tzinfo=None), "us")
+    values = base + (np.asarray(offsets) * 1e6).astype("timedelta64[us]")
+    return np.char.add(np.datetime_as_string(values, unit="us"), "+00:00")
+
+
+def _write_export(path: str, hostname: str, start: datetime.datetime, host_events, chunk_size: int = 100_000):
+    """Streams one export file, events newest first like AW does."""
+    offsets, durations, app_index, title_index, app_names, titles, afk = host_events
+    created = start.isoformat()
+
+    with open(path, "wb") as file:
+        file.write(b'{"buckets": {')
+        window_id = f"aw-watcher-window_{hostname}"
+        file.write(orjson.dumps(window_id) + b": ")
+        file.write(orjson.dumps({
+            "id": window_id, "created": created, "name": None, "type": "currentwindow",
+            "client": "aw-watcher-window", "hostname": hostname, "data": {},
+        })[:-1] + b', "events": [')
+        first = True
+        for end in range(len(offsets), 0, -chunk_size):
+            chunk = slice(max(end - chunk_size, 0), end)
+            timestamps = _iso(start, offsets[chunk])
+            events = [
+                {"timestamp": timestamp, "duration": duration, "data": {"app": app_names[app], "title": titles[app][title]}}
+                for timestamp, duration, app, title in zip(
+                    timestamps.tolist(), durations[chunk].tolist(), app_index[chunk].tolist(), title_index[chunk].tolist()
+                )
+            ][::-1]
+            if events:
+                file.write((b"" if first else b", ") + orjson.dumps(events)[1:-1])
+                first = False
+        file.write(b"]}, ")
+
+        afk_id = f"aw-watcher-afk_{hostname}"
+        afk_starts, afk_durations, afk_status = afk
+        afk_events = [
+            {"timestamp": timestamp, "duration": duration, "data": {"status": status}}
+            for timestamp, duration, status in zip(_iso(start, afk_starts).tolist(), afk_durations, afk_status)
+        ][::-1]
+        file.write(orjson.dumps(afk_id) + b": ")
+        file.write(orjson.dumps({
+            "id": afk_id, "created": created, "name": None, "type": "afkstatus",
+            "client": "aw-watcher-afk", "hostname": hostname, "data": {}, "events": afk_events,
+        }))
+        file.write(b"}}")
+
+
+def generate(output: str, n_events: int, n_hosts: int = len(HOSTS), seed: int = 0, start: str = "2022-01-01") -> list[str]:
+    """Writes the exports of `n_hosts` hosts sharing `n_events` window events into `output`, returns their paths."""
+    os.makedirs(output, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    start_time = datetime.datetime.fromisoformat(start).replace(tzinfo=datetime.timezone.utc)
+
+    paths = []
+    hosts = [HOSTS[i % len(HOSTS)] for i in range(n_hosts)]
+    shares = rng.dirichlet(np.full(n_hosts, 4.0))  # uneven, but no host is empty
+    counts = np.floor(shares * n_events).astype(int)
+    counts[0] += n_events - counts.sum()
+    for i, ((hostname, platform, utc_offset), count) in enumerate(zip(hosts, counts)):
+        hostname = hostname if i < len(HOSTS) else f"{hostname}-{i}"
+        path = os.path.join(output, f"aw-buckets-export-{hostname}.json")
+        _write_export(path, hostname, start_time, _generate_host(rng, int(count), platform, utc_offset))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", default="100k", help="total window events, like 100k, 1M or 10M")
+    parser.add_argument("--hosts", type=int, default=len(HOSTS), help="number of hosts sharing the events")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default="2022-01-01", help="date of the first event")
+    parser.add_argument("--output", default=os.path.join("benchmarks", ".data", "export"))
+    args = parser.parse_args()
+
+    for path in generate(args.output, parse_size(args.events), args.hosts, args.seed, args.start):
+        print(f"{path:<70}{os.path.getsize(path) / 2**20:>10.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# benchmarks/run.py
+"""
+End-to-end benchmark on synthetic exports (see generate.py): for each dataset size, ingest throughput,
+peak memory and database size of a fresh import, then p50 / p99 latency of every read endpoint,
+with the response cache cleared before each request (uncached) and without (cached).
+
+Each step runs in its own process from a scratch project directory under benchmarks/.data,
+so peak RSS is the one of that step only. Results are written as JSON.
+
+Run from the project root:
+    python benchmarks/run.py                                   # 100k and 1M events
+    python benchmarks/run.py --sizes 10M --repeat 10
+    python benchmarks/run.py --compare benchmarks/results/old.json
+    python benchmarks/run.py --backend parquet --compare benchmarks/results/sqlite.json  # storage backends compared
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import datetime
+import subprocess
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATA_DIR = os.path.join(ROOT, "benchmarks", ".data")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from generate import generate, parse_size  # noqa: E402
+
+
+def _peak_rss_mb() -> dict[str, float | None]:
+    """Peak RSS of this process and of its largest child process (the ingest workers)."""
+    if resource is None:
+        return {"self": None, "children": None}
+    scale = 2**20 if sys.platform == "darwin" else 2**10  # bytes on macOS, KiB on Linux
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def _database_size_mb(workdir: str) -> float:
+    from config import database_path
+    path = os.path.join(workdir, database_path)
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)) / 2**20
+
+
+def _parquet_size_mb(workdir: str) -> float:
+    from config import parquet_path
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(os.path.join(workdir, parquet_path)) for name in names
+    ) / 2**20
+
+
+def _enter_project(workdir: str, backend: str):
+    """Paths in config.py are relative to the project root."""
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.join(ROOT, "app"))
+    import config
+    config.storage_backend = backend  # read by utils when it's imported
+    import utils  # noqa: F401, configures logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def _child_ingest(workdir: str, backend: str) -> dict:
+    """Fresh import of the exports, then a restart with nothing new to import."""
+    _enter_project(workdir, backend)
+    from utils import init_db
+    from db import read_connection
+
+    start = time.perf_counter()
+    init_db()
+    ingest_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    init_db()
+    restart_seconds = time.perf_counter() - start
+
+    with read_connection() as conn:
+        events_stored = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        afk_events_stored = conn.execute("SELECT COUNT(*) FROM afk_events").fetchone()[0]
+
+    return {
+        "ingest_seconds": ingest_seconds,
+        "restart_seconds": restart_seconds,
+        "events_stored": events_stored,
+        "afk_events_stored": afk_events_stored,
+        "database_mb": _database_size_mb(workdir),
+        "parquet_mb": _parquet_size_mb(workdir),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _get_endpoint_cases(titles: list[str], start_date: str, end_date: str) -> list[dict]:
+    """Every read endpoint of main.py, with parameters a dashboard would use."""
+    month_start = (datetime.date.fromisoformat(end_date) - datetime.timedelta(days=30)).isoformat()
+    day = end_date
+    return [
+        {"name": "app_list", "method": "GET", "url": "/app_list"},
+        {"name": "spent_time", "method": "GET", "url": "/spent_time"},
+        {"name": "spent_time active", "method": "GET", "url": "/spent_time", "params": {"active": True}},
+        {"name": "daily_app_usage", "method": "POST", "url": "/daily_app_usage", "json": {"app_titles": titles}},
+        {"name": "daily_app_usage columnar", "method": "POST", "url": "/daily_app_usage",
+         "params": {"shape": "columnar"}, "json": {"app_titles": titles}},
+        {"name": "daily_os_usage", "method": "GET", "url": "/daily_os_usage"},
+        {"name": "daily_os_usage columnar", "method": "GET", "url": "/daily_os_usage", "params": {"shape": "columnar"}},
+        {"name": "usage weekly", "method": "GET", "url": "/usage", "params": {"grain": "weekly"}},
+        {"name": "usage hourly month", "method": "GET", "url": "/usage",
+         "params": {"grain": "hourly", "by": "platform", "start_date": month_start, "end_date": end_date}},
+        {"name": "usage_heatmap", "method": "GET", "url": "/usage_heatmap"},
+        {"name": "usage_heatmap active", "method": "GET", "url": "/usage_heatmap", "params": {"active": True}},
+        {"name": "category_usage", "method": "GET", "url": "/category_usage"},
+        {"name": "category_usage month", "method": "GET", "url": "/category_usage",
+         "params": {"start_date": month_start, "end_date": end_date}},
+        {"name": "daily_category_usage columnar", "method": "GET", "url": "/daily_category_usage", "params": {"shape": "columnar"}},
+        {"name": "dashboard columnar", "method": "GET", "url": "/dashboard",
+         "params": {"app_title": titles, "shape": "columnar"}},
+        {"name": "title_search", "method": "GET", "url": "/title_search", "params": {"q": "python"}},
+        {"name": "title_search prefix", "method": "GET", "url": "/title_search",
+         "params": {"q": "rep*", "start_date": month_start, "end_date": end_date}},
+        {"name": "dataset_metadata", "method": "GET", "url": "/dataset_metadata"},
+        {"name": "session_stats", "method": "GET", "url": "/session_stats"},
+        {"name": "session_stats month", "method": "GET", "url": "/session_stats",
+         "params": {"start_date": month_start, "end_date": end_date}},
+        {"name": "sessions page", "method": "GET", "url": "/sessions", "params": {"limit": 1000}, "cached": False},
+        {"name": "events page", "method": "GET", "url": "/events", "params": {"limit": 1000}, "cached": False},
+        {"name": "events stream day", "method": "GET", "url": "/events",
+         "params": {"start": day, "end": f"{day}T23:59:59", "stream": True}, "cached": False},
+        {"name": "admin reimport", "method": "POST", "url": "/admin/reimport", "cached": False},
+    ]
+
+
+def _percentiles(timings: list[float]) -> dict:
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "mean_ms": float(np.mean(timings)),
+        "n": len(timings),
+    }
+
+
+def _child_endpoints(workdir: str, repeat: int, backend: str) -> dict:
+    """Latency of each endpoint through the ASGI app, without the network."""
+    _enter_project(workdir, backend)
+    from fastapi.testclient import TestClient
+    from main import app
+    from cache import response_cache
+    from utils import get_flatten_title_to_apps_map, get_dataset_metadata
+
+    metadata = get_dataset_metadata()
+    start_date, end_date = str(metadata["start_date"])[:10], str(metadata["end_date"])[:10]
+    cases = _get_endpoint_cases(list(get_flatten_title_to_apps_map()), start_date, end_date)
+
+    results = {}
+    with TestClient(app) as client:
+        # Startup imports new exports in the background, there are none left but it checks them
+        while client.get("/health/ready").json()["phase"] not in ("idle", "failed"):
+            time.sleep(0.05)
+
+        def request(case) -> tuple[float, int]:
+            start = time.perf_counter()
+            response = client.request(case["method"], case["url"], params=case.get("params"), json=case.get("json"))
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                raise RuntimeError(f"{case['name']}: {response.status_code} {response.text[:200]}")
+            return elapsed, len(response.content)
+
+        for case in cases:
+            uncached = []
+            for _ in range(repeat):
+                response_cache.clear()
+                elapsed, size = request(case)
+                uncached.append(elapsed)
+            result = {"uncached": _percentiles(uncached), "response_bytes": size}
+            if case.get("cached", True):
+                result["cached"] = _percentiles([request(case)[0] for _ in range(repeat)])
+            results[case["name"]] = result
+
+        # Rewrites both rollups, so it goes last and only a few times
+        rebuild = {"name": "admin rebuild_rollup", "method": "POST", "url": "/admin/rebuild_rollup"}
+        results[rebuild["name"]] = {"uncached": _percentiles([request(rebuild)[0] for _ in range(min(repeat, 3))])}
+
+    return {"endpoints": results, "peak_rss_mb": _peak_rss_mb()}
+
+
+def _run_child(step: str, workdir: str, repeat: int, backend: str) -> dict:
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", step, "--workdir", workdir, "--repeat", str(repeat), "--backend", backend,
+    ]
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _prepare_workdir(label: str, n_events: int, hosts: int, seed: int) -> str:
+    """Scratch project directory with the title maps and the generated exports, reused across runs."""
+    from config import data_path, database_path, parquet_path, flatten_apps_to_title_map, flatten_title_to_apps_map
+
+    workdir = os.path.join(DATA_DIR, f"{label}-{hosts}hosts-seed{seed}")
+    export_dir = os.path.join(workdir, data_path)
+    marker = os.path.join(workdir, "generated")
+    if not os.path.exists(marker):
+        shutil.rmtree(workdir, ignore_errors=True)
+        start = time.perf_counter()
+        generate(export_dir, n_events, hosts, seed)
+        open(marker, "w").close()
+        print(f"{label}: generated in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    for path in (flatten_apps_to_title_map, flatten_title_to_apps_map):
+        shutil.copy(os.path.join(ROOT, path), os.path.join(workdir, path))
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(os.path.join(workdir, database_path + suffix)):
+            os.remove(os.path.join(workdir, database_path + suffix))
+    shutil.rmtree(os.path.join(workdir, parquet_path), ignore_errors=True)
+    return workdir
+
+
+def _benchmark_size(label: str, hosts: int, seed: int, repeat: int, backend: str) -> dict:
+    n_events = parse_size(label)
+    workdir = _prepare_workdir(label, n_events, hosts, seed)
+    export_dir = os.path.join(workdir, "app", "data", "export")
+    export_mb = sum(os.path.getsize(os.path.join(export_dir, name)) for name in os.listdir(export_dir)) / 2**20
+
+    ingest = _run_child("ingest", workdir, repeat, backend)
+    ingest["events_per_second"] = n_events / ingest["ingest_seconds"]
+    print(f"{label}: ingested in {ingest['ingest_seconds']:.1f} s, {ingest['events_per_second']:,.0f} events/s", file=sys.stderr)
+
+    endpoints = _run_child("endpoints", workdir, repeat, backend)
+    return {"events": n_events, "hosts": hosts, "export_mb": export_mb, "ingest": ingest, **endpoints}
+
+
+def _get_machine() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _print_results(results: dict, baseline: dict | None):
+    for label, dataset in results["datasets"].items():
+        ingest = dataset["ingest"]
+        rss = ingest["peak_rss_mb"]
+        parquet = f" + {ingest['parquet_mb']:.0f} MB of Parquet" if ingest.get("parquet_mb") else ""
+        print(f"\n{label}: {dataset['events']:,} events on {dataset['hosts']} hosts, {dataset['export_mb']:.0f} MB of exports, "
+              f"{results.get('backend', 'sqlite')} storage")
+        print(f"  ingest {ingest['ingest_seconds']:.1f} s ({ingest['events_per_second']:,.0f} events/s), "
+              f"restart {ingest['restart_seconds']:.2f} s, database {ingest['database_mb']:.0f} MB{parquet}, "
+              f"peak RSS {rss['self'] or 0:.0f} MB (workers {rss['children'] or 0:.0f} MB)")
+
+        old = (baseline or {}).get("datasets", {}).get(label, {}).get("endpoints", {})
+        print(f"  {'endpoint':<28}{'uncached p50':>14}{'p99':>10}{'cached p50':>12}{'p99':>10}{'size':>10}"
+              + (f"{'vs baseline':>14}" if baseline else ""))
+        for name, result in dataset["endpoints"].items():
+            uncached, cached = result["uncached"], result.get("cached")
+            line = f"  {name:<28}{uncached['p50_ms']:>11.1f} ms{uncached['p99_ms']:>7.1f} ms"
+            line += f"{cached['p50_ms']:>9.2f} ms{cached['p99_ms']:>7.2f} ms" if cached else " " * 22
+            line += f"{result['response_bytes'] / 1024:>7.0f} KB" if "response_bytes" in result else " " * 10
+            if name in old:
+                line += f"{uncached['p50_ms'] / old[name]['uncached']['p50_ms']:>13.2f}x"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["100k", "1M"], help="window events per dataset, like 100k, 1M, 10M")
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20, help="requests per endpoint and cache state")
+    parser.add_argument("--output", help="results file, benchmarks/results/<timestamp>.json by default")
+    parser.add_argument("--compare", help="earlier results file to compare the uncached p50 latencies with")
+    parser.add_argument("--backend", choices=["sqlite", "parquet"], default="sqlite", help="storage the analytics queries run on")
+    parser.add_argument("--child", choices=["ingest", "endpoints"], help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.child == "ingest":
+            result = _child_ingest(args.workdir, args.backend)
+        else:
+            result = _child_endpoints(args.workdir, args.repeat, args.backend)
+        print(json.dumps(result))
+        return
+
+    sys.path.insert(0, os.path.join(ROOT, "app"))
+    results = {
+        "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": _get_machine(),
+        "repeat": args.repeat,
+        "backend": args.backend,
+        "datasets": {label: _benchmark_size(label, args.hosts, args.seed, args.repeat, args.backend) for label in args.sizes},
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    _print_results(results, baseline)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
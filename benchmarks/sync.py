@@ -0,0 +1,140 @@
+# benchmarks/sync.py
+"""
+Sync from the stand-in ActivityWatch server (aw_server.py) serving synthetic exports (see generate.py), in-process
+through httpx's ASGI transport with a simulated latency per request, for each number of concurrent requests:
+a first sync of all but the last day of events, an incremental sync of that day, then one with nothing new.
+
+The synced events, AFK events and sessions are checked against a file import of the same exports, per local date
+up to the day before the last one; the newest event of each bucket is left for the next sync, so the end differs.
+Events of a host starting in the same microsecond are compacted in the order of their app ids, which follows
+the order they were inserted in, so concurrent requests can leave a merge or two different from the import.
+
+Run from the project root:
+    python benchmarks/sync.py                                  # 1M events, 1 and 8 concurrent requests
+    python benchmarks/sync.py --size 100k --concurrency 1 4 16 --latency 0.05
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from generate import parse_size  # noqa: E402
+from run import _enter_project, _prepare_workdir, _peak_rss_mb  # noqa: E402
+
+TOTALS_SQL = {
+    "events": "SELECT local_date, COUNT(*), SUM(duration), SUM(active_duration) FROM events GROUP BY local_date",
+    "afk_events": "SELECT date(ts / 1000000, 'unixepoch'), COUNT(*), SUM(duration), SUM(afk) FROM afk_events GROUP BY 1",
+    "sessions": "SELECT local_date, COUNT(*), SUM(end_ts - start_ts), 0 FROM sessions GROUP BY local_date",
+}
+
+
+def _get_totals() -> dict[str, dict[str, list]]:
+    """Rows, durations and active durations (AFK events: afk ones) per date of each table."""
+    from db import read_connection
+    with read_connection() as conn:
+        return {
+            table: {row[0]: [row[1], round(row[2] or 0, 3), round(row[3] or 0, 3)] for row in conn.execute(query)}
+            for table, query in TOTALS_SQL.items()
+        }
+
+
+def _child_import(workdir: str) -> dict:
+    _enter_project(workdir, "sqlite")
+    from utils import prepare_db, import_exports
+
+    start = time.perf_counter()
+    prepare_db()
+    import_exports()
+    return {"seconds": time.perf_counter() - start, "totals": _get_totals(), "peak_rss_mb": _peak_rss_mb()}
+
+
+def _child_sync(workdir: str, concurrency: int, latency: float, range_hours: float) -> dict:
+    _enter_project(workdir, "sqlite")
+    import httpx
+    import pandas as pd
+    from aw_server import create_app
+    from config import data_path
+    from db import read_connection
+    from utils import prepare_db, sync_activitywatch
+
+    prepare_db()
+    files = sorted(os.path.join(data_path, name) for name in os.listdir(data_path) if name.endswith(".json"))
+    app = create_app(files, latency)
+    last_event = max(max(bucket.ts) for bucket in app.state.buckets.values() if len(bucket.ts))
+    app.state.until = pd.Timestamp(last_event - 86_400 * 10**9, tz="UTC").isoformat()
+
+    steps = {}
+    for step in ("first", "incremental", "unchanged"):
+        if step == "incremental":
+            app.state.until = None
+        start = time.perf_counter()
+        summary = sync_activitywatch("http://aw-server", concurrency, range_hours=range_hours, transport=httpx.ASGITransport(app))
+        steps[step] = {"seconds": time.perf_counter() - start, **summary}
+
+    with read_connection() as conn:
+        oldest_watermark = conn.execute("SELECT MIN(timestamp) FROM bucket_watermarks").fetchone()[0]
+    cutoff = (pd.Timestamp(oldest_watermark) - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    return {"steps": steps, "cutoff": cutoff, "totals": _get_totals(), "peak_rss_mb": _peak_rss_mb()}
+
+
+def _run_child(*args) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "--child", *map(str, args)]
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _compare(synced: dict, imported: dict, cutoff: str) -> list[str]:
+    """Tables and dates whose totals differ before `cutoff`."""
+    return [
+        f"{table} {date}: synced {synced[table].get(date)}, imported {imported[table].get(date)}"
+        for table in TOTALS_SQL
+        for date in sorted(set(synced[table]) | set(imported[table]))
+        if date < cutoff and synced[table].get(date) != imported[table].get(date)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="1M", help="window events of the dataset, like 100k, 1M")
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8], help="concurrent requests of each run")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds the stand-in server takes per request")
+    parser.add_argument("--range-hours", type=float, default=24, help="time range of each events request")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        step, workdir, *rest = args.child
+        result = _child_import(workdir) if step == "import" else _child_sync(workdir, int(rest[0]), float(rest[1]), float(rest[2]))
+        print(json.dumps(result))
+        return
+
+    sys.path.insert(0, os.path.join(ROOT, "app"))
+    workdir = _prepare_workdir(args.size, parse_size(args.size), args.hosts, args.seed)
+    imported = _run_child("import", workdir)
+    print(f"{args.size}: file import in {imported['seconds']:.1f} s")
+
+    print(f"\n{'concurrency':>11}{'step':>13}{'seconds':>9}{'requests':>10}{'events':>10}{'afk':>8}")
+    for concurrency in args.concurrency:
+        _prepare_workdir(args.size, parse_size(args.size), args.hosts, args.seed)
+        synced = _run_child("sync", workdir, concurrency, args.latency, args.range_hours)
+        for step, result in synced["steps"].items():
+            print(
+                f"{concurrency:>11}{step:>13}{result['seconds']:>9.2f}{result['requests']:>10}"
+                f"{result['events_inserted']:>10}{result['afk_events_inserted']:>8}"
+            )
+        differences = _compare(synced["totals"], imported["totals"], synced["cutoff"])
+        print(f"{'':>11}{'check':>13}  " + ("same totals as the file import before " + synced["cutoff"] if not differences else f"{len(differences)} differences:"))
+        for difference in differences[:10]:
+            print(f"{'':>26}{difference}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# tests/conftest.py
+"""
+The app modules import each other by name and take their paths from config.py, relative to the project root.
+Each test runs them from a scratch project directory, with a new database and its own export files.
+
+Run from the project root: python -m pytest
+"""
+import os
+import sys
+
+import orjson
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+
+def _close_connections():
+    """Connections are kept by the module, the next test opens new ones on its own database."""
+    import db
+    for conn in (db._writer, getattr(db._local, "conn", None)):
+        if conn is not None:
+            conn.close()
+    db._writer = None
+    db._local.conn = None
+
+
+@pytest.fixture
+def project_dir(tmp_path, monkeypatch):
+    """The `utils` module, in a scratch project directory without a database yet."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("app", "data", "export"))
+    _close_connections()
+    import utils
+    utils.title_maps._mtimes = None  # loaded again from the new directory
+    utils.build_flatten_apps_to_title_map()
+    utils.build_flatten_title_to_apps_map()
+    yield utils
+    _close_connections()
+
+
+@pytest.fixture
+def project(project_dir):
+    """The `utils` module, working on a prepared, empty database in a scratch project directory."""
+    project_dir.prepare_db()
+    return project_dir
+
+
+def event(timestamp: str, duration: float, **data) -> dict:
+    """An AW event, `data` is app and title for window buckets, status for AFK ones. Timestamps are UTC."""
+    return {"timestamp": f"{timestamp}+00:00", "duration": duration, "data": data}
+
+
+@pytest.fixture
+def write_export(project):
+    """Writes an export file of the given buckets, {bucket id: [events]}, to the export directory of the project."""
+    def write(buckets: dict[str, list[dict]], name: str = "aw-buckets-export.json") -> str:
+        export = {"buckets": {
+            bucket_id: {
+                "id": bucket_id,
+                "created": "2024-01-01T00:00:00.000000+00:00",
+                "name": None,
+                "type": "afkstatus" if bucket_id.startswith("aw-watcher-afk_") else "currentwindow",
+                "client": bucket_id.split("_", 1)[0],
+                "hostname": bucket_id.split("_", 1)[1],
+                "data": {},
+                "events": events,
+            }
+            for bucket_id, events in buckets.items()
+        }}
+        path = os.path.join("app", "data", "export", name)
+        with open(path, "wb") as file:
+            file.write(orjson.dumps(export))
+        return path
+    return write
+
+
+@pytest.fixture
+def client(project, monkeypatch):
+    """A client of the API on the prepared project database, with its own response cache. Startup isn't run."""
+    from fastapi.testclient import TestClient
+    import main
+    from cache import ResponseCache
+    from config import response_cache_max_bytes
+    monkeypatch.setattr(main, "response_cache", ResponseCache(response_cache_max_bytes))
+    monkeypatch.setattr(main.ingest_status, "ready", True)
+    return TestClient(main.app)
@@ -0,0 +1,39 @@
+# tests/test_active_time.py
+from conftest import event
+
+
+def test_afk_intervals_apply_to_their_own_host(project, write_export):
+    """Two Windows machines: the desktop's Chrome window stayed open while it was AFK, the laptop was in use meanwhile."""
+    write_export({
+        "aw-watcher-window_DESKTOP-AAA": [event("2024-03-01T10:00:00.000000", 3600, app="chrome.exe", title="News")],
+        "aw-watcher-afk_DESKTOP-AAA": [
+            event("2024-03-01T10:00:00.000000", 900, status="not-afk"),
+            event("2024-03-01T10:15:00.000000", 2700, status="afk"),
+        ],
+        "aw-watcher-window_LAPTOP-BBB": [event("2024-03-01T10:00:00.000000", 3600, app="Code.exe", title="main.py")],
+        "aw-watcher-afk_LAPTOP-BBB": [event("2024-03-01T10:00:00.000000", 3600, status="not-afk")],
+    })
+    project.import_exports(workers=1)
+
+    spent = project.spent_time(min_duration=0).set_index("title")["duration"]
+    active = project.spent_time(min_duration=0, active=True).set_index("title")["duration"]
+    assert spent["Google Chrome"] == 1.0
+    assert active["Google Chrome"] == 0.25
+    assert active["Visual Studio Code"] == 1.0
+
+    os_usage = project.daily_os_usage(active=True)
+    assert os_usage["platform"].tolist() == ["Windows"]
+    assert os_usage["duration"].tolist() == [1.25]
+
+
+def test_host_without_afk_data_counts_all_time_as_active(project, write_export):
+    write_export({
+        "aw-watcher-window_DESKTOP-AAA": [event("2024-03-01T10:00:00.000000", 3600, app="chrome.exe", title="News")],
+        "aw-watcher-window_LAPTOP-BBB": [event("2024-03-01T10:00:00.000000", 1800, app="Code.exe", title="main.py")],
+        "aw-watcher-afk_LAPTOP-BBB": [event("2024-03-01T10:00:00.000000", 1800, status="afk")],
+    })
+    project.import_exports(workers=1)
+
+    active = project.spent_time(min_duration=0, active=True).set_index("title")["duration"]
+    assert active["Google Chrome"] == 1.0
+    assert active["Visual Studio Code"] == 0.0
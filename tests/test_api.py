@@ -0,0 +1,31 @@
+# tests/test_api.py
+from conftest import event
+
+
+def test_etag_is_revalidated_until_an_import_changes_the_data(client, write_export):
+    """Apps are listed by `/spent_time` from 10 hours on."""
+    write_export({"aw-watcher-window_DESKTOP-AAA": [event("2024-03-01T08:00:00.000000", 40000, app="chrome.exe", title="News")]})
+    assert client.post("/admin/reimport").json()["files_imported"] == 1
+
+    response = client.get("/spent_time")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert client.get("/spent_time").headers["etag"] == etag
+
+    not_modified = client.get("/spent_time", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    assert client.get("/spent_time", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    write_export(
+        {"aw-watcher-window_DESKTOP-AAA": [event("2024-03-02T08:00:00.000000", 40000, app="Code.exe", title="main.py")]},
+        name="aw-buckets-export-2.json",
+    )
+    assert client.post("/admin/reimport").json()["files_imported"] == 1
+
+    response = client.get("/spent_time", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert {row["title"] for row in response.json()} == {"Google Chrome", "Visual Studio Code"}
+    assert client.get("/spent_time", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
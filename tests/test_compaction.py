@@ -0,0 +1,23 @@
+# tests/test_compaction.py
+from conftest import event
+
+
+def test_events_merge_only_with_their_own_host(project, write_export):
+    """Both Windows machines show the same page, one after the other: each host's heartbeats merge, the hosts don't."""
+    write_export({
+        "aw-watcher-window_DESKTOP-AAA": [
+            event("2024-03-01T10:00:00.000000", 10, app="chrome.exe", title="News"),
+            event("2024-03-01T10:00:10.500000", 10, app="chrome.exe", title="News"),
+        ],
+        "aw-watcher-window_LAPTOP-BBB": [
+            event("2024-03-01T10:00:21.000000", 10, app="chrome.exe", title="News"),
+        ],
+    })
+    project.import_exports(workers=1)
+
+    with project.read_connection() as conn:
+        rows = conn.execute("SELECT host, timestamp, duration FROM events_view ORDER BY ts").fetchall()
+    assert rows == [
+        ("DESKTOP-AAA", "2024-03-01T10:00:00.000000+00:00", 20.5),
+        ("LAPTOP-BBB", "2024-03-01T10:00:21.000000+00:00", 10.0),
+    ]
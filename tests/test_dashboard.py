@@ -0,0 +1,30 @@
+# tests/test_dashboard.py
+from conftest import event
+
+
+def test_dashboard_matches_the_separate_results(project, write_export):
+    """Two days apart, with an app missing from the title map, and AFK time on one machine."""
+    write_export({
+        "aw-watcher-window_DESKTOP-AAA": [
+            event("2024-03-01T10:00:00.000000", 3600, app="chrome.exe", title="News"),
+            event("2024-03-01T11:00:00.000000", 1800, app="Code.exe", title="main.py"),
+            event("2024-03-03T09:00:00.000000", 7200, app="chrome.exe", title="Mail"),
+            event("2024-03-03T11:00:00.000000", 600, app="unmapped-tool.exe", title="Tool"),
+        ],
+        "aw-watcher-afk_DESKTOP-AAA": [
+            event("2024-03-01T10:00:00.000000", 1200, status="not-afk"),
+            event("2024-03-01T10:20:00.000000", 2400, status="afk"),
+        ],
+        "aw-watcher-window_LAPTOP-BBB": [event("2024-03-03T10:00:00.000000", 5400, app="Code.exe", title="test.py")],
+    })
+    project.import_exports(workers=1)
+
+    titles = ["Google Chrome", "Visual Studio Code"]
+    for start_date, end_date, active in [(None, None, False), (None, None, True), ("2024-03-02", "2024-03-03", False)]:
+        result = project.dashboard(titles, start_date, end_date, active, min_duration=0)
+        assert result["spent_time"].equals(project.spent_time(start_date, end_date, min_duration=0, active=active))
+        assert result["daily_os_usage"].equals(project.daily_os_usage(start_date, end_date, active))
+        assert result["daily_app_usage"].equals(project.daily_app_usage(titles, start_date, end_date, active))
+
+    assert "Unknown" in project.dashboard(titles, min_duration=0)["spent_time"]["title"].tolist()
+    assert project.dashboard([], min_duration=0)["daily_app_usage"].empty
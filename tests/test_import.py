@@ -0,0 +1,81 @@
+# tests/test_import.py
+from conftest import event
+
+
+def _minute_events(app: str, hours: int) -> list[dict]:
+    """One event per minute, the long titles make a file of more than a MB."""
+    return [
+        event(f"2024-03-{1 + minute // 1440:02d}T{minute // 60 % 24:02d}:{minute % 60:02d}:00.000000", 30, app=app, title=f"{'x' * 200} {minute}")
+        for minute in range(hours * 60)
+    ]
+
+
+def test_parallel_import_reports_progress_to_the_importing_process(project, write_export, monkeypatch):
+    paths = [
+        write_export({"aw-watcher-window_DESKTOP-AAA": _minute_events("chrome.exe", 72)}, name="aw-buckets-export-1.json"),
+        write_export({"aw-watcher-window_LAPTOP-BBB": _minute_events("Code.exe", 72)}, name="aw-buckets-export-2.json"),
+    ]
+    progress = []
+    monkeypatch.setattr(project.ingest_status, "file_progress", lambda path, bytes_parsed: progress.append(path))
+
+    summary = project.import_exports(workers=2)
+
+    assert summary["events_parsed"] == summary["events_inserted"] == 2 * 72 * 60
+    # Both files were parsed in worker processes, their progress reached the status of this one
+    assert set(progress) == set(paths)
+    status = project.ingest_status.snapshot()
+    assert status["files_done"] == 2 and status["percent"] == 100.0
+
+
+def test_newest_events_extended_after_an_export_get_their_new_duration(project, write_export):
+    """AW keeps extending the newest event of a bucket, a later export has it again with a longer duration."""
+    def export(window_duration: float, afk_duration: float, name: str):
+        write_export({
+            "aw-watcher-window_DESKTOP-AAA": [
+                event("2024-03-01T10:00:00.000000", window_duration, app="chrome.exe", title="News"),
+                event("2024-03-01T09:00:00.000000", 3600, app="Code.exe", title="main.py"),
+            ],
+            "aw-watcher-afk_DESKTOP-AAA": [
+                event("2024-03-01T09:00:00.000000", afk_duration, status="not-afk"),
+            ],
+        }, name=name)
+
+    export(60, 3660, "aw-buckets-export-1.json")
+    project.import_exports(workers=1)
+    export(3600, 7200, "aw-buckets-export-2.json")
+    summary = project.import_exports(workers=1)
+
+    assert summary["events_inserted"] == summary["afk_events_inserted"] == 1
+    spent = project.spent_time(min_duration=0).set_index("title")["duration"]
+    active = project.spent_time(min_duration=0, active=True).set_index("title")["duration"]
+    assert spent["Google Chrome"] == active["Google Chrome"] == 1.0
+    assert spent["Visual Studio Code"] == 1.0
+    with project.read_connection() as conn:
+        assert conn.execute("SELECT duration FROM afk_events").fetchall() == [(7200.0,)]
+        assert conn.execute("SELECT SUM(duration), SUM(event_count) FROM daily_rollup").fetchone() == (7200.0, 2)
+        assert conn.execute("SELECT (end_ts - start_ts) / 1000000 FROM sessions ORDER BY start_ts").fetchall() == [(3600,), (3600,)]
+
+
+def test_truncated_export_is_imported_again_once_replaced(project, write_export):
+    """Exports list events newest first, the ones cut off must not be skipped by the watermark of the newer ones."""
+    buckets = {"aw-watcher-window_DESKTOP-AAA": [
+        event("2024-03-01T12:00:00.000000", 60, app="chrome.exe", title="News"),
+        event("2024-03-01T10:00:00.000000", 60, app="Code.exe", title="main.py"),
+    ]}
+    path = write_export(buckets)
+    with open(path, "rb") as file:
+        content = file.read()
+    with open(path, "wb") as file:
+        file.write(content[:content.index(b"Code.exe")])
+
+    summary = project.import_exports(workers=1)
+    assert summary["files_failed"] == 1 and summary["files_imported"] == 0
+    with project.read_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM ingest_files").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM bucket_watermarks").fetchone()[0] == 0
+
+    write_export(buckets)
+    summary = project.import_exports(workers=1)
+    assert summary["files_failed"] == 0 and summary["files_imported"] == 1
+    with project.read_connection() as conn:
+        assert conn.execute("SELECT app FROM events_view ORDER BY ts").fetchall() == [("Code.exe",), ("chrome.exe",)]
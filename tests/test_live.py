@@ -0,0 +1,73 @@
+# tests/test_live.py
+import asyncio
+
+import orjson
+
+from live import LiveUpdates
+
+
+def _parse(message: bytes) -> tuple[int, str, dict]:
+    """(id, event, data) of an SSE message."""
+    fields = dict(line.split(": ", 1) for line in message.decode().strip().split("\n"))
+    return int(fields["id"]), fields["event"], orjson.loads(fields["data"])
+
+
+def _publish_deltas(live: LiveUpdates, versions):
+    for version in versions:
+        live.publish(version, {"daily_app_usage": [], "daily_os_usage": []})
+
+
+def test_new_client_gets_the_version():
+    live = LiveUpdates()
+    _publish_deltas(live, range(1, 4))
+    [(version, message)] = live.catch_up(None, 3)
+    assert version == 3
+    assert _parse(message) == (3, "version", {"version": 3})
+
+
+def test_reconnecting_client_gets_the_missed_messages():
+    live = LiveUpdates()
+    _publish_deltas(live, range(1, 6))
+    missed = live.catch_up(2, 5)
+    assert [version for version, _ in missed] == [3, 4, 5]
+    assert [_parse(message)[1] for _, message in missed] == ["delta"] * 3
+    assert live.catch_up(5, 5) == []
+
+
+def test_missed_messages_start_at_the_last_reset():
+    live = LiveUpdates()
+    _publish_deltas(live, [1, 2])
+    live.publish(3)
+    _publish_deltas(live, [4])
+    missed = live.catch_up(1, 4)
+    assert [(version, _parse(message)[1]) for version, message in missed] == [(3, "reset"), (4, "delta")]
+
+
+def test_client_behind_the_kept_history_gets_a_reset():
+    live = LiveUpdates(history=3)
+    _publish_deltas(live, range(1, 7))
+    assert live.catch_up(3, 6)  # versions 4 to 6 are still kept
+    [(version, message)] = live.catch_up(2, 6)
+    assert _parse(message) == (6, "reset", {"version": 6})
+
+
+def test_versions_without_a_kept_message_reset_the_client():
+    live = LiveUpdates()
+    _publish_deltas(live, [1, 2, 4, 5])
+    assert _parse(live.catch_up(1, 4)[0][1])[:2] == (4, "reset")
+    # Committed after the last published message, or a version the server never had
+    assert _parse(live.catch_up(5, 6)[0][1])[:2] == (6, "reset")
+    assert _parse(live.catch_up(9, 4)[0][1])[:2] == (4, "reset")
+
+
+def test_client_with_a_full_queue_gets_a_reset_in_place_of_the_unread_messages():
+    async def run():
+        live = LiveUpdates(queue_size=2)
+        queue = live.subscribe()
+        _publish_deltas(live, range(1, 4))
+        await asyncio.sleep(0)  # deliveries run on the loop
+        live.unsubscribe(queue)
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    [(version, message)] = asyncio.run(run())
+    assert _parse(message) == (3, "reset", {"version": 3})
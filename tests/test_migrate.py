@@ -0,0 +1,39 @@
+# tests/test_migrate.py
+import sqlite3
+
+from config import database_path
+
+
+def _create_v1_database(events: list[tuple]):
+    """Events table of the first schema: ISO timestamps and names as TEXT."""
+    conn = sqlite3.connect(database_path)
+    conn.execute("""
+        CREATE TABLE events (
+            timestamp TEXT,
+            duration REAL,
+            app TEXT,
+            title TEXT,
+            platform TEXT,
+            PRIMARY KEY (timestamp, app, title)
+        )
+    """)
+    conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", events)
+    conn.commit()
+    conn.close()
+
+
+def test_server_starts_on_a_database_migrated_by_migrate_py(project_dir):
+    _create_v1_database([
+        ("2024-03-01T10:00:00.123456+00:00", 60.0, "chrome.exe", "News", "Windows"),
+        ("2024-03-01T11:00:00.000000+00:00", 30.0, "Code.exe", "main.py", "Windows"),
+    ])
+    import migrate
+    migrate.main()
+
+    project_dir.prepare_db()
+    with project_dir.read_connection() as conn:
+        rows = conn.execute("SELECT timestamp, duration, app FROM events_view ORDER BY ts").fetchall()
+    assert rows == [
+        ("2024-03-01T10:00:00.123456+00:00", 60.0, "chrome.exe"),
+        ("2024-03-01T11:00:00.000000+00:00", 30.0, "Code.exe"),
+    ]
@@ -0,0 +1,57 @@
+# tests/test_pagination.py
+import orjson
+
+from conftest import event
+
+HOSTS = ["DESKTOP-AAA", "DESKTOP-BBB", "DESKTOP-CCC"]
+
+
+def _write_same_time_events(write_export):
+    """Each app of each host starts an event at the same five times, hours apart: 30 events and 30 sessions."""
+    write_export({
+        f"aw-watcher-window_{host}": [
+            event(f"2024-03-01T{hour:02d}:00:00.000000", 60, app=app, title=f"{host} {app}")
+            for hour in range(10, 15)
+            for app in ("chrome.exe", "Code.exe")
+        ]
+        for host in HOSTS
+    })
+
+
+def _walk(query, limit: int) -> list[list[dict]]:
+    pages, cursor = [], None
+    while True:
+        rows, cursor = query(cursor=cursor, limit=limit)
+        pages.append(rows)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_rows_with_the_same_timestamp_once(project, write_export):
+    _write_same_time_events(write_export)
+    project.import_exports(workers=1)
+
+    for query in (project.query_events, project.query_sessions):
+        everything, cursor = query(limit=1000)
+        assert len(everything) == 30
+        assert cursor is None
+        # 30 rows in pages of 4 end with a page of 2, in pages of 5 with a full one and no empty page after it
+        for limit, sizes in ((4, [4] * 7 + [2]), (5, [5] * 6)):
+            pages = _walk(query, limit)
+            assert [len(page) for page in pages] == sizes
+            assert [row for page in pages for row in page] == everything
+
+
+def test_streamed_events_are_the_paged_ones(client, project, write_export):
+    _write_same_time_events(write_export)
+    project.import_exports(workers=1)
+    everything, _ = project.query_events(limit=1000)
+
+    for params, headers in (({"stream": "true"}, {}), ({}, {"Accept": "application/x-ndjson"})):
+        response = client.get("/events", params={"limit": 4, **params}, headers=headers)
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [orjson.loads(line) for line in response.content.splitlines()] == everything
+
+    page = client.get("/events", params={"limit": 30}).json()
+    assert page["events"] == everything
+    assert page["next_cursor"] is None
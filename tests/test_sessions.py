@@ -0,0 +1,77 @@
+# tests/test_sessions.py
+import numpy as np
+import pandas as pd
+
+from conftest import event
+
+HOSTS = {"DESKTOP-AAA": "Windows", "LAPTOP-BBB": "Windows", "ubuntu": "Linux"}
+APPS = ["chrome.exe", "Code.exe"]
+
+
+def _random_events(seed: int, per_app: int = 150) -> pd.DataFrame:
+    """Runs of events of each app on each host, with gaps around `session_gap` and some overlapping events."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for host, platform in HOSTS.items():
+        for app in APPS:
+            # Steps between starts of up to 10 minutes, durations of up to 2 minutes, in microseconds
+            ts = 1_709_280_000_000_000 + np.cumsum(rng.integers(0, 600_000_000, per_app))
+            frames.append(pd.DataFrame({
+                "ts": ts,
+                "duration": rng.integers(0, 120_000_000, per_app) / 1_000_000,
+                "app": app,
+                # Titles differ by host, events of two hosts can't share a key
+                "title": [f"{host} {i % 3}" for i in range(per_app)],
+                "platform": platform,
+                "host": host,
+            }))
+    events = pd.concat(frames, ignore_index=True)
+    events["timestamp"] = pd.to_datetime(events["ts"], unit="us").dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    return events
+
+
+def _reference_sessions(events: pd.DataFrame, gap: float) -> list[tuple]:
+    """Sessions clustered one event at a time: (host, app, start, end) in microseconds."""
+    sessions = []
+    for (host, app), group in events.sort_values("ts").groupby(["host", "app"]):
+        start = end = None
+        for ts, duration in zip(group["ts"], group["duration"]):
+            if start is not None and ts - end > gap * 1_000_000:
+                sessions.append((host, app, start, end))
+                start = None
+            if start is None:
+                start, end = int(ts), int(ts)
+            end = max(end, int(ts) + round(duration * 1_000_000))
+        sessions.append((host, app, start, end))
+    return sorted(sessions)
+
+
+def _stored_sessions(project) -> list[tuple]:
+    with project.read_connection() as conn:
+        return sorted(conn.execute("""
+            SELECT h.name, a.name, s.start_ts, s.end_ts FROM sessions s
+            JOIN hosts h ON h.id = s.host_id
+            JOIN apps a ON a.id = s.app_id
+        """).fetchall())
+
+
+def test_imported_sessions_match_event_by_event_clustering(project, write_export):
+    events = _random_events(seed=1)
+    write_export({
+        f"aw-watcher-window_{host}": [
+            event(row.timestamp, row.duration, app=row.app, title=row.title) for row in group.itertuples()
+        ]
+        for host, group in events.groupby("host")
+    })
+    project.import_exports(workers=1)
+
+    assert _stored_sessions(project) == _reference_sessions(events, project.session_gap)
+
+
+def test_sessions_do_not_depend_on_insertion_order(project):
+    events = _random_events(seed=2)
+    shuffled = events.sample(frac=1, random_state=3, ignore_index=True)
+    for first in range(0, len(shuffled), 130):
+        project.insert_events(shuffled.iloc[first:first + 130][["timestamp", "duration", "app", "title", "platform", "host"]])
+
+    assert _stored_sessions(project) == _reference_sessions(events, project.session_gap)
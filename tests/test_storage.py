@@ -0,0 +1,34 @@
+# tests/test_storage.py
+import pytest
+
+from conftest import event
+
+
+@pytest.fixture
+def parquet_project(project, tmp_path, monkeypatch):
+    """The project with its queries answered from Parquet files."""
+    pytest.importorskip("duckdb")
+    import storage
+    monkeypatch.setattr(project, "storage", storage.ParquetBackend(str(tmp_path / "parquet")))
+    return project
+
+
+def test_version_changes_after_the_parquet_copy_is_written(parquet_project, write_export, monkeypatch):
+    """Responses cached while the files were rewritten hold the old totals, they must not be served once written."""
+    project = parquet_project
+    backend = project.storage
+    versions_during_sync = []
+
+    def sync(since_date=None):
+        versions_during_sync.append(project.get_dataset_version())
+        type(backend).sync(backend, since_date)
+    monkeypatch.setattr(backend, "sync", sync)
+
+    write_export({"aw-watcher-window_DESKTOP-AAA": [event("2024-03-01T10:00:00.000000", 3600, app="chrome.exe", title="News")]})
+    project.import_exports(workers=1)
+
+    version = project.get_dataset_version()
+    assert versions_during_sync and version > versions_during_sync[-1]
+    # Live clients hear about the new version too
+    assert project.live_updates._history[-1][0] == version
+    assert project.spent_time(min_duration=0).set_index("title")["duration"]["Google Chrome"] == 1.0
@@ -0,0 +1,35 @@
+# tests/test_timezones.py
+from conftest import event
+
+
+def _local_times(project) -> dict[str, tuple]:
+    """(local date, local hour, local date of the session) of the one event of each host."""
+    with project.read_connection() as conn:
+        return {row[0]: row[1:] for row in conn.execute("""
+            SELECT h.name, e.local_date, e.local_hour, s.local_date FROM events e
+            JOIN hosts h ON h.id = e.host_id
+            JOIN sessions s ON s.host_id = e.host_id AND s.app_id = e.app_id AND s.start_ts = e.ts
+        """)}
+
+
+def test_hostname_overrides_come_before_platform_ones(project, write_export, monkeypatch):
+    """Two Windows machines, the laptop travelled to New York."""
+    monkeypatch.setattr(project, "platform_timezones", {"Windows": "Europe/Berlin"})
+    monkeypatch.setattr(project, "host_timezones", {"LAPTOP-BBB": "America/New_York"})
+    write_export({
+        "aw-watcher-window_DESKTOP-AAA": [event("2024-03-01T23:30:00.000000", 60, app="chrome.exe", title="News")],
+        "aw-watcher-window_LAPTOP-BBB": [event("2024-03-01T23:30:00.000000", 60, app="Code.exe", title="main.py")],
+    })
+    project.import_exports(workers=1)
+    assert _local_times(project) == {
+        "DESKTOP-AAA": ("2024-03-02", 0, "2024-03-02"),
+        "LAPTOP-BBB": ("2024-03-01", 18, "2024-03-01"),
+    }
+
+    # Back home, stored events are recomputed at startup
+    monkeypatch.setattr(project, "host_timezones", {})
+    project.prepare_db()
+    assert _local_times(project) == {
+        "DESKTOP-AAA": ("2024-03-02", 0, "2024-03-02"),
+        "LAPTOP-BBB": ("2024-03-02", 0, "2024-03-02"),
+    }
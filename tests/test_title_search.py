@@ -0,0 +1,13 @@
+# tests/test_title_search.py
+import pytest
+
+from conftest import event
+
+
+def test_invalid_query_reports_only_the_sqlite_error(project, write_export):
+    write_export({"aw-watcher-window_DESKTOP-AAA": [event("2024-03-01T10:00:00.000000", 60, app="chrome.exe", title="News")]})
+    project.import_exports(workers=1)
+
+    with pytest.raises(ValueError) as error:
+        project.title_search('"News')
+    assert str(error.value) == "Invalid search query '\"News': unterminated string"